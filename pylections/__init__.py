@@ -1,4 +1,18 @@
 import pylections.distribution.distribution as distributions
+import pylections.distribution.ranked as ranked
 import pylections.district as districts
 import pylections.quota as quota
+import pylections.biproportional as biproportional
+import pylections.compensation as compensation
+import pylections.aggregation as aggregation
+import pylections.ingest as ingest
+import pylections.snapshot as snapshot
+import pylections.spatial as spatial
+import pylections.swing as swing
+import pylections.polling as polling
+import pylections.analysis.paradox as paradox
+import pylections.analysis.indices as indices
+import pylections.analysis.sensitivity as sensitivity
+import pylections.analysis.power as power
+import pylections.analysis.coalitions as coalitions
 from pylections.party import Party
\ No newline at end of file
@@ -0,0 +1,228 @@
+from typing import Sequence, Union
+
+import numpy as np
+
+from pylections.party import Party
+from .district import _District
+
+
+class VoteHierarchy:
+    def __init__(self,
+                 candidates: Sequence[Union[str, Party]],
+                 stations: Sequence[tuple[str, str, str]]) -> None:
+        """ Vote counts at polling station level, with municipality and district totals that are kept up to date
+        as the station counts change.
+
+        The station counts are one contiguous (stations x candidates) array, sorted so that the stations of each
+        municipality, and the municipalities of each district, are contiguous segments. Each station and municipality
+        has the index of its parent. A change to some stations adds the difference to the totals of their municipality
+        and district, so nothing is summed again. Districts added with bind() get the new district totals as the
+        scores of their distribution right away.
+
+        Integer counts stay exact. With float counts the totals can drift by rounding, see resum().
+
+        Args:
+            candidates: The parties or candidate IDs, one column of counts each.
+            stations: The (station, municipality, district) names of each polling station.
+        """
+        self._candidates = list(candidates)
+        districts: dict[str, int] = {}
+        municipalities: dict[str, int] = {}
+        municipality_districts: list[int] = []
+        for _, municipality, district in stations:
+            district_index = districts.setdefault(str(district), len(districts))
+            if str(municipality) not in municipalities:
+                municipalities[str(municipality)] = len(municipalities)
+                municipality_districts.append(district_index)
+            elif municipality_districts[municipalities[str(municipality)]] != district_index:
+                raise ValueError(f"Municipality {municipality} is in more than one district")
+
+        # the municipalities sorted by district, and the stations by municipality, in the order they were given
+        municipality_order = np.argsort(municipality_districts, kind="stable")
+        municipality_rank = np.empty(len(municipality_order), dtype=np.int64)
+        municipality_rank[municipality_order] = np.arange(len(municipality_order))
+        station_municipalities = municipality_rank[[municipalities[str(municipality)] for _, municipality, _ in stations]]
+        station_order = np.argsort(station_municipalities, kind="stable")
+
+        municipality_names = list(municipalities)
+        self._district_names = list(districts)
+        self._municipality_names = [municipality_names[index] for index in municipality_order.tolist()]
+        self._station_names = [str(stations[index][0]) for index in station_order.tolist()]
+        self._district_index = {name: index for index, name in enumerate(self._district_names)}
+        self._municipality_index = {name: index for index, name in enumerate(self._municipality_names)}
+        self._station_index = {name: index for index, name in enumerate(self._station_names)}
+        if len(self._station_index) != len(self._station_names):
+            raise ValueError("The station names must be unique")
+
+        self._station_parent = station_municipalities[station_order]
+        self._municipality_parent = np.asarray(municipality_districts, dtype=np.int64)[municipality_order]
+        self._station_offsets = np.searchsorted(self._station_parent, np.arange(len(self._municipality_names) + 1))
+        self._municipality_offsets = np.searchsorted(self._municipality_parent, np.arange(len(self._district_names) + 1))
+
+        num_candidates = len(self._candidates)
+        self._station_votes = np.zeros((len(self._station_names), num_candidates), dtype=np.int64)
+        self._municipality_votes = np.zeros((len(self._municipality_names), num_candidates), dtype=np.int64)
+        self._district_votes = np.zeros((len(self._district_names), num_candidates), dtype=np.int64)
+        self._bound: dict[int, tuple[_District, Union[np.ndarray, None]]] = {} # district index: district, candidate positions in its distribution
+
+    def _rows(self, stations: Union[str, int, Sequence[str], Sequence[int], np.ndarray]) -> np.ndarray:
+        """ Return the row of each station, given by name or row index. """
+        if isinstance(stations, (str, int, np.integer)):
+            stations = [stations] # type: ignore
+        rows = [self._station_index[station] if isinstance(station, str) else int(station) for station in stations] # type: ignore
+        return np.asarray(rows, dtype=np.int64)
+
+    def _counts(self, votes: Union[np.ndarray, Sequence], num_rows: int) -> np.ndarray:
+        """ Return the votes as a (rows x candidates) array, and upcast the counts to float if they are floats. """
+        votes = np.asarray(votes)
+        if votes.dtype.kind not in "iuf":
+            raise ValueError(f"Incorrect type passed for votes, expected floats or ints, got {votes.dtype}")
+        votes = votes.reshape(num_rows, len(self._candidates))
+        if votes.dtype.kind == "f" and self._station_votes.dtype != np.float64:
+            self._station_votes = self._station_votes.astype(np.float64)
+            self._municipality_votes = self._municipality_votes.astype(np.float64)
+            self._district_votes = self._district_votes.astype(np.float64)
+        return votes
+
+    def set_votes(self,
+                  stations: Union[str, int, Sequence[str], Sequence[int], np.ndarray],
+                  votes: Union[np.ndarray, Sequence]) -> None:
+        """ Set the counts of one or more stations, and update the totals.
+
+        Args:
+            stations: Station name or row index, or a sequence of them (each at most once).
+            votes: The new counts, one per candidate, or (stations x candidates).
+        """
+        rows = self._rows(stations)
+        if len(rows) > 1 and len(np.unique(rows)) != len(rows):
+            raise ValueError("Each station can only be set once per update")
+        votes = self._counts(votes, len(rows))
+        self._add(rows, votes - self._station_votes[rows])
+
+    def add_votes(self,
+                  stations: Union[str, int, Sequence[str], Sequence[int], np.ndarray],
+                  votes: Union[np.ndarray, Sequence]) -> None:
+        """ Add to the counts of one or more stations (e.g. a new batch of counted ballots), and update the totals.
+
+        Args:
+            stations: Station name or row index, or a sequence of them.
+            votes: The votes to add, one per candidate, or (stations x candidates).
+        """
+        rows = self._rows(stations)
+        self._add(rows, self._counts(votes, len(rows)))
+
+    def _add(self, rows: np.ndarray, difference: np.ndarray) -> None:
+        """ Add the difference to the stations and to the totals of their municipalities and districts. """
+        municipalities = self._station_parent[rows]
+        districts = self._municipality_parent[municipalities]
+        if len(rows) == 1: # the usual single station update, without the overhead of np.add.at
+            self._station_votes[rows[0]] += difference[0]
+            self._municipality_votes[municipalities[0]] += difference[0]
+            self._district_votes[districts[0]] += difference[0]
+            self._push(districts)
+            return
+        np.add.at(self._station_votes, rows, difference)
+        np.add.at(self._municipality_votes, municipalities, difference)
+        np.add.at(self._district_votes, districts, difference)
+        self._push(np.unique(districts))
+
+    def resum(self) -> None:
+        """ Sum the municipality and district totals again from the station counts, e.g. to remove float rounding drift. """
+        self._municipality_votes = np.add.reduceat(self._station_votes, self._station_offsets[:-1], axis=0)
+        self._district_votes = np.add.reduceat(self._municipality_votes, self._municipality_offsets[:-1], axis=0)
+        self._push(np.arange(len(self._district_names)))
+
+    def bind(self, district: _District) -> None:
+        """ Feed the totals of the district with the same name to the scores of its distribution, now and after every change.
+        Candidates missing in the distribution are added to it.
+        """
+        if district.name not in self._district_index:
+            raise ValueError(f"There is no district named {district.name}")
+        distribution = district.distribution
+        if distribution is None:
+            raise ValueError(f"District {district.name} has no distribution")
+        for candidate in self._candidates:
+            if candidate not in distribution:
+                distribution.add_score(candidate, 0)
+        positions = np.array([distribution.index_of(candidate) for candidate in self._candidates], dtype=np.int64)
+        if len(positions) == distribution.num_candidates and (positions == np.arange(len(positions))).all():
+            positions = None # the same candidates in the same order, so the totals are the scores
+        index = self._district_index[district.name]
+        self._bound[index] = (district, positions)
+        self._push(np.array([index]))
+
+    def unbind(self, district: _District) -> None:
+        """ Stop feeding the totals to the district. """
+        self._bound.pop(self._district_index[district.name], None)
+
+    def _push(self, districts: np.ndarray) -> None:
+        """ Set the totals of the given districts as the scores of their bound distributions. """
+        for index in districts.tolist():
+            bound = self._bound.get(index)
+            if bound is None:
+                continue
+            district, positions = bound
+            distribution = district.distribution
+            if distribution is None:
+                continue
+            if positions is None:
+                distribution.set_score_array(self._district_votes[index])
+            else:
+                scores = distribution.score_array.astype(self._district_votes.dtype)
+                scores[positions] = self._district_votes[index]
+                distribution.set_score_array(scores)
+
+    @staticmethod
+    def _read_only(array: np.ndarray) -> np.ndarray:
+        view = array.view()
+        view.flags.writeable = False
+        return view
+
+    def station_votes(self, station: Union[str, int]) -> np.ndarray:
+        """ Read-only counts of a station, by name or row index. """
+        return self._read_only(self._station_votes[self._rows(station)[0]])
+
+    def municipality_votes(self, municipality: str) -> np.ndarray:
+        """ Read-only totals of a municipality. """
+        return self._read_only(self._municipality_votes[self._municipality_index[municipality]])
+
+    def district_votes(self, district: str) -> np.ndarray:
+        """ Read-only totals of a district. """
+        return self._read_only(self._district_votes[self._district_index[district]])
+
+    @property
+    def station_array(self) -> np.ndarray:
+        """ Read-only (stations x candidates) counts, in the order of station_names. """
+        return self._read_only(self._station_votes)
+
+    @property
+    def municipality_array(self) -> np.ndarray:
+        """ Read-only (municipalities x candidates) totals, in the order of municipality_names. """
+        return self._read_only(self._municipality_votes)
+
+    @property
+    def district_array(self) -> np.ndarray:
+        """ Read-only (districts x candidates) totals, in the order of district_names. """
+        return self._read_only(self._district_votes)
+
+    @property
+    def candidates(self) -> list[Union[str, Party]]:
+        return list(self._candidates)
+
+    @property
+    def station_names(self) -> list[str]:
+        """ The stations in the order of the rows, sorted by municipality. """
+        return list(self._station_names)
+
+    @property
+    def municipality_names(self) -> list[str]:
+        """ The municipalities in the order of the rows, sorted by district. """
+        return list(self._municipality_names)
+
+    @property
+    def district_names(self) -> list[str]:
+        return list(self._district_names)
+
+    def __repr__(self) -> str:
+        return (f"<{__name__}.VoteHierarchy, stations={len(self._station_names)}, municipalities={len(self._municipality_names)}, "
+                f"districts={len(self._district_names)}, candidates={len(self._candidates)} at {hex(id(self))}>")
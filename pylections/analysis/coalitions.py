@@ -0,0 +1,199 @@
+from collections import Counter
+from typing import Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from ..distribution.distribution import Distribution
+from ..party import Party
+
+
+def _weights_and_keys(seats: Union[Distribution, Mapping[Union[str, Party], int]]) -> tuple[np.ndarray, list]:
+    if isinstance(seats, Distribution):
+        seats = seats.result
+    keys = list(seats.keys())
+    return np.array([seats[key] for key in keys], dtype=np.int64), keys
+
+
+def _positions(keys: Sequence[Union[str, Party]],
+               positions: Union[Mapping[Union[str, Party], float], None]) -> np.ndarray:
+    """ Spectrum positions of the candidates, from the Party objects unless given explicitly. """
+    if positions is not None:
+        return np.array([positions[key] for key in keys], dtype=float)
+    if not all(isinstance(key, Party) for key in keys):
+        raise ValueError("Spectrum positions must be given when the candidates are not Party objects")
+    return np.array([key.spectrum_position for key in keys], dtype=float)
+
+
+def mask_members(mask: int, keys: Sequence[Union[str, Party]]) -> list[Union[str, Party]]:
+    """ Return the candidates in a coalition bitmask, where bit i is set if keys[i] is a member. """
+    return [key for index, key in enumerate(keys) if mask >> index & 1]
+
+
+def minimal_winning_masks(weights: np.ndarray, quota: int) -> list[int]:
+    """ Enumerate the minimal winning coalitions as bitmasks (bit i set if party i is a member).
+
+    Parties are added in order of decreasing seats, with a depth-first branch and bound search.
+    A branch is cut as soon as all the remaining parties cannot reach the quota. When a coalition
+    first reaches the quota, the party just added is its smallest member, so removing any member
+    makes it lose: every coalition found is minimal, and no supersets need to be checked.
+    Parties without seats are never members.
+    """
+    order = [int(index) for index in np.argsort(-weights, kind="stable") if weights[index] > 0]
+    ordered_weights = [int(weights[index]) for index in order]
+    remaining = np.cumsum(ordered_weights[::-1])[::-1].tolist() + [0] # seats of the parties from position i onward
+    bits = [1 << index for index in order]
+    found: list[int] = []
+
+    stack = [(0, 0, 0)] # (next position, mask, seats)
+    while stack:
+        position, mask, total = stack.pop()
+        last = position # the remaining seats only shrink further down the order, so stop at the first position that cannot win
+        while last < len(order) and total + remaining[last] >= quota:
+            last += 1
+        for next_position in range(last - 1, position - 1, -1): # pushed in reverse, so larger parties are explored first
+            new_total = total + ordered_weights[next_position]
+            if new_total >= quota:
+                found.append(mask | bits[next_position])
+            else:
+                stack.append((next_position + 1, mask | bits[next_position], new_total))
+    return found
+
+
+def minimal_connected_masks(weights: np.ndarray, positions: np.ndarray, quota: int) -> list[int]:
+    """ Enumerate the minimal connected winning coalitions as bitmasks.
+
+    A connected coalition is an unbroken range of parties on the political spectrum (parties without seats are skipped).
+    It is minimal when removing either end party makes it lose, since removing a party in the middle would
+    break it. One pass with two pointers finds all of them.
+    """
+    order = [int(index) for index in np.argsort(positions, kind="stable") if weights[index] > 0]
+    found = []
+    right = 0
+    total = 0
+    mask = 0
+    for left in range(len(order)):
+        while total < quota and right < len(order):
+            total += int(weights[order[right]])
+            mask |= 1 << order[right]
+            right += 1
+        if total < quota:
+            break
+        if total - int(weights[order[left]]) < quota:
+            found.append(mask)
+        total -= int(weights[order[left]])
+        mask &= ~(1 << order[left])
+    return found
+
+
+def minimal_winning_coalitions(seats: Union[Distribution, Mapping[Union[str, Party], int]],
+                               quota: Union[int, None] = None) -> list[list[Union[str, Party]]]:
+    """ Enumerate the minimal winning coalitions, where every member is needed for a majority.
+
+    Args:
+        seats: Seat result of a Distribution, or the Distribution itself.
+        quota: Seats needed for a majority. Defaults to a simple majority.
+
+    Returns:
+        A list of coalitions, each a list of candidates.
+    """
+    weights, keys = _weights_and_keys(seats)
+    if quota is None:
+        quota = int(weights.sum())//2 + 1
+    return [mask_members(mask, keys) for mask in minimal_winning_masks(weights, quota)]
+
+
+def minimal_connected_coalitions(seats: Union[Distribution, Mapping[Union[str, Party], int]],
+                                 quota: Union[int, None] = None,
+                                 positions: Union[Mapping[Union[str, Party], float], None] = None) -> list[list[Union[str, Party]]]:
+    """ Enumerate the minimal connected winning coalitions, ideologically adjacent by spectrum_position.
+
+    Args:
+        seats: Seat result of a Distribution, or the Distribution itself.
+        quota: Seats needed for a majority. Defaults to a simple majority.
+        positions: Spectrum positions per candidate. Defaults to the spectrum_position of each Party.
+
+    Returns:
+        A list of coalitions, each a list of candidates ordered from left to right.
+    """
+    weights, keys = _weights_and_keys(seats)
+    if quota is None:
+        quota = int(weights.sum())//2 + 1
+    spectrum = _positions(keys, positions)
+    coalitions = []
+    for mask in minimal_connected_masks(weights, spectrum, quota):
+        members = mask_members(mask, keys)
+        coalitions.append(sorted(members, key=lambda member: spectrum[keys.index(member)]))
+    return coalitions
+
+
+def coalition_frequencies(seats: np.ndarray,
+                          candidates: Sequence[Union[str, Party]],
+                          quota: Union[int, np.ndarray, None] = None,
+                          connected: bool = False,
+                          positions: Union[Mapping[Union[str, Party], float], None] = None) -> pd.DataFrame:
+    """ Count how often each coalition is minimal winning (or minimal connected winning) over a batch of simulated results.
+
+    Identical draws are only enumerated once.
+
+    Args:
+        seats: Integer array of seats (draws x candidates).
+        candidates: The candidates, in the column order of seats.
+        quota: Seats needed for a majority, a number or one per draw. Defaults to a simple majority of each draw.
+        connected: Count minimal connected winning coalitions instead of minimal winning coalitions.
+        positions: Spectrum positions per candidate, for connected coalitions. Defaults to the spectrum_position of each Party.
+
+    Returns:
+        A dataframe with one row per coalition: members (list of candidates), seats (mean over draws),
+        and frequency (share of draws where the coalition is minimal winning), sorted by frequency.
+    """
+    seats = np.atleast_2d(np.asarray(seats, dtype=np.int64))
+    num_draws = len(seats)
+    if quota is None:
+        quotas = seats.sum(axis=1)//2 + 1
+    else:
+        quotas = np.broadcast_to(np.asarray(quota, dtype=np.int64), (num_draws,))
+    spectrum = _positions(candidates, positions) if connected else None
+
+    rows = np.column_stack((seats, quotas))
+    unique_rows, counts = np.unique(rows, axis=0, return_counts=True)
+    frequencies: Counter = Counter()
+    for row, count in zip(unique_rows, counts):
+        weights, row_quota = row[:-1], int(row[-1])
+        if connected:
+            masks = minimal_connected_masks(weights, spectrum, row_quota) # type: ignore
+        else:
+            masks = minimal_winning_masks(weights, row_quota)
+        for mask in masks:
+            frequencies[mask] += int(count)
+
+    masks = [mask for mask, _ in frequencies.most_common()]
+    membership = np.array([[mask >> index & 1 for index in range(len(candidates))] for mask in masks], dtype=np.int64).reshape(len(masks), len(candidates))
+    return pd.DataFrame({
+        "members": [mask_members(mask, candidates) for mask in masks],
+        "seats": (seats @ membership.T).mean(axis=0) if len(masks) else [],
+        "frequency": [frequencies[mask]/num_draws for mask in masks],
+    })
+
+
+def winning_frequency(seats: np.ndarray,
+                      candidates: Sequence[Union[str, Party]],
+                      coalitions: Sequence[Sequence[Union[str, Party]]],
+                      quota: Union[int, np.ndarray, None] = None) -> np.ndarray:
+    """ Return the share of draws where each of the given coalitions has a majority, with one matrix product.
+
+    Args:
+        seats: Integer array of seats (draws x candidates).
+        candidates: The candidates, in the column order of seats.
+        coalitions: The coalitions to check, each a sequence of candidates.
+        quota: Seats needed for a majority, a number or one per draw. Defaults to a simple majority of each draw.
+    """
+    seats = np.atleast_2d(np.asarray(seats, dtype=np.int64))
+    if quota is None:
+        quota = seats.sum(axis=1)//2 + 1
+    index = {candidate: position for position, candidate in enumerate(candidates)}
+    membership = np.zeros((len(coalitions), len(candidates)), dtype=np.int64)
+    for row, coalition in enumerate(coalitions):
+        membership[row, [index[member] for member in coalition]] = 1
+    totals = seats @ membership.T
+    return (totals >= np.reshape(quota, (-1, 1))).mean(axis=0)
@@ -0,0 +1,113 @@
+from typing import Union
+
+import numpy as np
+
+from ..distribution.distribution import Distribution
+
+
+ArrayLike = Union[np.ndarray, list, tuple]
+
+
+def _shares(votes: Union[Distribution, ArrayLike],
+            seats: Union[ArrayLike, None] = None) -> tuple[np.ndarray, np.ndarray]:
+    """ Return vote and seat shares in percent, normalized along the last axis.
+
+    Accepts either a Distribution (seats are taken from its result) or vote and seat arrays of the
+    same shape, 1-D for a single distribution or 2-D (draws x parties) for batches.
+    """
+    if isinstance(votes, Distribution):
+        if seats is None:
+            seats = votes.result.to_numpy()
+        votes = votes.score_array
+    elif seats is None:
+        raise ValueError("Seats must be given when votes is not a Distribution")
+
+    votes = np.asarray(votes, dtype=float)
+    seats = np.asarray(seats, dtype=float)
+    if votes.shape != seats.shape:
+        raise ValueError(f"Votes and seats must have the same shape, got {votes.shape} and {seats.shape}")
+
+    vote_shares = votes*(100/votes.sum(axis=-1, keepdims=True))
+    seat_shares = seats*(100/seats.sum(axis=-1, keepdims=True))
+    return vote_shares, seat_shares
+
+
+def _scalar(value: np.ndarray) -> Union[float, np.ndarray]:
+    return value.item() if value.ndim == 0 else value
+
+
+def gallagher(votes: Union[Distribution, ArrayLike], seats: Union[ArrayLike, None] = None) -> Union[float, np.ndarray]:
+    """ The Gallagher least squares index, sqrt(sum((v - s)^2)/2) with shares in percent.
+
+    Args:
+        votes: Distribution, or votes per party (1-D) or per draw and party (2-D).
+        seats: Seats matching votes. Not needed for a Distribution.
+
+    Returns:
+        The index, or an array of indices (one per draw) for 2-D input.
+    """
+    vote_shares, seat_shares = _shares(votes, seats)
+    return _scalar(np.sqrt(0.5*np.square(vote_shares - seat_shares).sum(axis=-1)))
+
+
+def loosemore_hanby(votes: Union[Distribution, ArrayLike], seats: Union[ArrayLike, None] = None) -> Union[float, np.ndarray]:
+    """ The Loosemore-Hanby index, sum(|v - s|)/2 with shares in percent. See gallagher() for the arguments. """
+    vote_shares, seat_shares = _shares(votes, seats)
+    return _scalar(0.5*np.abs(vote_shares - seat_shares).sum(axis=-1))
+
+
+def sainte_lague_index(votes: Union[Distribution, ArrayLike], seats: Union[ArrayLike, None] = None) -> Union[float, np.ndarray]:
+    """ The Sainte-Lague index, sum((s - v)^2/v) with shares in percent. Parties without votes are left out.
+    See gallagher() for the arguments.
+    """
+    vote_shares, seat_shares = _shares(votes, seats)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terms = np.square(seat_shares - vote_shares)/vote_shares
+    return _scalar(np.where(vote_shares > 0, terms, 0).sum(axis=-1))
+
+
+def max_advantage_ratio(votes: Union[Distribution, ArrayLike], seats: Union[ArrayLike, None] = None) -> Union[float, np.ndarray]:
+    """ The D'Hondt index, the largest ratio of seat share to vote share of any party. Parties without votes are left out.
+    See gallagher() for the arguments.
+    """
+    vote_shares, seat_shares = _shares(votes, seats)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = seat_shares/vote_shares
+    return _scalar(np.where(vote_shares > 0, ratios, -np.inf).max(axis=-1))
+
+
+def effective_number_of_parties(shares: Union[Distribution, ArrayLike]) -> Union[float, np.ndarray]:
+    """ The Laakso-Taagepera effective number of parties, 1/sum(p^2), where p are the fractional shares.
+
+    Args:
+        shares: Distribution (uses the scores), or votes or seats per party (1-D) or per draw and party (2-D).
+            They are normalized, so raw counts can be passed.
+    """
+    if isinstance(shares, Distribution):
+        shares = shares.score_array
+    shares = np.asarray(shares, dtype=float)
+    fractions = shares/shares.sum(axis=-1, keepdims=True)
+    return _scalar(1/np.square(fractions).sum(axis=-1))
+
+
+def all_indices(votes: Union[Distribution, ArrayLike], seats: Union[ArrayLike, None] = None) -> dict[str, Union[float, np.ndarray]]:
+    """ Calculate all the indices in one pass over the vote and seat shares. See gallagher() for the arguments.
+
+    Returns:
+        A dictionary with the indices, including the effective number of parties by votes and by seats.
+    """
+    vote_shares, seat_shares = _shares(votes, seats)
+    difference = seat_shares - vote_shares
+    has_votes = vote_shares > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sainte_lague = np.where(has_votes, np.square(difference)/vote_shares, 0).sum(axis=-1)
+        advantage = np.where(has_votes, seat_shares/vote_shares, -np.inf).max(axis=-1)
+
+    return {
+        "gallagher": _scalar(np.sqrt(0.5*np.square(difference).sum(axis=-1))),
+        "loosemore_hanby": _scalar(0.5*np.abs(difference).sum(axis=-1)),
+        "sainte_lague": _scalar(sainte_lague),
+        "max_advantage_ratio": _scalar(advantage),
+        "effective_parties_votes": _scalar(1e4/np.square(vote_shares).sum(axis=-1)),
+        "effective_parties_seats": _scalar(1e4/np.square(seat_shares).sum(axis=-1)),
+    }
@@ -0,0 +1,127 @@
+from typing import Mapping, Sequence, Union
+
+import numpy as np
+
+from ..distribution.distribution import Distribution, Hamilton, hamilton_quotients, largest_remainders, priority_list
+from ..party import Party
+
+
+def _hamilton_sweep(scores: np.ndarray, max_seats: int, quota: str = "hare") -> np.ndarray:
+    """ Apportion every house size from 1 to max_seats with Hamilton's method in one pass.
+    The remainders are compared like Hamilton.calculate (exactly for integer scores), and ties go to the candidate added first.
+
+    Returns:
+        Integer array of shape (max_seats, number of candidates), where row h - 1 holds the seats at house size h.
+    """
+    house_sizes = np.arange(1, max_seats + 1)
+    seats, remainders = hamilton_quotients(scores, house_sizes, quota)
+    return largest_remainders(seats, remainders, house_sizes)
+
+
+def _divisor_sweep(scores: np.ndarray, divisors: np.ndarray, eligible: np.ndarray) -> np.ndarray:
+    """ Apportion every house size from 1 to len(divisors) with a divisor method in one pass.
+
+    The priority list gives the order in which seats are handed out, and the seats at each house size
+    are the cumulative counts.
+
+    Returns:
+        Integer array of shape (len(divisors), number of candidates), where row h - 1 holds the seats at house size h.
+    """
+    max_seats = len(divisors)
+    winners = priority_list(scores, divisors, max_seats, eligible)
+    awarded = np.zeros((max_seats, len(scores)), dtype=int)
+    awarded[np.arange(len(winners)), winners] = 1
+    return np.cumsum(awarded, axis=0)
+
+
+def _sweep_scores(distribution: Distribution, scores: np.ndarray, max_seats: int) -> np.ndarray:
+    eligible = distribution.eligible_mask()
+    scores = np.where(eligible, scores, 0)
+    if isinstance(distribution, Hamilton) and distribution.tie_break == "first":
+        return _hamilton_sweep(scores, max_seats, distribution.quota_name)
+    if hasattr(distribution, "divisor_table"):
+        return _divisor_sweep(scores.astype(float), distribution.divisor_table(max_seats), eligible) # type: ignore
+
+    # no vectorized sweep for this method or tie break, fall back to calculating each house size
+    sweep = np.zeros((max_seats, len(scores)), dtype=int)
+    for house_size in range(1, max_seats + 1):
+        house = type(distribution)(house_size, **distribution._parameters()) # type: ignore
+        house.tie_break, house.seed = distribution.tie_break, distribution.seed
+        house.add_score(list(distribution.candidates), scores.tolist())
+        sweep[house_size - 1] = house.result.to_numpy()
+    return sweep
+
+
+def house_size_sweep(distribution: Distribution, max_seats: int) -> np.ndarray:
+    """ Apportion every house size from 1 to max_seats using the method, scores and thresholds of a distribution.
+
+    Hamilton uses sorted remainders per house size, and divisor methods use their priority list,
+    so the whole sweep is a single vectorized pass.
+
+    Args:
+        distribution: The distribution to sweep. It is not modified.
+        max_seats: The largest house size.
+
+    Returns:
+        Integer array of shape (max_seats, number of candidates), where row h - 1 holds the seats at house size h.
+        The columns follow distribution.name_list.
+    """
+    return _sweep_scores(distribution, distribution.score_array, max_seats)
+
+
+def alabama_paradox(distribution: Distribution, max_seats: int) -> list[tuple[int, Union[str, Party]]]:
+    """ Find every house size where a candidate loses a seat when the house grows by one seat.
+
+    Args:
+        distribution: The distribution to check. It is not modified.
+        max_seats: The largest house size to check.
+
+    Returns:
+        A list of (house_size, candidate), meaning the candidate has fewer seats at house_size than at house_size - 1.
+    """
+    sweep = house_size_sweep(distribution, max_seats)
+    house_sizes, candidates = np.nonzero(np.diff(sweep, axis=0) < 0)
+    keys = distribution.candidates
+    return [(int(size) + 2, keys[candidate]) for size, candidate in zip(house_sizes, candidates)]
+
+
+def population_paradox(distribution: Distribution,
+                       new_scores: Union[Mapping[Union[str, Party], Union[float, int]], Sequence[Union[float, int]], np.ndarray],
+                       max_seats: int) -> list[tuple[int, Union[str, Party], Union[str, Party]]]:
+    """ Find every house size where the population paradox occurs between the current and some new scores.
+
+    The paradox occurs when a candidate whose score grew at a higher rate than another candidate loses a seat,
+    while the other candidate gains one.
+
+    Args:
+        distribution: The distribution with the current scores. It is not modified.
+        new_scores: The new scores, either as a mapping from candidates or in the order of distribution.name_list.
+        max_seats: The largest house size to check.
+
+    Returns:
+        A list of (house_size, faster_growing_candidate, slower_growing_candidate).
+    """
+    if isinstance(new_scores, Mapping):
+        new_scores = [new_scores[key] for key in distribution.candidates]
+    new_score_array = np.asarray(new_scores)
+    if len(new_score_array) != distribution.num_candidates:
+        raise ValueError("Need a new score for every candidate")
+
+    old_score_array = distribution.score_array
+    if new_score_array.dtype.kind not in "iu" or old_score_array.dtype.kind not in "iu": # integers keep exact remainders
+        new_score_array, old_score_array = new_score_array.astype(float), old_score_array.astype(float)
+    else:
+        new_score_array = new_score_array.astype(np.int64)
+    old_sweep = _sweep_scores(distribution, old_score_array, max_seats)
+    new_sweep = _sweep_scores(distribution, new_score_array, max_seats)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = new_score_array/old_score_array
+    grew_faster = growth[:, np.newaxis] > growth[np.newaxis, :]
+
+    loses = new_sweep < old_sweep
+    gains = new_sweep > old_sweep
+    paradox = loses[:, :, np.newaxis] & gains[:, np.newaxis, :] & grew_faster[np.newaxis, :, :]
+
+    keys = distribution.candidates
+    return [(int(size) + 1, keys[faster], keys[slower]) for size, faster, slower in zip(*np.nonzero(paradox))]
@@ -0,0 +1,162 @@
+from math import lgamma
+from typing import Mapping, Union
+
+import numpy as np
+
+from ..distribution.distribution import Distribution
+from ..party import Party
+
+
+SeatsLike = Union[Distribution, Mapping[Union[str, Party], int], np.ndarray, list, tuple]
+
+
+def _add_shifted(target: np.ndarray, source: np.ndarray, weights: np.ndarray) -> None:
+    """ Add source to target, shifted along the last axis by a different weight for each draw (first axis).
+    Draws are grouped on weight, so each group is a plain slice operation.
+    """
+    for weight in np.unique(weights):
+        rows = slice(None) if weights[0] == weight and (weights == weight).all() else np.flatnonzero(weights == weight)
+        if weight == 0:
+            target[rows] += source[rows]
+        else:
+            target[rows, ..., weight:] += source[rows, ..., :-weight]
+
+
+def _count_dtype(num_parties: int) -> type:
+    """ The dtype of the coalition counts. There are at most 2^N coalitions, and the alternating sums of
+    _counts_without() add up to N of them, so with more than about 56 parties int64 would overflow and the counts
+    are exact Python integers instead, which is much slower.
+    """
+    return np.int64 if (num_parties + 1)*2**num_parties < 2**63 else object
+
+
+def _coalition_counts(weights: np.ndarray, max_weight: int) -> np.ndarray:
+    """ Count the coalitions of each size and total weight with a generating function dynamic program.
+
+    Returns:
+        Integer array (draws x coalition size x total weight), of Python integers for many parties, see _count_dtype().
+    """
+    num_draws, num_parties = weights.shape
+    counts = np.zeros((num_draws, num_parties + 1, max_weight + 1), dtype=_count_dtype(num_parties))
+    counts[:, 0, 0] = 1
+    reach = 0 # the largest total weight so far, nothing is counted above it
+    for party in range(num_parties):
+        reach = min(reach + int(weights[:, party].max()), max_weight)
+        _add_shifted(counts[:, 1:party + 2, :reach + 1], counts[:, :party + 1, :reach + 1].copy(), weights[:, party])
+    return counts
+
+
+def _counts_without(cumulative: np.ndarray, weights: np.ndarray, total_weight: np.ndarray) -> np.ndarray:
+    """ Count the coalitions of each size with total weight at most total_weight (one per draw), leaving out a party with the given weights.
+
+    Adding a party of weight w maps the counts c to c'[s, k] = c[s, k] + c[s - 1, k - w]. Reversed, this gives
+    c[s, k] = sum over m of (-1)^m c'[s - m, k - m w], so only N values per size are needed, not the whole table.
+
+    Returns:
+        Integer array (draws x coalition size of the others).
+    """
+    num_draws, num_sizes, max_weight = cumulative.shape
+    draws = np.arange(num_draws)
+    counts = np.zeros((num_draws, num_sizes - 1), dtype=cumulative.dtype)
+    for removed in range(num_sizes - 1):
+        index = total_weight - removed*weights
+        values = np.where((index >= 0)[:, np.newaxis], cumulative[draws, :, np.clip(index, 0, max_weight - 1)], 0)
+        counts[:, removed:] += (-1)**removed*values[:, :num_sizes - 1 - removed]
+    return counts
+
+
+def _pivots_by_size(weights: np.ndarray, quota: np.ndarray) -> np.ndarray:
+    """ Count, for every party and coalition size, the coalitions of the other parties the party turns from losing to winning.
+
+    The coalition counts of all parties are made once, with O(N^2 W) work per draw, and each party is then
+    removed again analytically, only for the two total weights that bound its winning window.
+
+    Returns:
+        Integer array (draws x parties x coalition size of the others).
+    """
+    num_draws, num_parties = weights.shape
+    max_weight = int(weights.sum(axis=1).max())
+    cumulative = np.cumsum(_coalition_counts(weights, max_weight), axis=2)
+
+    pivots = np.zeros((num_draws, num_parties, num_parties), dtype=cumulative.dtype)
+    for party in range(num_parties):
+        party_weights = weights[:, party]
+        # coalitions with weight in [quota - party weight, quota - 1] are turned into winning ones by the party
+        at_most_upper = _counts_without(cumulative, party_weights, np.minimum(quota - 1, max_weight))
+        at_most_lower = _counts_without(cumulative, party_weights, np.minimum(quota - party_weights - 1, max_weight))
+        pivots[:, party, :] = at_most_upper - at_most_lower
+    return pivots
+
+
+def _as_weights(seats: SeatsLike) -> tuple[np.ndarray, Union[list, None]]:
+    """ Return the seats as a 2-D integer array (draws x parties) and the keys if a mapping was given. """
+    if isinstance(seats, Distribution):
+        seats = seats.result
+    if isinstance(seats, Mapping):
+        keys = list(seats.keys())
+        return np.array([[seats[key] for key in keys]], dtype=np.int64), keys
+    weights = np.asarray(seats)
+    if not np.issubdtype(weights.dtype, np.integer):
+        raise ValueError("Seats must be whole numbers")
+    return np.atleast_2d(weights).astype(np.int64), None
+
+
+def power_indices(seats: SeatsLike,
+                  quota: Union[int, np.ndarray, None] = None,
+                  chunk_size: Union[int, None] = None) -> dict[str, Union[np.ndarray, dict]]:
+    """ Calculate the normalized Banzhaf and the Shapley-Shubik power index of every party.
+
+    Coalitions are counted by size and total seats with a generating function dynamic program,
+    vectorized across draws, so the cost grows with parties^2 x seats instead of 2^parties.
+
+    Args:
+        seats: Seat result of a Distribution (or the Distribution itself), or an integer array of seats,
+            1-D (parties) or 2-D (draws x parties) for a batch of simulated results.
+        quota: Seats needed for a majority, a number or one per draw. Defaults to a simple majority of each draw.
+        chunk_size: Number of draws to process at a time. Chosen to keep the memory use around 64 MB by default.
+
+    Returns:
+        A dictionary with keys "banzhaf" and "shapley_shubik". The values are dictionaries keyed on the parties if
+        seats was a mapping or Distribution, otherwise arrays with the same shape as seats.
+    """
+    weights, keys = _as_weights(seats)
+    num_draws, num_parties = weights.shape
+    totals = weights.sum(axis=1)
+    if quota is None:
+        quotas = totals//2 + 1
+    else:
+        quotas = np.broadcast_to(np.asarray(quota, dtype=np.int64), (num_draws,))
+
+    if chunk_size is None:
+        chunk_size = max(1, 2**23//((num_parties + 1)*(int(totals.max(initial=0)) + 1)))
+
+    # the share of orderings where the party is pivotal after a coalition of a given size: s!(n - s - 1)!/n!
+    sizes = range(num_parties)
+    order_weights = np.array([np.exp(lgamma(size + 1) + lgamma(num_parties - size) - lgamma(num_parties + 1)) for size in sizes])
+
+    banzhaf = np.zeros((num_draws, num_parties))
+    shapley_shubik = np.zeros((num_draws, num_parties))
+    for start in range(0, num_draws, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        pivots = _pivots_by_size(weights[chunk], quotas[chunk])
+        swings = pivots.sum(axis=2).astype(float)
+        swing_sums = swings.sum(axis=1, keepdims=True)
+        banzhaf[chunk] = np.divide(swings, swing_sums, out=np.zeros_like(swings), where=swing_sums > 0)
+        shapley_shubik[chunk] = pivots.astype(float) @ order_weights
+
+    if keys is not None:
+        return {"banzhaf": dict(zip(keys, banzhaf[0].tolist())),
+                "shapley_shubik": dict(zip(keys, shapley_shubik[0].tolist()))}
+    if np.ndim(seats) == 1:
+        return {"banzhaf": banzhaf[0], "shapley_shubik": shapley_shubik[0]}
+    return {"banzhaf": banzhaf, "shapley_shubik": shapley_shubik}
+
+
+def banzhaf(seats: SeatsLike, quota: Union[int, np.ndarray, None] = None) -> Union[np.ndarray, dict]:
+    """ The normalized Banzhaf power index of every party. See power_indices() for the arguments. """
+    return power_indices(seats, quota)["banzhaf"]
+
+
+def shapley_shubik(seats: SeatsLike, quota: Union[int, np.ndarray, None] = None) -> Union[np.ndarray, dict]:
+    """ The Shapley-Shubik power index of every party. See power_indices() for the arguments. """
+    return power_indices(seats, quota)["shapley_shubik"]
@@ -0,0 +1,343 @@
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pylections.party import Party
+from ..distribution.distribution import Distribution, DivisorMethod, Hamilton, StLague, largest_remainders
+from ..district import _District
+from ..swing import SwingModel
+
+
+def _lowest_excluding_self(values: np.ndarray, prefer_last: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """ For every position, return the lowest value among all other positions and where it is.
+    Equal values are taken in order of position, or in reverse order if prefer_last is True.
+    """
+    if prefer_last:
+        order = len(values) - 1 - np.argsort(values[::-1], kind="stable")
+    else:
+        order = np.argsort(values, kind="stable")
+    lowest, second = order[0], order[1] if len(values) > 1 else order[0]
+    other = np.full(len(values), lowest)
+    other[lowest] = second
+    result = values[other]
+    if len(values) == 1:
+        result = np.full(1, np.nan)
+    return result, other
+
+
+def _smallest_change(tie_point: np.ndarray, wins_tie: np.ndarray) -> np.ndarray:
+    """ Return the smallest whole number of votes past the tie point, or at it where the tie is won.
+    Tie points within rounding error of a whole number are treated as whole.
+    """
+    nearest = np.round(tie_point)
+    is_whole = np.abs(tie_point - nearest) <= 1e-9*np.maximum(np.abs(tie_point), 1)
+    tie_point = np.where(is_whole, nearest, tie_point)
+    return np.where(is_whole & wins_tie, tie_point, np.floor(tie_point) + 1)
+
+
+def divisor_margins(scores: np.ndarray,
+                    seats: np.ndarray,
+                    divisors: np.ndarray,
+                    eligible: Union[np.ndarray, None] = None) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ Calculate the smallest whole number of votes each candidate must gain or lose to change its number of seats,
+    when all other scores stay the same, using the quotient structure of a divisor method.
+
+    A candidate with k seats gains a seat when its next quotient score/divisors[k] beats the lowest
+    winning quotient of the other candidates, and loses its last seat when score/divisors[k - 1] falls
+    below the highest losing quotient of the other candidates. This needs the lowest and highest values
+    of two arrays, so the cost is dominated by a sort, O(N log N).
+
+    Args:
+        scores: Candidate scores.
+        seats: Seats awarded to each candidate.
+        divisors: Divisor table with at least max(seats) + 1 entries, see DivisorMethod.divisor_table.
+        eligible: Optional mask of candidates that may win seats. Others get NaN margins.
+
+    Returns:
+        Four arrays: votes to gain a seat, index of the candidate it would be taken from,
+        votes to lose a seat, index of the candidate that would take it. Impossible changes are inf (index -1).
+    """
+    scores = np.asarray(scores, dtype=float)
+    seats = np.asarray(seats, dtype=int)
+    if eligible is None:
+        eligible = np.ones(len(scores), dtype=bool)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        last_winning = np.where((seats > 0) & eligible, scores/divisors[np.maximum(seats - 1, 0)], np.inf)
+        next_losing = np.where(eligible, scores/divisors[seats], -np.inf)
+
+    lowest_other, gain_from = _lowest_excluding_self(last_winning, prefer_last=True) # of tied seats, the last one awarded is lost first
+    highest_other, lose_to = _lowest_excluding_self(-next_losing)
+    highest_other = -highest_other
+
+    # ties go to the candidate added first, so a candidate before its competitor only needs to tie
+    indices = np.arange(len(scores))
+    with np.errstate(invalid="ignore"):
+        votes_to_gain = _smallest_change(divisors[seats]*lowest_other - scores, indices < gain_from)
+        votes_to_lose = _smallest_change(scores - divisors[np.maximum(seats - 1, 0)]*highest_other, indices > lose_to)
+    votes_to_gain = np.where(np.isfinite(lowest_other), np.maximum(votes_to_gain, 0), np.inf)
+    gain_from = np.where(np.isfinite(lowest_other), gain_from, -1)
+    lose_possible = (seats > 0) & np.isfinite(highest_other) & (divisors[np.maximum(seats - 1, 0)] > 0)
+    votes_to_lose = np.where(lose_possible, np.maximum(votes_to_lose, 0), np.inf)
+    lose_to = np.where(lose_possible, lose_to, -1)
+
+    votes_to_gain[~eligible] = np.nan
+    votes_to_lose[~eligible] = np.nan
+    return votes_to_gain, gain_from, votes_to_lose, lose_to
+
+
+def _hamilton_seats(scores: np.ndarray, num_seats: int, quota: str) -> np.ndarray:
+    """ Apportion one house size with Hamilton's method for each row of scores (scenarios x candidates), O(N log N) per row.
+    Integer scores are divided exactly like hamilton_quotients(), and ties go to the candidate added first.
+    """
+    score_sums = scores.sum(axis=1, keepdims=True)
+    if scores.dtype.kind == "f":
+        quotas = score_sums/num_seats if quota == "hare" else np.floor(1 + score_sums/(1 + num_seats))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            remainders, seats = np.modf(scores/quotas)
+        seats = np.nan_to_num(seats).astype(np.int64)
+    else: # remainders are integers over a common denominator per row
+        if int(score_sums.max(initial=0)) >= 2**62//max(num_seats, 1):
+            scores, score_sums = scores.astype(object), score_sums.astype(object) # Python integers do not overflow
+        if quota == "hare":
+            numerators, denominators = scores*num_seats, np.maximum(score_sums, 1)
+        else:
+            numerators, denominators = scores, 1 + score_sums//(1 + num_seats)
+        seats, remainders = (numerators//denominators).astype(np.int64), numerators % denominators
+    return largest_remainders(seats, remainders, num_seats)
+
+
+def _seats_with_changes(scores: np.ndarray, indices: np.ndarray, changes: np.ndarray, num_seats: int, quota: str) -> np.ndarray:
+    """ Return the seats of candidate indices[r] when only its score changes by changes[r], with one scenario row per change. """
+    rows = np.arange(len(indices))
+    changed = np.repeat(scores[np.newaxis], len(indices), axis=0)
+    if scores.dtype.kind != "f":
+        if int(scores.sum()) + int(np.abs(changes).max(initial=0)) >= 2**62:
+            changed, changes = changed.astype(object), np.array([int(change) for change in changes], dtype=object) # Python integers do not overflow
+        else:
+            changes = changes.astype(np.int64)
+    changed[rows, indices] += changes
+    return _hamilton_seats(changed, num_seats, quota)[rows, indices]
+
+
+def _bisect_margins(low: np.ndarray, high: np.ndarray, possible: np.ndarray, changes_seats) -> np.ndarray:
+    """ Narrow every possible margin in low < margin <= high down to a whole number of votes, all rows at once.
+    changes_seats(rows, changes) tells for each row if the change is enough to change the seats. Integer bounds stay exact.
+    """
+    searching = possible & (high - low > 1).astype(bool)
+    while searching.any():
+        rows = np.flatnonzero(searching)
+        middle = (low[rows] + high[rows])//2
+        changed = changes_seats(rows, middle)
+        high[rows[changed]] = middle[changed]
+        low[rows[~changed]] = middle[~changed]
+        searching[rows] = (high[rows] - low[rows] > 1).astype(bool)
+    return np.where(possible, high.astype(float), np.inf)
+
+
+def hamilton_margins(scores: np.ndarray,
+                     num_seats: int,
+                     quota: str = "hare",
+                     eligible: Union[np.ndarray, None] = None) -> tuple[np.ndarray, np.ndarray]:
+    """ Calculate the smallest whole number of votes each candidate must gain or lose to change its number of seats
+    with Hamilton's method, when all other scores stay the same.
+
+    The quota moves with the candidate's own score, so there is no closed form like for divisor methods.
+    A candidate's seats only grow with its own score, so the margins are found with an exponential and binary search.
+    The search runs for all candidates at once: each step apportions one scenario per candidate as a (N x N) array,
+    so there are O(log V) vectorized steps and O(N^2 log N log V) work in total, for N candidates and margins of up
+    to V votes. Integer scores are kept as integers, so remainders are compared exactly.
+
+    Returns:
+        Two arrays: votes to gain a seat and votes to lose a seat. Impossible changes are inf, ineligible candidates NaN.
+    """
+    scores = np.asarray(scores)
+    if scores.dtype.kind not in "iuf":
+        scores = scores.astype(float)
+    if eligible is None:
+        eligible = np.ones(len(scores), dtype=bool)
+    scores = np.where(eligible, scores, 0)
+    seats = _hamilton_seats(scores[np.newaxis], num_seats, quota)[0]
+    votes_to_gain = np.full(len(scores), np.nan)
+    votes_to_lose = np.full(len(scores), np.nan)
+
+    def gains(rows: np.ndarray, changes: np.ndarray) -> np.ndarray:
+        return _seats_with_changes(scores, gaining[rows], changes, num_seats, quota) > seats[gaining[rows]]
+
+    def loses(rows: np.ndarray, changes: np.ndarray) -> np.ndarray:
+        return _seats_with_changes(scores, losing[rows], -changes, num_seats, quota) < seats[losing[rows]]
+
+    # double the gain until it wins a seat, then search the last doubling
+    gaining = np.flatnonzero(eligible & (seats < num_seats))
+    limit = 1e6*max(scores.sum(), 1)
+    if scores.dtype.kind == "f":
+        high = np.ones(len(gaining))
+    else: # search whole votes exactly, also past the precision of floats
+        high = np.ones(len(gaining), dtype=np.int64 if limit < 2**62 else object)
+    possible = np.ones(len(gaining), dtype=bool)
+    doubling = possible.copy()
+    while doubling.any():
+        rows = np.flatnonzero(doubling)
+        gained = gains(rows, high[rows])
+        doubling[rows[gained]] = False
+        rows = rows[~gained]
+        high[rows] *= 2
+        too_far = rows[(high[rows] > limit).astype(bool)]
+        possible[too_far] = doubling[too_far] = False
+    low = np.where(high > 1, high//2, 0).astype(high.dtype)
+    votes_to_gain[gaining] = _bisect_margins(low, high, possible, gains)
+    votes_to_gain[eligible & (seats >= num_seats)] = np.inf
+
+    # a candidate that keeps its seats without any votes can't lose one
+    losing = np.flatnonzero(eligible & (seats > 0))
+    high = np.floor(scores[losing]) if scores.dtype.kind == "f" else scores[losing].copy()
+    possible = loses(np.arange(len(losing)), high)
+    votes_to_lose[losing] = _bisect_margins(np.zeros_like(high), high, possible, loses)
+    votes_to_lose[eligible & (seats == 0)] = np.inf
+    return votes_to_gain, votes_to_lose
+
+
+def vote_margins(distribution: Distribution) -> pd.DataFrame:
+    """ Calculate how many votes each candidate must gain or lose to change its number of seats.
+
+    Supported for divisor methods (DivisorMethod subclasses, e.g. StLague, DHondt, HuntingtonHill) and Hamilton. Each margin assumes the scores
+    of all other candidates stay the same, and the thresholds are not recalculated. Knock-on effects on leveling
+    seats are not included, see leveling_effects().
+
+    Args:
+        distribution: The distribution to analyse. It is calculated if needed.
+
+    Returns:
+        A dataframe indexed by candidate name, with columns seats, votes_to_gain, gain_from, votes_to_lose and lose_to.
+        gain_from/lose_to name the candidate the seat would be taken from/given to (divisor methods only).
+    """
+    seats = distribution.result.to_numpy()
+    scores = distribution.score_array
+    eligible = distribution.eligible_mask()
+    names = distribution.name_list
+
+    if isinstance(distribution, Hamilton):
+        votes_to_gain, votes_to_lose = hamilton_margins(scores, distribution.num_seats, distribution.quota_name, eligible)
+        gain_from = lose_to = [None]*len(names)
+    elif hasattr(distribution, "divisor_table"):
+        divisors = distribution.divisor_table(int(seats.max(initial=0)) + 1) # type: ignore
+        votes_to_gain, gain_index, votes_to_lose, lose_index = divisor_margins(scores, seats, divisors, eligible)
+        gain_from = [names[index] if index >= 0 else None for index in gain_index]
+        lose_to = [names[index] if index >= 0 else None for index in lose_index]
+    else:
+        raise TypeError(f"Vote margins are not supported for {type(distribution).__name__}")
+
+    return pd.DataFrame({
+        "seats": seats,
+        "votes_to_gain": votes_to_gain,
+        "gain_from": gain_from,
+        "votes_to_lose": votes_to_lose,
+        "lose_to": lose_to,
+    }, index=names)
+
+
+def leveling_effects(districts: Union[Iterable[_District], dict[str, _District]],
+                     district: Union[str, int],
+                     total_seats: int,
+                     method: Union[DivisorMethod, type] = StLague,
+                     threshold: Union[float, int] = 0,
+                     seat_exemption: Union[int, None] = None,
+                     overhang: str = "exclude",
+                     parties: Sequence[Union[str, Party]] = ()) -> pd.DataFrame:
+    """ Calculate the knock-on effects of the vote margins of one district on the national seats, when the house is
+    topped up with leveling seats, see leveling_seats().
+
+    The votes that change a district seat also count in the national totals, and the changed district seats are
+    subtracted from the leveling seats, so a district seat gained can be taken back from the leveling seats of the
+    same candidate, or move a leveling seat between other parties. Each gain and loss of the vote_margins() of the
+    district is one scenario, recalculated in the district, and the leveling seats of all the scenarios are
+    calculated at once.
+
+    Args:
+        districts: All the districts, or a dict of them. Each must have a distribution.
+        district: The name of the district to change, or its position in districts.
+        total_seats, method, threshold, seat_exemption, overhang: The national leveling rules, see leveling_seats().
+        parties: The parties (or candidate IDs) first in the national columns, see SwingModel.
+
+    Returns:
+        The vote_margins() dataframe of the district, with the columns total_change_on_gain and total_change_on_lose,
+        the change in the candidate's national seats (district and leveling seats), and changes_on_gain and
+        changes_on_lose, a dict with the change of every candidate whose national seats change. Margins that are
+        impossible or of ineligible candidates get NaN and an empty dict.
+    """
+    model = SwingModel(districts, parties)
+    row = district if isinstance(district, int) else [d.name for d in model.districts].index(district)
+    distribution: Distribution = model.districts[row].distribution # type: ignore
+    margins = vote_margins(distribution)
+    positions = model.positions(row)
+
+    won = np.zeros(model.baseline.shape, dtype=np.int64)
+    for other, other_district in enumerate(model.districts):
+        won[other, model.positions(other)] = other_district.distribution.result.to_numpy() # type: ignore
+
+    # scenario 0 is the election as it is, then one per possible gain and loss
+    scenarios = [(column, index, sign*change) for sign, column in [(1, "votes_to_gain"), (-1, "votes_to_lose")]
+                 for index, change in enumerate(margins[column].to_numpy()) if np.isfinite(change)]
+    votes = np.repeat(model.baseline[np.newaxis], len(scenarios) + 1, axis=0)
+    seats = np.repeat(won[np.newaxis], len(scenarios) + 1, axis=0)
+    changed = distribution.fork()
+    integer_scores = distribution.score_array.dtype.kind != "f"
+    for scenario, (_, index, change) in enumerate(scenarios, start=1):
+        scores = distribution.score_array.copy()
+        scores[index] += int(change) if integer_scores else change
+        changed.set_score_array(scores)
+        votes[scenario, row, positions] = scores
+        seats[scenario, row, positions] = changed.result.to_numpy()
+    totals = seats.sum(axis=1) + model.leveling(votes, seats, total_seats, method, threshold, seat_exemption, overhang)
+    differences = totals[1:] - totals[0]
+
+    names = [candidate.name if isinstance(candidate, Party) else candidate for candidate in model.candidates]
+    total_change = {"votes_to_gain": np.full(len(positions), np.nan), "votes_to_lose": np.full(len(positions), np.nan)}
+    changes: dict[str, list[dict]] = {"votes_to_gain": [{} for _ in positions], "votes_to_lose": [{} for _ in positions]}
+    for (column, index, _), difference in zip(scenarios, differences):
+        total_change[column][index] = difference[positions[index]]
+        changes[column][index] = {names[position]: int(difference[position]) for position in np.flatnonzero(difference)}
+
+    return margins.assign(total_change_on_gain=total_change["votes_to_gain"],
+                          changes_on_gain=changes["votes_to_gain"],
+                          total_change_on_lose=total_change["votes_to_lose"],
+                          changes_on_lose=changes["votes_to_lose"])
+
+
+def seat_margins(distribution: Distribution) -> pd.DataFrame:
+    """ List every awarded seat of a divisor method with the number of votes its holder can lose before the seat goes
+    to another candidate, sorted with the closest seats first.
+
+    Returns:
+        A dataframe with columns candidate, seat (1 for a candidate's first seat), quotient and votes_to_lose.
+    """
+    if not hasattr(distribution, "divisor_table"):
+        raise TypeError(f"Seat margins are only supported for divisor methods, not {type(distribution).__name__}")
+
+    seats = distribution.result.to_numpy()
+    scores = distribution.score_array.astype(float)
+    eligible = distribution.eligible_mask()
+    divisors = distribution.divisor_table(int(seats.max(initial=0)) + 1) # type: ignore
+
+    with np.errstate(divide="ignore"):
+        next_losing = np.where(eligible, scores/divisors[seats], -np.inf)
+    highest_other, lose_to = _lowest_excluding_self(-next_losing)
+    highest_other = -highest_other
+
+    candidates = np.repeat(np.arange(len(seats)), seats)
+    seat_numbers = np.arange(len(candidates)) - np.repeat(np.cumsum(seats) - seats, seats)
+    seat_divisors = divisors[seat_numbers]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quotients = scores[candidates]/seat_divisors
+        votes_to_lose = _smallest_change(scores[candidates] - seat_divisors*highest_other[candidates], candidates > lose_to[candidates])
+    votes_to_lose = np.where((seat_divisors > 0) & np.isfinite(highest_other[candidates]), np.maximum(votes_to_lose, 0), np.inf)
+
+    names = distribution.name_list
+    seat_df = pd.DataFrame({
+        "candidate": [names[index] for index in candidates],
+        "seat": seat_numbers + 1,
+        "quotient": quotients,
+        "votes_to_lose": votes_to_lose,
+    })
+    return seat_df.sort_values("votes_to_lose", kind="stable").reset_index(drop=True)
@@ -0,0 +1,305 @@
+from typing import Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pylections.party import Party
+from .district import _District
+from .distribution.distribution import largest_quotients
+
+
+class BiproportionalConvergenceError(Exception):
+    """ To be raised if the alternating scaling does not reach both the district and the party seat totals """
+
+
+def _apportion_rows(weights: np.ndarray,
+                    house_sizes: np.ndarray,
+                    divisors: Union[np.ndarray, None] = None) -> tuple[np.ndarray, np.ndarray]:
+    """ Apportion each row of weights with Sainte-Lague and its own house size, all rows at once.
+
+    The seats start as the standard rounding of weight/divisor, using the given divisors (e.g. from the previous
+    step of an iteration) or row sum/house size. That is a Sainte-Lague apportionment of some house size close
+    to the right one, so a row that is e seats short gets the e largest of the next e quotients of each column,
+    like the sequential method would continue. Likewise, a row with e seats too many loses the e smallest of its
+    last e quotients of each column. Equal quotients go to the column with the lower index.
+
+    Returns:
+        The seats (same shape as weights) and a divisor for each row, halfway between the last quotient that won
+        a seat and the first that did not, so that seats = round(weights/divisor). Rows without seats get an infinite divisor.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        estimate = np.where(house_sizes > 0, weights.sum(axis=1)/house_sizes, np.inf)
+        if divisors is not None:
+            estimate = np.where(np.isfinite(divisors) & (divisors > 0), divisors, estimate)
+        seats = np.floor(weights/estimate[:, np.newaxis] + 0.5).astype(np.int64)
+        for _ in range(2): # scale the divisors by the seat shortage, so few seats are left for the exact correction
+            totals = seats.sum(axis=1)
+            scale = np.where(totals > 0, totals/np.maximum(house_sizes, 1), 0.5)
+            off = (totals != house_sizes) & (house_sizes > 0) & (np.abs(totals - house_sizes) > 1)
+            if not off.any():
+                break
+            estimate[off] *= scale[off]
+            seats[off] = np.floor(weights[off]/estimate[off, np.newaxis] + 0.5)
+
+    missing = house_sizes - seats.sum(axis=1)
+    add = np.flatnonzero(missing > 0)
+    if len(add):
+        steps = np.arange(missing[add].max())
+        quotients = weights[add, :, np.newaxis]/(seats[add, :, np.newaxis] + 0.5 + steps)
+        seats[add] += largest_quotients(quotients, missing[add]).sum(axis=2)
+    remove = np.flatnonzero(missing < 0)
+    if len(remove):
+        steps = np.arange(-missing[remove].min())
+        remaining = seats[remove, :, np.newaxis] - steps # the seat whose quotient is considered
+        with np.errstate(divide="ignore"):
+            quotients = np.where(remaining > 0, weights[remove, :, np.newaxis]/(remaining - 0.5), np.inf)
+        # select the smallest quotients, and of equal quotients the one in the higher column
+        selected = largest_quotients(-quotients[:, ::-1, :], -missing[remove])[:, ::-1, :]
+        seats[remove] -= selected.sum(axis=2)
+
+    with np.errstate(divide="ignore"):
+        last_in = np.where(seats > 0, weights/(seats - 0.5), np.inf).min(axis=1, initial=np.inf)
+    first_out = (weights/(seats + 0.5)).max(axis=1, initial=0)
+    return seats, np.where(np.isfinite(last_in), (last_in + first_out)/2, np.inf)
+
+
+def _fractional_column_divisors(votes: np.ndarray, row_seats: np.ndarray, column_seats: np.ndarray, iterations: int = 100) -> np.ndarray:
+    """ Scale each vote matrix (scenarios x rows x columns) to the row and column seats without rounding
+    (iterative proportional fitting), and return the column divisors (scenarios x columns).
+    The rounded problem is usually solved a few steps from there.
+    """
+    column_factors = np.ones(column_seats.shape)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(iterations):
+            row_factors = np.where(row_seats > 0, row_seats/np.einsum("srp,sp->sr", votes, column_factors), 0)
+            new_factors = np.where(column_seats > 0, column_seats/np.einsum("sr,srp->sp", row_factors, votes), 0)
+            converged = np.allclose(new_factors, column_factors, rtol=1e-9, atol=0)
+            column_factors = new_factors
+            if converged:
+                break
+        return np.where(column_factors > 0, 1/column_factors, np.inf)
+
+
+def _transfer_seats(votes: np.ndarray, seats: np.ndarray, column_seats: np.ndarray) -> np.ndarray:
+    """ Move seats within rows, from columns with too many seats to columns with too few, until the column sums are met.
+
+    Seat k of a cell costs log((k - 0.5)/votes), and a biproportional apportionment is the seat matrix with the lowest
+    total cost for its row and column sums. Each move follows the cheapest chain of transfers from a column with too
+    many seats to one with too few, where a transfer takes a seat from one cell and gives it to another cell in the
+    same row. The cheapest transfer between every pair of columns is one (min, +) reduction over the rows,
+    and the chain is found with Bellman-Ford over the columns.
+    """
+    seats = seats.copy()
+    num_columns = seats.shape[1]
+    columns = np.arange(num_columns)
+    with np.errstate(divide="ignore"):
+        log_votes = np.log(votes)
+    while True:
+        excess = seats.sum(axis=0) - column_seats
+        if not excess.any():
+            return seats
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cost_in = np.log(seats + 0.5) - log_votes # cost of the next seat of each cell
+            cost_out = np.where(seats > 0, np.log(np.maximum(seats - 0.5, 0.5)) - log_votes, -np.inf) # cost saved by removing the last seat
+            moves = cost_in[:, np.newaxis, :] - cost_out[:, :, np.newaxis] # moves[i, j, k]: move a seat in row i from column j to k
+        move_cost = moves.min(axis=0)
+        move_cost[columns, columns] = np.inf
+
+        distance = np.where(excess > 0, 0.0, np.inf)
+        previous = np.full(num_columns, -1)
+        for _ in range(num_columns):
+            candidates = distance[:, np.newaxis] + move_cost
+            best_from = np.argmin(candidates, axis=0)
+            best = candidates[best_from, columns]
+            improved = best < distance - 1e-12
+            if not improved.any():
+                break
+            distance[improved] = best[improved]
+            previous[improved] = best_from[improved]
+        else:
+            raise BiproportionalConvergenceError("The seat transfers did not converge")
+
+        targets = np.flatnonzero((excess < 0) & np.isfinite(distance))
+        if len(targets) == 0:
+            raise BiproportionalConvergenceError("There is no apportionment that meets both the row and the column seats")
+        column = targets[np.argmin(distance[targets])]
+        while previous[column] >= 0: # walk back to the column the chain started from
+            source = previous[column]
+            row = np.argmin(moves[:, source, column]) # only the rows of the moves on the chain are looked up
+            seats[row, source] -= 1
+            seats[row, column] += 1
+            column = source
+
+
+def _divisors(votes: np.ndarray, seats: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Find row and column divisors so that seats = round(votes/(row divisor*column divisor)).
+
+    In logarithms, every cell gives two difference constraints between its row and its column,
+    which are solved as shortest paths with Bellman-Ford, one vectorized pass over the matrix per iteration.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_votes = np.log(votes)
+        upper = np.where(seats > 0, log_votes - np.log(np.maximum(seats - 0.5, 0.5)), np.inf) # log column divisor + log row divisor <= upper
+        lower = np.where(votes > 0, np.log(seats + 0.5) - log_votes, np.inf) # -(log column divisor + log row divisor) <= lower
+    rows = np.zeros(len(seats)) # minus the log row divisors
+    columns = np.zeros(seats.shape[1]) # the log column divisors
+    for _ in range(len(rows) + len(columns) + 1):
+        new_columns = np.minimum(columns, (rows[:, np.newaxis] + upper).min(axis=0))
+        new_rows = np.minimum(rows, (new_columns[np.newaxis, :] + lower).min(axis=1))
+        if np.allclose(new_columns, columns, rtol=0, atol=1e-12) and np.allclose(new_rows, rows, rtol=0, atol=1e-12):
+            break
+        rows, columns = new_rows, new_columns
+    else:
+        raise BiproportionalConvergenceError("No divisors were found for the seats")
+    return np.exp(-rows), np.exp(columns)
+
+
+def biproportional_apportionment(votes: np.ndarray,
+                                 row_seats: np.ndarray,
+                                 column_seats: np.ndarray,
+                                 max_iterations: int = 100) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Find the seats of each cell of a vote matrix so that the row sums and column sums are met (double proportionality).
+
+    Alternating scaling: every row is apportioned exactly with Sainte-Lague, given the current column divisors,
+    which gives new row divisors. Then every column is apportioned given the row divisors, and so on.
+    This gets close fast, but can take many steps for the last few seats, so as soon as a step does not reduce
+    the number of misplaced seats, the rest are moved with exact seat transfers between columns (see _transfer_seats()).
+
+    Several scenarios (e.g. Monte Carlo draws) can be passed at once as a 3-D array. They are scaled together,
+    with the rows of all scenarios in one array operation per step.
+
+    Args:
+        votes: Vote matrix (rows x columns), e.g. districts x parties, or an array of them (scenarios x rows x columns).
+        row_seats: Seats of each row, (rows) or (scenarios x rows).
+        column_seats: Seats of each column, (columns) or (scenarios x columns). Must have the same sum as row_seats.
+        max_iterations: Largest number of alternating scaling steps before switching to transfers.
+
+    Returns:
+        The seat matrix, the row divisors and the column divisors, so that seats = round(votes/(row divisor*column divisor)),
+        with a leading scenario axis if votes is 3-D. Exact ties between quotients are broken by the order of the rows and columns.
+
+    Raises:
+        BiproportionalConvergenceError if no apportionment meets both the row and column seats.
+    """
+    votes = np.asarray(votes, dtype=float)
+    single = votes.ndim == 2
+    if single:
+        votes = votes[np.newaxis]
+    num_scenarios, num_rows, num_columns = votes.shape
+    row_seats = np.broadcast_to(np.asarray(row_seats, dtype=np.int64), (num_scenarios, num_rows))
+    column_seats = np.broadcast_to(np.asarray(column_seats, dtype=np.int64), (num_scenarios, num_columns))
+    if (row_seats.sum(axis=1) != column_seats.sum(axis=1)).any():
+        raise ValueError("The row seats and column seats must have the same sum")
+    votes = np.where((row_seats[:, :, np.newaxis] > 0) & (column_seats[:, np.newaxis, :] > 0), votes, 0) # cells that can't get seats
+    has_votes = votes > 0
+    if ((~has_votes.any(axis=2)) & (row_seats > 0)).any() or ((~has_votes.any(axis=1)) & (column_seats > 0)).any():
+        raise ValueError("Every row and column with seats needs votes in a column or row with seats")
+
+    seats = np.zeros(votes.shape, dtype=np.int64)
+    column_divisors = _fractional_column_divisors(votes, row_seats, column_seats)
+    row_divisors = np.full((num_scenarios, num_rows), np.nan) # no estimate yet
+    misplaced = np.full(num_scenarios, np.inf)
+    active = np.arange(num_scenarios) # scenarios that are still being scaled
+    for _ in range(max_iterations):
+        step_seats, step_divisors = _apportion_rows((votes[active]/column_divisors[active, np.newaxis, :]).reshape(-1, num_columns),
+                                                    row_seats[active].reshape(-1), row_divisors[active].reshape(-1))
+        seats[active] = step_seats.reshape(len(active), num_rows, num_columns)
+        row_divisors[active] = step_divisors.reshape(len(active), num_rows)
+        previous, misplaced[active] = misplaced[active], np.abs(seats[active].sum(axis=1) - column_seats[active]).sum(axis=1)
+        active = active[(misplaced[active] > 0) & (misplaced[active] < previous)] # stop the solved and the stalled scenarios
+        if len(active) == 0:
+            break
+        weights = (votes[active]/row_divisors[active, :, np.newaxis]).transpose(0, 2, 1).reshape(-1, num_rows)
+        _, step_divisors = _apportion_rows(weights, column_seats[active].reshape(-1), column_divisors[active].reshape(-1))
+        column_divisors[active] = step_divisors.reshape(len(active), num_columns)
+
+    for scenario in np.flatnonzero(misplaced > 0):
+        seats[scenario] = _transfer_seats(votes[scenario], seats[scenario], column_seats[scenario])
+        row_divisors[scenario], column_divisors[scenario] = _divisors(votes[scenario], seats[scenario])
+    if single:
+        return seats[0], row_divisors[0], column_divisors[0]
+    return seats, row_divisors, column_divisors
+
+
+class Biproportional:
+    def __init__(self,
+                 districts: Sequence[_District],
+                 parties: Sequence[Party],
+                 party_seats: Union[Sequence[int], None] = None,
+                 max_iterations: int = 100) -> None:
+        """ Biproportional apportionment (e.g. the Zurich "doppelter Pukelsheim") of seats to parties in districts.
+
+        The seats of each district are the num_seats of its distribution, and the votes of each party in a district
+        are its score there. The party seats are apportioned with Sainte-Lague over Party.total_votes, unless given.
+        The district results then meet both the district and the party seat totals.
+
+        Args:
+            districts: The districts, each with a distribution holding the party scores.
+            parties: The parties, with total_votes set for the upper apportionment.
+            party_seats: Seats of each party, to skip the upper apportionment.
+            max_iterations: See biproportional_apportionment().
+        """
+        self.districts = list(districts)
+        self.parties = list(parties)
+        self.party_seats = party_seats
+        self.max_iterations = max_iterations
+        self._row_divisors: Union[np.ndarray, None] = None
+        self._column_divisors: Union[np.ndarray, None] = None
+
+    def vote_matrix(self) -> np.ndarray:
+        """ Return the votes of each party in each district (districts x parties). Parties missing in a district have 0 votes. """
+        votes = np.zeros((len(self.districts), len(self.parties)))
+        for row, district in enumerate(self.districts):
+            distribution = district.distribution
+            if distribution is None:
+                raise ValueError(f"District {district.name} has no distribution")
+            scores = distribution.score_array
+            for column, party in enumerate(self.parties):
+                if party in distribution:
+                    votes[row, column] = scores[distribution.index_of(party)]
+        return votes
+
+    def district_seats(self) -> np.ndarray:
+        """ Return the number of seats of each district. """
+        return np.array([district.distribution.num_seats for district in self.districts], dtype=np.int64) # type: ignore
+
+    def upper_apportionment(self) -> np.ndarray:
+        """ Return the seats of each party, apportioned with Sainte-Lague over their total_votes unless party_seats is set. """
+        if self.party_seats is not None:
+            return np.asarray(self.party_seats, dtype=np.int64)
+        total_votes = np.array([[party.total_votes for party in self.parties]], dtype=float)
+        seats, _ = _apportion_rows(total_votes, np.array([self.district_seats().sum()]))
+        return seats[0]
+
+    def calculate(self) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """ Calculate the seats of each party in each district.
+
+        Returns:
+            The seats as a dataframe (district names x party names), the district divisors and the party divisors.
+        """
+        seats, self._row_divisors, self._column_divisors = biproportional_apportionment(
+            self.vote_matrix(), self.district_seats(), self.upper_apportionment(), self.max_iterations)
+        seat_df = pd.DataFrame(seats,
+                               index=[district.name for district in self.districts],
+                               columns=[party.name for party in self.parties])
+        return seat_df, self._row_divisors, self._column_divisors
+
+    @property
+    def result(self) -> dict[str, dict[Party, int]]:
+        """ Return the seats of each party, for each district name. """
+        seat_df, _, _ = self.calculate()
+        return {district.name: dict(zip(self.parties, (int(seats) for seats in seat_df.iloc[row])))
+                for row, district in enumerate(self.districts)}
+
+    @property
+    def district_divisors(self) -> Union[np.ndarray, None]:
+        """ The district divisors of the last calculation. """
+        return self._row_divisors
+
+    @property
+    def party_divisors(self) -> Union[np.ndarray, None]:
+        """ The party divisors of the last calculation. """
+        return self._column_divisors
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Biproportional, districts={len(self.districts)}, parties={len(self.parties)} at {hex(id(self))}>"
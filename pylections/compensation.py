@@ -0,0 +1,346 @@
+from typing import Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pylections.party import Party
+from .distribution.distribution import DivisorMethod, StLague, DHondt, apportion_batch
+
+
+OVERHANG_RULES = ("exclude", "keep", "balance")
+
+
+def _divisor_table(method: Union[DivisorMethod, type], size: int) -> np.ndarray:
+    """ Return the divisor table of a divisor method instance or class, e.g. StLague(0, initial_divisor=1.4) or DHondt. """
+    if isinstance(method, type) and issubclass(method, DivisorMethod):
+        method = method(0)
+    if not isinstance(method, DivisorMethod):
+        raise ValueError(f"The method must be a divisor method, but was: {method}")
+    return method.divisor_table(max(size, 1))
+
+
+def _as_rows(votes: np.ndarray, won: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Return votes and won seats as (scenarios x parties) arrays. """
+    votes = np.atleast_2d(np.asarray(votes, dtype=float))
+    won = np.broadcast_to(np.asarray(won, dtype=np.int64), votes.shape)
+    if (won < 0).any():
+        raise ValueError("The won seats can't be negative")
+    return votes, won
+
+
+def threshold_mask(votes: np.ndarray,
+                   won: np.ndarray,
+                   threshold: Union[float, int] = 0,
+                   seat_exemption: Union[int, None] = None) -> np.ndarray:
+    """ Return which parties may get compensation seats.
+
+    Args:
+        votes: Party votes, (parties) or (scenarios x parties).
+        won: Seats each party has won already (e.g. constituency seats), same shape as votes.
+        threshold: Percent of the votes a party needs, e.g. 4 in Norway or 5 in New Zealand.
+        seat_exemption: Number of won seats that qualifies a party regardless of the threshold,
+            e.g. 1 electorate in New Zealand. None for no exemption.
+
+    Returns:
+        Boolean mask with the same shape as votes.
+    """
+    single = np.ndim(votes) == 1
+    votes, won = _as_rows(votes, won)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = 100*votes/votes.sum(axis=1, keepdims=True)
+    eligible = (share >= threshold) & (votes > 0)
+    if seat_exemption is not None:
+        eligible |= won >= seat_exemption
+    return eligible[0] if single else eligible
+
+
+def additional_member_seats(votes: np.ndarray,
+                            won: np.ndarray,
+                            num_seats: Union[int, np.ndarray],
+                            method: Union[DivisorMethod, type] = DHondt,
+                            threshold: Union[float, int] = 0,
+                            seat_exemption: Union[int, None] = None) -> np.ndarray:
+    """ Award a fixed number of additional seats with a divisor method seeded with the won seats,
+    like the regional list seats of the Scottish and Welsh additional member system.
+
+    A party with k won seats competes for its first additional seat with votes/d(k), so the won seats are divisor
+    offsets. Parties with more won seats than their share just get no additional seats, the number of
+    additional seats is fixed.
+
+    Args:
+        votes: Party (list) votes, (parties) or (scenarios x parties), e.g. one row per simulation draw.
+        won: Seats each party has won already, same shape as votes.
+        num_seats: Number of additional seats, for all or for each scenario.
+        method: Divisor method instance or class giving the divisors, D'Hondt by default.
+        threshold: Percent of the votes a party needs for additional seats.
+        seat_exemption: See threshold_mask().
+
+    Returns:
+        The additional seats of each party, with the same shape as votes.
+    """
+    single = np.ndim(votes) == 1
+    votes, won = _as_rows(votes, won)
+    num_seats = np.broadcast_to(np.asarray(num_seats, dtype=np.int64), (len(votes),))
+    eligible = threshold_mask(votes, won, threshold, seat_exemption)
+    table = _divisor_table(method, int(won.max(initial=0) + num_seats.max(initial=0)))
+    seats = apportion_batch(votes, num_seats, table, seeds=won, eligible=eligible)
+    return seats[0] if single else seats
+
+
+def minimal_house_size(votes: np.ndarray,
+                       minimum_seats: np.ndarray,
+                       method: Union[DivisorMethod, type] = StLague,
+                       eligible: Union[np.ndarray, None] = None) -> np.ndarray:
+    """ Return the smallest house size where a divisor method gives every party at least its minimum seats,
+    like the enlarged Bundestag, where the house grows until no party has overhang seats.
+
+    Instead of trying one house size after the other, the size is found directly: a party has its minimum seats
+    once the quotient of its last needed seat is awarded, and the last of those quotients to be awarded (the lowest)
+    decides the house size. It is the number of quotients above that quotient, counted with a binary search in the
+    divisor table for each party, plus the quotient itself. The count is then checked with an apportionment of that
+    size and one seat less, and moved by a seat if rounding put it off.
+
+    Args:
+        votes: Party votes, (parties) or (scenarios x parties).
+        minimum_seats: The seats each party must get at least, same shape as votes.
+        method: Divisor method instance or class, Sainte-Lague by default.
+        eligible: Optional mask of parties that may get seats. Parties that may not need a minimum of 0.
+
+    Returns:
+        The house size of each scenario, or an int for a single row of votes.
+    """
+    single = np.ndim(votes) == 1
+    votes, minimum_seats = _as_rows(votes, minimum_seats)
+    eligible = np.ones(votes.shape, dtype=bool) if eligible is None else np.atleast_2d(np.asarray(eligible, dtype=bool))
+    if ((minimum_seats > 0) & ~eligible).any():
+        raise ValueError("Parties that can't get seats can't have minimum seats")
+
+    size = max(int(minimum_seats.sum(axis=1).max(initial=0)), 1)
+    while True:
+        table = _divisor_table(method, 2*size)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            needed = table[np.maximum(minimum_seats - 1, 0)]
+            needed = np.where(minimum_seats > 0, np.where(needed == 0, np.inf, votes/needed), np.inf)
+            last = needed.min(axis=1) # the quotient of the last needed seat that is awarded
+            if (last <= 0).any():
+                raise ValueError("A party without votes can't be given a minimum of seats")
+            above = np.searchsorted(table, np.where(eligible, votes/last[:, np.newaxis], 0), side="left")
+        if (above < len(table)).all():
+            break
+        size = 2*len(table)
+    house_sizes = np.where(np.isfinite(last), above.sum(axis=1) + 1, minimum_seats.sum(axis=1))
+    table = _divisor_table(method, int(house_sizes.max(initial=0)) + votes.shape[1])
+
+    def satisfied(rows: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        seats = apportion_batch(votes[rows], sizes, table, eligible=eligible[rows])
+        return (seats >= minimum_seats[rows]).all(axis=1)
+
+    rows = np.arange(len(votes))
+    while len(rows): # rounding can put the count a seat off, so check it
+        rows = rows[~satisfied(rows, house_sizes[rows])]
+        house_sizes[rows] += 1
+    rows = np.flatnonzero(house_sizes > 0)
+    while len(rows):
+        rows = rows[satisfied(rows, house_sizes[rows] - 1)]
+        house_sizes[rows] -= 1
+        rows = rows[house_sizes[rows] > 0]
+    return int(house_sizes[0]) if single else house_sizes
+
+
+def leveling_seats(votes: np.ndarray,
+                   won: np.ndarray,
+                   total_seats: Union[int, np.ndarray],
+                   method: Union[DivisorMethod, type] = StLague,
+                   threshold: Union[float, int] = 0,
+                   seat_exemption: Union[int, None] = None,
+                   overhang: str = "exclude") -> np.ndarray:
+    """ Top up the won seats of each party to its proportional share of the whole house, like the leveling seats
+    in Norway, Sweden and Denmark or the list seats of New Zealand's MMP.
+
+    The total_seats are apportioned over the parties that pass the threshold, after taking out the seats won by
+    parties that don't. Each party then gets the difference between its proportional seats and its won seats.
+    A party that has won more seats than its proportional share (overhang) is handled with the overhang rule:
+
+    - "exclude": the party keeps its won seats and is left out, and the rest of the seats are apportioned again
+      over the other parties, until no party has more won seats than its share (Nordic leveling seats).
+    - "keep": the party keeps its won seats, and the house grows by the overhang (New Zealand).
+    - "balance": the house grows until every party's proportional share is at least its won seats, so the other
+      parties get balance seats for the overhang (see minimal_house_size()).
+
+    All scenarios are solved at once, and the "exclude" rule only redoes the scenarios where a party was left out.
+
+    Args:
+        votes: Party votes, (parties) or (scenarios x parties), e.g. one row per simulation draw.
+        won: Seats each party has won already (e.g. district seats), same shape as votes.
+        total_seats: Number of seats in the house, including the leveling seats, for all or for each scenario.
+        method: Divisor method instance or class of the national apportionment, Sainte-Lague by default.
+            Norway uses StLague(0, initial_divisor=1.4).
+        threshold: Percent of the votes a party needs for leveling seats.
+        seat_exemption: See threshold_mask().
+        overhang: "exclude", "keep" or "balance", see above.
+
+    Returns:
+        The leveling seats of each party, with the same shape as votes. The total seats are won + leveling seats.
+    """
+    if overhang not in OVERHANG_RULES:
+        raise ValueError(f"The overhang rule must be one of {OVERHANG_RULES}, but was: {overhang}")
+    single = np.ndim(votes) == 1
+    votes, won = _as_rows(votes, won)
+    total_seats = np.broadcast_to(np.asarray(total_seats, dtype=np.int64), (len(votes),))
+    if (won.sum(axis=1) > total_seats).any():
+        raise ValueError("More seats are won than there are in the house")
+    active = threshold_mask(votes, won, threshold, seat_exemption)
+    house_sizes = total_seats - np.where(active, 0, won).sum(axis=1) # parties below the threshold keep their won seats
+    if overhang == "balance":
+        house_sizes = np.maximum(house_sizes, minimal_house_size(votes, np.where(active, won, 0), method, active))
+    table = _divisor_table(method, int(house_sizes.max(initial=0)))
+    proportional = apportion_batch(votes, house_sizes, table, eligible=active)
+    if overhang == "exclude":
+        rows = np.arange(len(votes))
+        while True:
+            over = active[rows] & (won[rows] > proportional[rows])
+            changed = over.any(axis=1) # the scenarios where parties are left out
+            if not changed.any():
+                break
+            rows, over = rows[changed], over[changed]
+            active[rows] &= ~over
+            house_sizes[rows] -= np.where(over, won[rows], 0).sum(axis=1)
+            proportional[rows] = apportion_batch(votes[rows], house_sizes[rows], table, eligible=active[rows])
+    seats = np.where(active, np.maximum(proportional - won, 0), 0)
+    return seats[0] if single else seats
+
+
+def enlarged_house_seats(state_votes: np.ndarray,
+                         direct_seats: np.ndarray,
+                         state_seats: np.ndarray,
+                         method: Union[DivisorMethod, type] = StLague,
+                         threshold: Union[float, int] = 5,
+                         seat_exemption: Union[int, None] = 3) -> np.ndarray:
+    """ Apportion a house that is enlarged until no party has overhang seats, like the Bundestag from 2013 to 2021.
+
+    1. The seats of each state are apportioned to the parties that pass the threshold, after the direct seats of
+       the other parties and independents are taken out.
+    2. Each party's minimum is the sum over the states of the larger of its direct seats and its state seats.
+    3. The house is enlarged to the smallest size where the national apportionment gives every party its
+       minimum (see minimal_house_size()).
+    4. The seats of each party are apportioned to its state lists, with the direct seats as seeds, so every list
+       gets at least its direct seats.
+
+    Every step is one batched apportionment over all scenarios (and states or parties).
+
+    Args:
+        state_votes: Votes of each party in each state, (parties x states) or (scenarios x parties x states).
+        direct_seats: Direct (constituency) seats of each party in each state, same shape as state_votes.
+        state_seats: Seats of each state before the enlargement, (states) or (scenarios x states).
+        method: Divisor method instance or class used in every step, Sainte-Lague by default.
+        threshold: Percent of the national votes a party needs for list seats.
+        seat_exemption: Number of direct seats that qualifies a party regardless of the threshold.
+
+    Returns:
+        The seats of each party in each state, with the same shape as state_votes.
+        The house size is the sum over parties and states.
+    """
+    state_votes = np.asarray(state_votes, dtype=float)
+    single = state_votes.ndim == 2
+    if single:
+        state_votes = state_votes[np.newaxis]
+    num_scenarios, num_parties, num_states = state_votes.shape
+    direct_seats = np.broadcast_to(np.asarray(direct_seats, dtype=np.int64), state_votes.shape)
+    state_seats = np.broadcast_to(np.asarray(state_seats, dtype=np.int64), (num_scenarios, num_states))
+
+    party_votes = state_votes.sum(axis=2)
+    party_direct_seats = direct_seats.sum(axis=2)
+    eligible = threshold_mask(party_votes, party_direct_seats, threshold, seat_exemption)
+    state_house_sizes = state_seats - np.where(eligible[:, :, np.newaxis], 0, direct_seats).sum(axis=1)
+    if (state_house_sizes < 0).any():
+        raise ValueError("More direct seats are won in a state than it has seats")
+
+    table = _divisor_table(method, int(state_house_sizes.max(initial=0)))
+    state_rows = apportion_batch(state_votes.transpose(0, 2, 1).reshape(-1, num_parties), state_house_sizes.ravel(), table,
+                                 eligible=np.repeat(eligible, num_states, axis=0))
+    contingents = state_rows.reshape(num_scenarios, num_states, num_parties).transpose(0, 2, 1)
+    minimum_seats = np.where(eligible, np.maximum(direct_seats, contingents).sum(axis=2), 0)
+
+    house_sizes = minimal_house_size(party_votes, minimum_seats, method, eligible)
+    table = _divisor_table(method, int(house_sizes.max(initial=0) + direct_seats.max(initial=0)))
+    party_seats = apportion_batch(party_votes, house_sizes, table, eligible=eligible)
+    list_seats = np.where(eligible, party_seats - party_direct_seats, 0)
+    seats = direct_seats + apportion_batch(state_votes.reshape(-1, num_states), list_seats.ravel(), table,
+                                           seeds=direct_seats.reshape(-1, num_states)).reshape(state_votes.shape)
+    return seats[0] if single else seats
+
+
+class Compensation:
+    def __init__(self,
+                 parties: Sequence[Party],
+                 num_seats: int,
+                 method: Union[DivisorMethod, type] = StLague,
+                 threshold: Union[float, int] = 0,
+                 seat_exemption: Union[int, None] = None,
+                 overhang: str = "exclude",
+                 additional: bool = False) -> None:
+        """ Compensation seats for mixed electoral systems, from the national votes and the seats won in districts.
+
+        The votes of each party are its total_votes and the won seats its seats_awarded. By default num_seats is the
+        size of the house and the parties get leveling seats up to their proportional share (see leveling_seats()).
+        With additional=True, num_seats additional seats are awarded with the won seats as divisor offsets,
+        like the Scottish additional member system (see additional_member_seats()).
+
+        Args:
+            parties: The parties, with total_votes and seats_awarded set.
+            num_seats: Size of the house, or number of additional seats if additional is True.
+            method: Divisor method instance or class, e.g. StLague(0, initial_divisor=1.4) or DHondt.
+            threshold: Percent of the votes a party needs for compensation seats.
+            seat_exemption: Number of won seats that qualifies a party regardless of the threshold.
+            overhang: "exclude", "keep" or "balance", see leveling_seats(). Not used for additional seats.
+            additional: Award num_seats additional seats instead of filling a house of num_seats.
+        """
+        self.parties = list(parties)
+        self.num_seats = num_seats
+        self.method = method
+        self.threshold = threshold
+        self.seat_exemption = seat_exemption
+        self.overhang = overhang
+        self.additional = additional
+
+    @property
+    def overhang(self) -> str:
+        return self._overhang
+
+    @overhang.setter
+    def overhang(self, value: str) -> None:
+        if value not in OVERHANG_RULES:
+            raise ValueError(f"The overhang rule must be one of {OVERHANG_RULES}, but was: {value}")
+        self._overhang = value
+
+    def compensation_seats(self) -> np.ndarray:
+        """ Return the compensation seats of each party, in the order of parties. """
+        votes = np.array([party.total_votes for party in self.parties], dtype=float)
+        won = np.array([party.seats_awarded for party in self.parties], dtype=np.int64)
+        if self.additional:
+            return additional_member_seats(votes, won, self.num_seats, self.method, self.threshold, self.seat_exemption)
+        return leveling_seats(votes, won, self.num_seats, self.method, self.threshold, self.seat_exemption, self.overhang)
+
+    def calculate(self) -> pd.DataFrame:
+        """ Calculate the compensation seats.
+
+        Returns:
+            A dataframe with the won, compensation and total seats (columns) of each party name (rows).
+        """
+        won = np.array([party.seats_awarded for party in self.parties], dtype=np.int64)
+        compensation = self.compensation_seats()
+        return pd.DataFrame({"won": won, "compensation": compensation, "total": won + compensation},
+                            index=[party.name for party in self.parties])
+
+    @property
+    def result(self) -> dict[Party, int]:
+        """ Return the compensation seats of each party. """
+        return dict(zip(self.parties, self.compensation_seats().tolist()))
+
+    @property
+    def total_result(self) -> dict[Party, int]:
+        """ Return the won and compensation seats of each party together. """
+        return {party: party.seats_awarded + seats for party, seats in self.result.items()}
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Compensation, num_seats={self.num_seats}, parties={len(self.parties)}, overhang={self.overhang} at {hex(id(self))}>"
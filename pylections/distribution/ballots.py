@@ -0,0 +1,297 @@
+import copy
+import hashlib
+from typing import Iterable, Iterator, Sequence, Union
+
+import numpy as np
+
+from .cache import ResultCache
+from .distribution import Distribution
+from .utils import CandidateDoesNotExistError
+from ..party import Party
+
+
+class Ballots:
+    def __init__(self) -> None:
+        """ Compressed store of ranked ballots.
+
+        Each ballot is a row of candidate indices, most preferred first, padded with -1 after the last ranked candidate.
+        Identical ballots are merged into one ballot type with a count, so a count of hundreds of thousands of ballots
+        is usually a few thousand rows. New ballots are collected and merged on the next access.
+        """
+        self._rankings = np.full((0, 1), -1, dtype=np.int32)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._pending: list[tuple[np.ndarray, np.ndarray]] = [] # added ballots that are not merged yet
+
+    @staticmethod
+    def _validate(rankings: np.ndarray) -> None:
+        if rankings.size == 0:
+            return
+        if (rankings < -1).any():
+            raise ValueError("Candidate indices in ballots must be non-negative, with -1 only as padding")
+        if ((rankings[:, 1:] >= 0) & (rankings[:, :-1] < 0)).any():
+            raise ValueError("Ballots can't rank a candidate after an empty position")
+        ordered = np.sort(rankings, axis=1)
+        if ((ordered[:, 1:] == ordered[:, :-1]) & (ordered[:, 1:] >= 0)).any():
+            raise ValueError("Ballots can't rank the same candidate more than once")
+
+    def add(self,
+            rankings: Union[np.ndarray, Sequence[Sequence[int]]],
+            counts: Union[np.ndarray, Sequence[Union[int, float]], None] = None) -> tuple[np.ndarray, np.ndarray]:
+        """ Add ballots.
+
+        Args:
+            rankings: 2-D integer array (ballots x ranks) of candidate indices padded with -1, or a sequence of rankings of any length.
+            counts: Number of ballots of each row (defaults to 1). Float counts are allowed for weighted ballots.
+
+        Returns:
+            The added ballots as (rankings, counts), without empty ballots.
+        """
+        if isinstance(rankings, np.ndarray):
+            rankings = np.atleast_2d(rankings).astype(np.int32)
+        else:
+            width = max((len(ranking) for ranking in rankings), default=1)
+            padded = np.full((len(rankings), max(width, 1)), -1, dtype=np.int32)
+            for row, ranking in enumerate(rankings):
+                padded[row, :len(ranking)] = ranking
+            rankings = padded
+        if counts is None:
+            counts = np.ones(len(rankings), dtype=np.int64)
+        counts = np.asarray(counts)
+        if not np.issubdtype(counts.dtype, np.integer):
+            counts = counts.astype(np.float64)
+        if counts.shape != (len(rankings),):
+            raise ValueError("Need one count for each ballot")
+        self._validate(rankings)
+
+        keep = (rankings[:, 0] >= 0) & (counts > 0) # empty ballots are not counted
+        self._pending.append((rankings[keep], counts[keep]))
+        return self._pending[-1]
+
+    def _compress(self) -> None:
+        """ Merge the pending ballots into the ballot types. """
+        if not self._pending:
+            return
+        parts = [(self._rankings, self._counts)] + self._pending
+        self._pending = []
+        width = max(part[0].shape[1] for part in parts)
+        rankings = np.concatenate([np.pad(part[0], ((0, 0), (0, width - part[0].shape[1])), constant_values=-1) for part in parts])
+        counts = np.concatenate([part[1] for part in parts])
+
+        if len(rankings) == 0:
+            self._rankings, self._counts = rankings.reshape(0, width), counts
+            return
+        base = int(rankings.max()) + 2
+        if width*np.log2(base) < 62: # pack each row into one integer, which is much faster to sort than rows
+            keys = (rankings.astype(np.int64) + 1) @ (base**np.arange(width - 1, -1, -1, dtype=np.int64))
+            _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+            unique = rankings[first]
+        else:
+            unique, inverse = np.unique(rankings, axis=0, return_inverse=True)
+        self._counts = np.bincount(inverse.reshape(-1), weights=counts, minlength=len(unique)).astype(counts.dtype)
+        used_width = max(int((unique >= 0).sum(axis=1).max()), 1) # drop padding columns nobody uses
+        self._rankings = np.ascontiguousarray(unique[:, :used_width])
+
+    def remove_candidate(self, index: int) -> None:
+        """ Remove a candidate from every ballot, moving later preferences up, and renumber the candidates after it. """
+        self._compress()
+        rankings = self._rankings.copy()
+        rankings[rankings == index] = -1
+        order = np.argsort(rankings < 0, axis=1, kind="stable") # move the remaining preferences to the front, keeping their order
+        rankings = np.take_along_axis(rankings, order, axis=1)
+        rankings[rankings > index] -= 1
+        keep = rankings[:, 0] >= 0
+        counts = self._counts[keep]
+        self._rankings = np.full((0, rankings.shape[1]), -1, dtype=np.int32)
+        self._counts = self._counts[:0]
+        self._pending = [(rankings[keep], counts)] # ballots that became identical are merged again
+        self._compress()
+
+    @property
+    def rankings(self) -> np.ndarray:
+        """ Read-only array of the ballot types (types x ranks), padded with -1. """
+        self._compress()
+        rankings = self._rankings.view()
+        rankings.flags.writeable = False
+        return rankings
+
+    @property
+    def counts(self) -> np.ndarray:
+        """ Read-only array with the number of ballots of each type. """
+        self._compress()
+        counts = self._counts.view()
+        counts.flags.writeable = False
+        return counts
+
+    @property
+    def num_ballots(self) -> Union[int, float]:
+        """ The total number of ballots. """
+        return self.counts.sum().item()
+
+    def first_preferences(self, num_candidates: int) -> np.ndarray:
+        """ Return the number of first preferences of each candidate. """
+        counts = np.bincount(self.rankings[:, 0], weights=self.counts, minlength=num_candidates)
+        return counts.astype(self._counts.dtype)
+
+    def chunks(self, chunk_size: int = 65536) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+        """ Iterate over the ballot types in chunks of (rankings, counts). """
+        rankings, counts = self.rankings, self.counts
+        for start in range(0, len(counts), chunk_size):
+            yield rankings[start:start + chunk_size], counts[start:start + chunk_size]
+
+    def pairwise_matrix(self, num_candidates: int, chunk_size: int = 65536) -> np.ndarray:
+        """ Return the pairwise preference matrix of the ballots, see pairwise_matrix(). """
+        return pairwise_matrix(self.chunks(chunk_size), num_candidates)
+
+    def digest(self) -> str:
+        """ A hash of the ballot types and counts, used in result cache keys. """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(self.rankings, dtype=np.int32).tobytes())
+        digest.update(np.ascontiguousarray(self.counts, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def copy(self) -> "Ballots":
+        """ Return a copy that shares the ballot arrays. They are replaced, never changed, so this is cheap. """
+        ballots = copy.copy(self)
+        ballots._pending = list(self._pending)
+        return ballots
+
+    def __len__(self) -> int:
+        """ The number of distinct ballot types. """
+        return len(self.counts)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Ballots, ballots={self.num_ballots}, types={len(self)} at {hex(id(self))}>"
+
+
+def pairwise_matrix(chunks: Iterable[tuple[np.ndarray, np.ndarray]], num_candidates: int) -> np.ndarray:
+    """ Accumulate the pairwise preference matrix from chunks of ballots in one pass.
+
+    Entry [i, j] is the number of ballots that rank i above j. A ranked candidate is preferred to every
+    unranked candidate, and unranked candidates are tied. For each rank, the ballots add their count to the
+    row of the candidate at that rank, for every candidate not ranked yet, with one bincount.
+
+    Args:
+        chunks: Iterable of (rankings, counts), like Ballots.chunks(). Can be a generator reading ballots from disk.
+        num_candidates: Number of candidates.
+
+    Returns:
+        A float array (candidates x candidates).
+    """
+    matrix = np.zeros(num_candidates*num_candidates)
+    columns = np.arange(num_candidates)
+    for rankings, counts in chunks:
+        rows = np.arange(len(counts))
+        not_ranked = np.ones((len(counts), num_candidates), dtype=bool)
+        for rank in range(rankings.shape[1]):
+            candidates = rankings[:, rank]
+            valid = candidates >= 0
+            if not valid.any():
+                break
+            not_ranked[rows[valid], candidates[valid]] = False
+            pairs = candidates[valid, np.newaxis]*num_candidates + columns
+            weights = not_ranked[valid]*np.asarray(counts, dtype=float)[valid, np.newaxis]
+            matrix += np.bincount(pairs.ravel(), weights=weights.ravel(), minlength=len(matrix))
+    return matrix.reshape(num_candidates, num_candidates)
+
+
+class RankedDistribution(Distribution):
+    def __init__(self, num_seats: int) -> None:
+        """ Base class for methods that distribute seats based on ranked ballots.
+
+        Add ballots with add_ballots(). The score of each candidate is its number of first preferences,
+        so thresholds and shares work like for the other methods, while calculate() counts the ballots.
+        Candidates that are excluded or below a threshold are treated as withdrawn before the count.
+        """
+        super().__init__(num_seats)
+        self._ballots = Ballots()
+
+    def add_ballots(self,
+                    ballots: Union[np.ndarray, Sequence[Sequence[Union[str, Party]]]],
+                    counts: Union[np.ndarray, Sequence[Union[int, float]], None] = None) -> None:
+        """ Add ranked ballots.
+
+        Candidates that do not yet exist will be created, in the order they are first seen.
+
+        Args:
+            ballots: Rankings as sequences of candidate IDs or Party objects, most preferred first. Alternatively a 2-D
+                integer array (ballots x ranks) of candidate indices in the order the candidates were added, padded with -1.
+            counts: Number of ballots of each ranking (defaults to 1), e.g. for pre-aggregated ballot types.
+        """
+        if isinstance(ballots, np.ndarray):
+            rankings = np.atleast_2d(ballots)
+            if not np.issubdtype(rankings.dtype, np.integer):
+                raise ValueError("Ballot arrays must contain integer candidate indices")
+            if rankings.size and rankings.max() >= self.num_candidates:
+                raise CandidateDoesNotExistError("Ballots refer to a candidate index which has not been added.")
+        else:
+            rankings = []
+            for ranking in ballots:
+                indices = []
+                for candidate in ranking:
+                    index = self._index.get(candidate)
+                    if index is None:
+                        if not isinstance(candidate, (str, Party)):
+                            raise ValueError(f"Incorrect type passed for candidate, expected string or Party, got {type(candidate)}")
+                        index = self._append_candidate(candidate)
+                    indices.append(index)
+                rankings.append(indices)
+
+        self._invalidate()
+        added, added_counts = self._ballots.add(rankings, counts)
+        # the first preferences are the candidate scores
+        first_preferences = np.bincount(added[:, 0], weights=added_counts, minlength=self.num_candidates)
+        if np.issubdtype(added_counts.dtype, np.floating) and self._scores.dtype != np.float64:
+            self._scores = self._scores.astype(np.float64)
+        self._own_scores()
+        self._scores[:self.num_candidates] += first_preferences.astype(self._scores.dtype)
+        self._score_sum += added_counts.sum().item()
+
+    def add_score(self,
+                  candidates: Union[str, list[str], tuple[str, ...],
+                                    dict[str, float], dict[str, int],
+                                    Party, list[Party], tuple[Party, ...],
+                                    dict[Party, float], dict[Party, int]],
+                  score: Union[int, list[int], tuple[int, ...],
+                               float, list[float], tuple[float, ...], None] = None,
+                  reset: bool = False) -> None:
+        """ Add candidates with a score of 0, e.g. to fix their order before adding ballots.
+
+        The scores are the first preferences of the ballots, so any other score raises a ValueError. Use add_ballots().
+        """
+        if isinstance(candidates, (str, Party)):
+            index = self._index.get(candidates)
+            if score != 0 or (reset and index is not None and self._scores[index] != 0):
+                raise ValueError("The scores of a ranked distribution are the first preferences of its ballots, use add_ballots()")
+        super().add_score(candidates, score, reset)
+
+    def set_score_array(self, scores: Union[np.ndarray, list[int], list[float]]) -> None:
+        """ Not supported, the scores are the first preferences of the ballots. Use add_ballots(). """
+        raise ValueError("The scores of a ranked distribution are the first preferences of its ballots, use add_ballots()")
+
+    def remove_candidate(self, candidate: Union[str, Party]) -> None:
+        """ Remove a candidate from the calculation and from all ballots. Later preferences move up,
+        so the first preference scores are counted again.
+        """
+        if candidate not in self._index:
+            raise CandidateDoesNotExistError("Attempted to remove candidate which does not exist.")
+        index = self._index[candidate]
+        super().remove_candidate(candidate)
+        self._ballots.remove_candidate(index)
+        self._scores[:self.num_candidates] = self._ballots.first_preferences(self.num_candidates)
+        self._score_sum = self._ballots.num_ballots
+
+    def fork(self) -> "RankedDistribution":
+        """ Return a cheap copy of the distribution for what-if changes, see Distribution.fork(). The ballots are shared until changed. """
+        child = super().fork()
+        child._ballots = self._ballots.copy()
+        return child # type: ignore
+
+    @property
+    def ballots(self) -> Ballots:
+        """ The ballots of the distribution. Use add_ballots() to add more. """
+        return self._ballots
+
+    def _cache_key(self) -> bytes:
+        return ResultCache.make_key(type(self), self.num_seats,
+                                    {**self._parameters(), **self._threshold_parameters(), "ballots": self._ballots.digest()},
+                                    [str(key) for key in self._keys], self.score_array)
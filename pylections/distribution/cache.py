@@ -0,0 +1,194 @@
+import hashlib
+import mmap
+import os
+import struct
+from typing import Any, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError: # not available on Windows, where appends are left unlocked
+    fcntl = None
+
+
+class ResultCache:
+    MAGIC = b"PYLCACHE"
+    FORMAT_VERSION = 2
+    _HEADER = struct.Struct("<8sI4xQ") # magic, format version, generation (increased each time the file is replaced)
+    _RECORD = struct.Struct("<16s8sI4x") # key digest, method digest, number of candidates
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        """ Persistent on-disk store of calculated seat vectors.
+
+        Seat vectors are stored in a compact, append-only binary file keyed on a digest of
+        (method, algorithm version, parameters, number of seats, candidates and scores).
+        The file is memory-mapped for lookups, so multiple processes can read the same
+        cache concurrently without loading it into memory. Only the record headers are
+        scanned to build the in-process offset table; the seat data is read on demand.
+
+        Assign an instance to Distribution.result_cache (for all distributions) or to the
+        result_cache attribute of a single distribution to use it.
+
+        Args:
+            path: Path to the cache file. It will be created if it does not exist.
+        """
+        self.path = os.fspath(path)
+        self._map: Union[mmap.mmap, None] = None
+        self._stat: Union[tuple[int, int, int], None] = None
+        self._generation: Union[int, None] = None
+        self._offsets: dict[bytes, tuple[int, int]] = {}
+        self._scanned = 0
+        if not os.path.exists(self.path):
+            self._create()
+        self._refresh()
+
+    def _create(self) -> None:
+        """ Create the file with its header in place, so other processes never see it without one. """
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as outfile:
+            outfile.write(self._HEADER.pack(self.MAGIC, self.FORMAT_VERSION, 0))
+        try:
+            os.link(temp_path, self.path) # fails if another process created the file first, which is fine
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+
+    @staticmethod
+    def _lock(fileobj) -> None:
+        if fcntl is not None:
+            fcntl.flock(fileobj.fileno(), fcntl.LOCK_EX)
+
+    def _open_locked(self, mode: str) -> Any:
+        """ Open the file and lock it. If invalidate() replaced the file while this waited for the lock,
+        the lock is on the old file, so the new file is opened and locked instead.
+        """
+        while True:
+            fileobj = open(self.path, mode)
+            self._lock(fileobj)
+            opened, current = os.fstat(fileobj.fileno()), os.stat(self.path)
+            if (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino):
+                return fileobj
+            fileobj.close()
+
+    @staticmethod
+    def method_digest(method: Union[type, str]) -> bytes:
+        """ Return the 8 byte digest identifying a distribution method in the cache file. """
+        name = method if isinstance(method, str) else method.__qualname__
+        return hashlib.blake2b(name.encode(), digest_size=8).digest()
+
+    @staticmethod
+    def make_key(method: type,
+                 num_seats: int,
+                 parameters: dict[str, Any],
+                 names: list[str],
+                 scores: np.ndarray) -> bytes:
+        """ Return the digest used to look up a seat vector.
+
+        The algorithm version of the method is part of the key, so entries calculated by an
+        older version of a method are never returned.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(method.__qualname__.encode())
+        digest.update(struct.pack("<qq", getattr(method, "_algorithm_version", 0), num_seats))
+        digest.update(repr(sorted(parameters.items())).encode())
+        digest.update("\x1f".join(names).encode())
+        digest.update(np.ascontiguousarray(scores, dtype=np.float64).tobytes())
+        return digest.digest()
+
+    def _refresh(self) -> None:
+        """ Remap the file if it has grown or been replaced, and index any new records. """
+        stat = os.stat(self.path)
+        current = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if current == self._stat:
+            return
+        if stat.st_size < self._HEADER.size: # created by an older version or still being written, not ready yet
+            self.close()
+            self._stat = None
+            return
+
+        with open(self.path, "rb") as infile:
+            new_map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, generation = self._HEADER.unpack_from(new_map, 0)
+        if magic != self.MAGIC or version != self.FORMAT_VERSION:
+            new_map.close()
+            raise ValueError(f"{self.path} is not a result cache of format version {self.FORMAT_VERSION}")
+        # a replaced file has a new generation. The inode is also compared, since it can't be reused while the old file is mapped
+        if self._stat is None or current[0] != self._stat[0] or generation != self._generation:
+            self._offsets = {}
+            self._scanned = self._HEADER.size
+        self.close()
+        self._map = new_map
+        self._stat = current
+        self._generation = generation
+
+        size = len(self._map)
+        position = self._scanned
+        while position + self._RECORD.size <= size:
+            key, _, num_candidates = self._RECORD.unpack_from(self._map, position)
+            data_start = position + self._RECORD.size
+            data_end = data_start + 8*num_candidates
+            if data_end > size: # partially written record, pick it up later
+                break
+            self._offsets[key] = (data_start, num_candidates)
+            position = data_end
+        self._scanned = position
+
+    def lookup(self, key: bytes) -> Union[np.ndarray, None]:
+        """ Return the stored seat vector for a key, or None if it is not in the cache. """
+        self._refresh()
+        if key not in self._offsets or self._map is None:
+            return None
+        offset, num_candidates = self._offsets[key]
+        return np.frombuffer(self._map, dtype="<i8", count=num_candidates, offset=offset).astype(int) # type: ignore
+
+    def store(self, key: bytes, method: type, seats: np.ndarray) -> None:
+        """ Append a seat vector to the cache file. """
+        seats = np.ascontiguousarray(seats, dtype="<i8")
+        record = self._RECORD.pack(key, self.method_digest(method), len(seats)) + seats.tobytes()
+        with self._open_locked("ab") as outfile:
+            outfile.write(record)
+
+    def invalidate(self, method: Union[type, str, None] = None) -> None:
+        """ Remove entries from the cache.
+
+        Args:
+            method: Distribution class (or its qualified name) whose entries should be removed.
+                If None, the whole cache is cleared.
+        """
+        method_digest = None if method is None else self.method_digest(method)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+
+        with self._open_locked("rb+"):
+            self._refresh()
+            with open(temp_path, "wb") as outfile:
+                outfile.write(self._HEADER.pack(self.MAGIC, self.FORMAT_VERSION, (self._generation or 0) + 1))
+                if method_digest is not None:
+                    position = self._HEADER.size
+                    while position < self._scanned:
+                        _, record_method, num_candidates = self._RECORD.unpack_from(self._map, position) # type: ignore
+                        record_end = position + self._RECORD.size + 8*num_candidates
+                        if record_method != method_digest:
+                            outfile.write(self._map[position:record_end]) # type: ignore
+                        position = record_end
+            os.replace(temp_path, self.path)
+
+        self._stat = None
+        self._refresh()
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __contains__(self, key: bytes) -> bool:
+        self._refresh()
+        return key in self._offsets
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self._offsets)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.ResultCache '{self.path}' with {len(self)} entries at {hex(id(self))}>"
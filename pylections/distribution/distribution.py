@@ -1,14 +1,22 @@
+import copy
+from fractions import Fraction
+from functools import lru_cache
 from typing import Any, Union, Iterable
 
 import numpy as np
 import pandas as pd
 
-from .utils import CandidateDoesNotExistError, Utils
+from .cache import ResultCache
+from .result import Result
+from .utils import CandidateDoesNotExistError, TieError, Utils
 from ..party import Party
 from ..quota import hare, droop
 
 
 class Distribution:
+    result_cache: Union[ResultCache, None] = None # persistent result store shared by all distributions, unless set on an instance
+    _algorithm_version = 1 # increase when a change to calculate() alters results, so stale cached results are not used
+
     def __init__(self, num_seats: int) -> None:
         """ Base class for various methods that distribute a given number of
         positions/seats etc. based one some score (votes, population, etc.).
@@ -16,12 +24,32 @@ class Distribution:
         Add candidates with add_score(id | Party, value) or set_score(id | Party, value).
         Each candidate is identified with a string ID, or it is a Party object.
 
+        Candidates can be kept out of the seat distribution with a threshold (percent of the
+        total score), an absolute_threshold (minimum score) or by adding them to excluded
+        (e.g. parties that failed a national threshold). They stay in the distribution, and
+        are awarded 0 seats.
+
+        Candidates that are exactly tied for a seat get it in the order they were added by default. Set tie_break to
+        "random" (with a seed) or "raise" to change this. The ties of the last calculation are listed in ties.
+
         Args:
             num_seats: Total number of seats available in the distribution.
         """
+        self._threshold: Union[float, int] = 0
+        self._absolute_threshold: Union[float, int] = 0
+        self._excluded: frozenset[Union[str, Party]] = frozenset()
+        self._tie_break = "first"
+        self._seed: Union[int, None] = None
+        self._ties: list[tuple[tuple[Union[str, Party], ...], int]] = []
+        self._tie_rng: Union[np.random.Generator, None] = None
         self.num_seats = num_seats
-        self._candidates: dict[Union[str, Party], Union[float, int]] = {}
-        self._result: dict[Union[str, Party], int] = {}
+        self._keys: list[Union[str, Party]] = [] # candidates in the order they were added
+        self._index: dict[Union[str, Party], int] = {} # position of each candidate in _keys and _scores
+        self._scores = np.zeros(8, dtype=np.int64) # score buffer, grown as needed. Upcast to float if a float score is added
+        self._score_sum: Union[float, int] = 0 # running sum of the scores
+        self._shares_scores = False # True while the score buffer is shared with a fork, see fork()
+        self._shares_candidates = False # True while _keys and _index are shared with a fork
+        self._result = Result((), ())
         self._is_calculated = False
         self._true_distribution = None
         self._score_share = None
@@ -104,14 +132,64 @@ class Distribution:
             raise ValueError(f"Incorrect type passed for candidate_id, expected string or Party, got {type(candidates)}")
         if not (isinstance(score, int) or isinstance(score, float)):
             raise ValueError(f"Incorrect type passed for score, expected float or int, got {type(score)}")
-        
-        self._is_calculated = False # set _is_calculated to False, because the calculation must be redone if scores have changed
+        if isinstance(score, float) and self._scores.dtype != np.float64:
+            self._scores = self._scores.astype(np.float64)
+
+        self._invalidate() # the calculation must be redone if scores have changed
+        index = self._index.get(candidates)
+        if index is None:
+            index = self._append_candidate(candidates)
+
+        old_score = self._scores[index].item()
+        new_score = score if reset else old_score + score
+        self._own_scores()
+        self._scores[index] = new_score
+        self._score_sum += new_score - old_score
+
+    def _append_candidate(self, candidate: Union[str, Party]) -> int:
+        """ Add a new candidate with zero score and return its index. """
+        self._own_candidates()
+        self._own_scores()
+        index = len(self._keys)
+        if index == len(self._scores):
+            grown = np.zeros(max(2*index, 8), dtype=self._scores.dtype) # a loaded buffer may be empty
+            grown[:index] = self._scores
+            self._scores = grown
+        self._scores[index] = 0
+        self._keys.append(candidate)
+        self._index[candidate] = index
+        return index
+
+    def fork(self) -> "Distribution":
+        """ Return a cheap copy of the distribution for what-if changes.
+
+        The fork shares the candidates, the score buffer and the result with this distribution, and each side copies
+        the buffers only before it first changes them (copy on write). An unchanged fork has the result without
+        calculating again. The Party objects are shared, not copied.
+        """
+        child = copy.copy(self)
+        self._shares_scores = self._shares_candidates = True
+        child._shares_scores = child._shares_candidates = True
+        return child
+
+    def _own_scores(self) -> None:
+        """ Copy the score buffer before changing it, if it is shared with a fork. """
+        if self._shares_scores:
+            self._scores = self._scores.copy()
+            self._shares_scores = False
+
+    def _own_candidates(self) -> None:
+        """ Copy the candidate list and index before changing them, if they are shared with a fork. """
+        if self._shares_candidates:
+            self._keys = list(self._keys)
+            self._index = dict(self._index)
+            self._shares_candidates = False
+
+    def _invalidate(self) -> None:
+        """ Mark the calculation and the derived shares as outdated. """
+        self._is_calculated = False
         self._true_distribution = None
-        if reset: self._candidates[candidates] = 0
-        if candidates in self._candidates:
-            self._candidates[candidates] += score
-        else:
-            self._candidates[candidates] = score
+        self._score_share = None
 
     def set_score(self,
                   candidates: Union[str, list[str], tuple[str, ...],
@@ -131,6 +209,27 @@ class Distribution:
         """
         self.add_score(candidates, score, reset=True)
 
+    def set_score_array(self, scores: Union[np.ndarray, list[int], list[float]]) -> None:
+        """ Set the scores of all candidates at once, in the order the candidates were added.
+        Much faster than set_score() when scores are fed from arrays, e.g. from aggregated vote counts.
+
+        Args:
+            scores: One score for each candidate.
+        """
+        scores = np.asarray(scores)
+        num_candidates = len(self._keys)
+        if scores.shape != (num_candidates,):
+            raise ValueError(f"Expected {num_candidates} scores, got an array of shape {scores.shape}")
+        if scores.dtype.kind not in "iuf":
+            raise ValueError(f"Incorrect type passed for scores, expected floats or ints, got {scores.dtype}")
+
+        self._invalidate() # the calculation must be redone if scores have changed
+        if scores.dtype.kind == "f" and self._scores.dtype != np.float64:
+            self._scores = self._scores.astype(np.float64)
+        self._own_scores()
+        self._scores[:num_candidates] = scores
+        self._score_sum = self._scores[:num_candidates].sum().item()
+
     def remove_candidate(self, candidate: Union[str, Party]) -> None:
         """ Remove a candidate from the calculation.
         
@@ -139,15 +238,126 @@ class Distribution:
         Args:
             candidate_id: ID for the candidate.
         """
-        self._is_calculated = False # set _is_calculated to False because the calculation must be redone
-        if candidate in self._candidates:
-            del self._candidates[candidate]
-        else:
+        if candidate not in self._index:
             raise CandidateDoesNotExistError("Attempted to remove candidate which does not exist.")
 
+        self._invalidate() # the calculation must be redone
+        self._own_candidates()
+        self._own_scores()
+        index = self._index.pop(candidate)
+        num_candidates = len(self._keys)
+        self._score_sum -= self._scores[index].item()
+        self._scores[index:num_candidates - 1] = self._scores[index + 1:num_candidates] # keep the order of the remaining candidates
+        del self._keys[index]
+        for position in range(index, num_candidates - 1):
+            self._index[self._keys[position]] = position
+
     def calculate(self) -> None:
         raise NotImplementedError("Method must be implemented in a subclass.")
 
+    def eligible_mask(self, scores: Union[np.ndarray, None] = None) -> np.ndarray:
+        """ Return a boolean array, True for each candidate that passes the thresholds and is not excluded.
+
+        Args:
+            scores: Other scores to check instead of the scores of the distribution, e.g. a projection,
+                in the order the candidates were added.
+        """
+        excluded = np.zeros(len(self._keys), dtype=bool)
+        for candidate in self._excluded:
+            if candidate in self._index:
+                excluded[self._index[candidate]] = True
+        return eligibility_mask(self.score_array if scores is None else scores, self._threshold, self._absolute_threshold, excluded)
+
+    def _eligible_score_sum(self) -> Union[float, int]:
+        """ The sum of the scores of the candidates that pass the thresholds. """
+        if self._threshold == 0 and self._absolute_threshold == 0 and not self._excluded:
+            return self._score_sum
+        return self.score_array[self.eligible_mask()].sum().item()
+
+    @property
+    def threshold(self) -> Union[int, float]:
+        """ Minimum percent of the total score a candidate needs to be awarded seats. """
+        return self._threshold
+
+    @threshold.setter
+    def threshold(self, value: Union[int, float]) -> None:
+        self._is_calculated = False
+        self._threshold = value
+
+    @property
+    def absolute_threshold(self) -> Union[int, float]:
+        """ Minimum score a candidate needs to be awarded seats. """
+        return self._absolute_threshold
+
+    @absolute_threshold.setter
+    def absolute_threshold(self, value: Union[int, float]) -> None:
+        self._is_calculated = False
+        self._absolute_threshold = value
+
+    @property
+    def excluded(self) -> frozenset[Union[str, Party]]:
+        """ Candidates that are not awarded seats regardless of their score. """
+        return self._excluded
+
+    @excluded.setter
+    def excluded(self, candidates: Iterable[Union[str, Party]]) -> None:
+        self._is_calculated = False
+        self._excluded = frozenset(candidates)
+
+    @property
+    def tie_break(self) -> str:
+        """ How exact ties for a seat are broken: "first" (the candidate added first), "random" (seeded with seed)
+        or "raise" (a TieError). Supported by the divisor methods, FirstPastThePost and Hamilton.
+        """
+        return self._tie_break
+
+    @tie_break.setter
+    def tie_break(self, value: str) -> None:
+        if value not in ("first", "random", "raise"):
+            raise ValueError("Tie break must be one of: {'first', 'random', 'raise'}")
+        self._is_calculated = False
+        self._tie_break = value
+
+    @property
+    def seed(self) -> Union[int, None]:
+        """ Seed for random tie breaks, so the results can be reproduced. """
+        return self._seed
+
+    @seed.setter
+    def seed(self, value: Union[int, None]) -> None:
+        self._is_calculated = False
+        self._seed = value
+
+    @property
+    def ties(self) -> list[tuple[tuple[Union[str, Party], ...], int]]:
+        """ The exact ties of the last calculation, as (tied candidates, number of seats they were tied for). """
+        return list(self._ties)
+
+    def _reset_ties(self) -> None:
+        self._ties = []
+        self._tie_rng = None
+
+    def _break_tie(self, tied: np.ndarray, num_winning: int) -> np.ndarray:
+        """ Choose num_winning of some tied quotients, given the candidate index of each (in the order added), with the tie_break.
+        The tie is recorded in ties.
+
+        Returns:
+            The positions in tied that win.
+        """
+        if num_winning >= len(tied):
+            return np.arange(len(tied))
+        candidates = tuple(self._keys[index] for index in dict.fromkeys(tied.tolist()))
+        self._ties.append((candidates, num_winning))
+        if self._tie_break == "raise":
+            names = ", ".join(candidate.name if isinstance(candidate, Party) else candidate for candidate in candidates)
+            raise TieError(f"{names} are tied for {num_winning} seat(s)", candidates, num_winning)
+        if self._tie_break == "random":
+            if self._tie_rng is None:
+                self._tie_rng = np.random.default_rng(self._seed)
+            rank = self._tie_rng.permutation(self.num_candidates) # a random order of the candidates
+            return np.lexsort((np.arange(len(tied)), rank[tied]))[:num_winning]
+        return np.arange(num_winning)
+
     def __getitem__(self, key: Union[str, Party]) -> tuple[Union[float, int], int]:
         """ Return the score of a candidate and its number awarded seats if the calculation has been completed (otherwise -1).
         
@@ -163,39 +373,159 @@ class Distribution:
             awarded_seats = self._result[key]
         else:
             awarded_seats = -1
-        if key in self._candidates:
-            return self._candidates[key], awarded_seats
+        if key in self._index:
+            return self._scores[self._index[key]].item(), awarded_seats
         else:
             raise CandidateDoesNotExistError("Candidate has not been added to the distribution.")
 
+    def __contains__(self, candidate: object) -> bool:
+        """ Return True if the candidate has been added to the distribution. """
+        return candidate in self._index
+
+    def index_of(self, candidate: Union[str, Party]) -> int:
+        """ Return the position of a candidate in candidates, score_array and the result.
+
+        Raises a CandidateDoesNotExistError if the candidate is not yet added.
+        """
+        index = self._index.get(candidate)
+        if index is None:
+            raise CandidateDoesNotExistError("Candidate has not been added to the distribution.")
+        return index
+
     @property
     def is_calculated(self) -> bool:
         """ Return True if the distribution of seats has been calculated. """
         return self._is_calculated
 
     @property
-    def result(self) -> dict[Union[str, Party], int]:
+    def result(self) -> Result:
+        """ Return the number of seats awarded to each candidate, as a read-only mapping.
+        The same object is returned until the result is calculated again, so it can be shared without copying.
+
+        If a result_cache is set, the result is looked up there before calculating, and stored there afterwards.
+        Results with exact ties, and unseeded random tie breaks, are not cached, since the ties of a cached result are not stored.
+        Calling calculate() directly always redoes the calculation (and returns the calculation details).
+        """
         if not self._is_calculated:
-            self.calculate()
-        return self._result.copy()
+            if self.result_cache is None or (self._tie_break == "random" and self._seed is None):
+                self._calculate_result()
+            elif not self._load_cached_result():
+                self._calculate_result()
+                self._store_cached_result()
+        return self._result
+
+    def _calculate_result(self) -> None:
+        """ Calculate the result only. Methods can skip the calculation details here. """
+        self.calculate()
+
+    def _set_result(self, seats: Union[np.ndarray, list[int]]) -> None:
+        """ Set the result from the seats of each candidate, in the order they were added. """
+        self._result = Result(self._keys, seats)
+
+    def _set_scores_keeping_result(self, scores: np.ndarray) -> None:
+        """ Set the scores of all candidates like set_score_array(), and keep the calculated result without calculating.
+        Only for callers that know the seats are the same for the new scores, e.g. PollPipeline.
+        """
+        if not self._is_calculated:
+            raise ValueError("There is no calculated result to keep")
+        result = self._result
+        self.set_score_array(scores)
+        self._result = result
+        self._is_calculated = True
+
+    def _set_arrays(self, keys: list[Union[str, Party]], scores: np.ndarray, result: Union[Result, None] = None,
+                    shared: bool = True) -> None:
+        """ Replace all candidates and scores at once, and set the result if it is already known (e.g. when loading a snapshot).
+        A shared score array (e.g. a read-only view of a file) is copied before the first change.
+        """
+        self._invalidate()
+        self._keys = keys
+        self._index = {key: index for index, key in enumerate(keys)}
+        self._shares_candidates = False
+        self._scores = scores
+        self._shares_scores = shared
+        self._score_sum = scores.sum().item()
+        if result is not None:
+            self._result = result
+            self._is_calculated = True
+
+    def _parameters(self) -> dict[str, Any]:
+        """ Return the method parameters (besides num_seats) that the result depends on. """
+        return {}
+
+    def _threshold_parameters(self) -> dict[str, Any]:
+        parameters = {"_threshold": self._threshold,
+                      "_absolute_threshold": self._absolute_threshold,
+                      "_excluded": sorted(str(candidate) for candidate in self._excluded)}
+        if self._tie_break != "first": # left out by default, so existing cache keys stay valid
+            parameters["_tie_break"] = self._tie_break
+            parameters["_seed"] = self._seed
+        return parameters
+
+    def _cache_key(self) -> bytes:
+        return ResultCache.make_key(type(self), self.num_seats, {**self._parameters(), **self._threshold_parameters()},
+                                    [str(key) for key in self._keys], self.score_array)
+
+    def _load_cached_result(self) -> bool:
+        """ Fill the result from the result cache. Returns False if the result was not found. """
+        seats = self.result_cache.lookup(self._cache_key()) # type: ignore
+        if seats is None or len(seats) != len(self._keys):
+            return False
+        has_result = seats >= 0
+        self._result = Result([key for key, stored in zip(self._keys, has_result) if stored], seats[has_result])
+        self._reset_ties() # only results without ties are stored
+        self._is_calculated = True
+        return True
+
+    def _store_cached_result(self) -> None:
+        """ Store the result in the result cache. Candidates without a result are stored as -1. """
+        if not self._is_calculated or self._ties: # a cache hit could not report or raise the ties
+            return
+        seats = np.array([self._result.get(key, -1) for key in self._keys], dtype=int)
+        self.result_cache.store(self._cache_key(), type(self), seats) # type: ignore
 
     @property
     def true_distribution(self) -> dict[Union[str, Party], float]:
         """ Returns the true distribution of seats each candidate should get given the total number of seats and its score. """
         if self._true_distribution is None:
-            score_sum = self.score_sum
-            divisor = score_sum/self.num_seats
-            self._true_distribution = {key: score/divisor for key, score in self._candidates.items()}
+            self._true_distribution = dict(zip(self._keys, self.true_distribution_array.tolist()))
         return self._true_distribution
 
     @property
     def score_share(self) -> dict[Union[str, Party], float]:
         """ Returns the percent of the total score each candidate has received. """
         if self._score_share is None:
-            score_sum = self.score_sum
-            self._score_share = {key: score/score_sum*100 for key, score in self._candidates.items()}
+            self._score_share = dict(zip(self._keys, self.score_share_array.tolist()))
         return self._score_share
 
+    @property
+    def score_array(self) -> np.ndarray:
+        """ Read-only view of the candidate scores, in the order the candidates were added.
+
+        The view follows later score updates, so copy it if a snapshot is needed.
+        """
+        scores = self._scores[:len(self._keys)]
+        scores.flags.writeable = False
+        return scores
+
+    @property
+    def score_share_array(self) -> np.ndarray:
+        """ Array of the percent of the total score each candidate has received, using the running score sum.
+        All zeros if there is no score yet.
+        """
+        if self._score_sum == 0:
+            return np.zeros(len(self._keys))
+        return self.score_array*(100/self._score_sum)
+
+    @property
+    def true_distribution_array(self) -> np.ndarray:
+        """ Array of the true (fractional) number of seats of each candidate, using the running score sum.
+        All zeros if there is no score yet.
+        """
+        if self._score_sum == 0:
+            return np.zeros(len(self._keys))
+        return self.score_array*(self.num_seats/self._score_sum)
+
     @property
     def vote_share(self) -> dict[Union[str, Party], float]:
         """ Returns the percent of the total score each candidate has received. """
@@ -211,19 +541,34 @@ class Distribution:
         self._true_distribution = None
         self._num_seats = value
 
+    @property
+    def num_candidates(self) -> int:
+        return len(self._keys)
+
+    @property
+    def candidates(self) -> tuple[Union[str, Party], ...]:
+        """ The candidate IDs/Parties in the order they were added, matching score_array. """
+        return tuple(self._keys)
+
     @property
     def name_list(self) -> list[str]:
         """ A list of all candidate names/IDs """
         output = [
             item.name if isinstance(item, Party)
             else item
-            for item in self._candidates.keys()
+            for item in self._keys
         ]
         return output
 
     @property
     def score_sum(self) -> Union[float, int]:
-        return sum(self._candidates.values())
+        """ The sum of all scores. Kept as a running sum, so reading it is O(1). """
+        return self._score_sum
+
+    @property
+    def _candidates(self) -> dict[Union[str, Party], Union[float, int]]:
+        """ The candidates and their scores as a dictionary. Built on access, so prefer _keys and score_array. """
+        return dict(zip(self._keys, self.score_array.tolist()))
 
     @classmethod
     def get(cls, num_seats: int,
@@ -239,68 +584,354 @@ class Distribution:
         return obj.result
 
 
-class StLague(Distribution):
-    def __init__(self,
-                 num_seats: int,
-                 initial_divisor: Union[float, int] = 1):
-        """ Distribute seats according to the StLague method. 
-        
-        Args:
-            initial_divisor: Set the initial divisor for the first seat. A higher value typically favors higher-scoring candidates.
+def eligibility_mask(scores: np.ndarray,
+                     threshold: Union[float, int, np.ndarray] = 0,
+                     absolute_threshold: Union[float, int, np.ndarray] = 0,
+                     excluded: Union[np.ndarray, None] = None) -> np.ndarray:
+    """ Return a boolean array, True for each score that passes the thresholds and is not excluded, like
+    Distribution.eligible_mask(), for the scores of one or many distributions.
+
+    Args:
+        scores: Candidate scores, (candidates) or (... x candidates), e.g. (scenarios x districts x candidates).
+        threshold: Minimum percent of the total score of a row. A number, or an array that broadcasts against the
+            row totals (scores summed over the last axis with keepdims), e.g. one per district.
+        absolute_threshold: Minimum score, a number or an array that broadcasts against scores.
+        excluded: Optional boolean mask of excluded candidates that broadcasts against scores.
+    """
+    scores = np.asarray(scores)
+    mask = np.ones(scores.shape, dtype=bool)
+    if np.any(np.asarray(threshold) > 0):
+        mask &= scores*100 >= threshold*scores.sum(axis=-1, keepdims=True)
+    if np.any(np.asarray(absolute_threshold) > 0):
+        mask &= scores >= absolute_threshold
+    if excluded is not None:
+        mask &= ~excluded
+    return mask
+
+
+@lru_cache(maxsize=256)
+def _cached_divisor_table(method: type, parameters: tuple, size: int) -> np.ndarray:
+    """ The divisor table of a method with the given divisor parameters, shared by all distributions using it. """
+    table = np.asarray(method._divisor_rule(np.arange(size), **dict(parameters)), dtype=float)
+    table.flags.writeable = False
+    return table
+
+
+def _scored_mask(scores: np.ndarray, divisors: np.ndarray, eligible: Union[np.ndarray, None]) -> Union[np.ndarray, None]:
+    """ Leave candidates without score out of the eligible mask if the first divisor is 0 (e.g. Adams and Dean).
+    Seats with divisor 0 are awarded without comparing quotients, so they only go to candidates with a score,
+    and the later seats of a candidate follow its first.
+    """
+    if len(divisors) == 0 or divisors[0] != 0:
+        return eligible
+    scored = np.asarray(scores) > 0
+    return scored if eligible is None else eligible & scored
+
+
+def _priority_entries(scores: np.ndarray,
+                      divisors: np.ndarray,
+                      eligible: Union[np.ndarray, None],
+                      num_seats: int) -> tuple[np.ndarray, np.ndarray]:
+    """ Return the quotients (candidates x seats) and the flat indices of the winning quotients, in the order they win. """
+    eligible = _scored_mask(scores, divisors, eligible)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quotients = np.where(divisors == 0, np.inf, scores[:, np.newaxis]/divisors)
+    if eligible is not None:
+        quotients[~eligible] = -np.inf
+    flat = quotients.ravel() # candidate-major, so a lower flat index is a candidate added earlier
+    num_awarded = min(num_seats, len(divisors)*(len(scores) if eligible is None else int(np.count_nonzero(eligible))))
+    if num_awarded == 0:
+        return quotients, np.zeros(0, dtype=int)
+
+    threshold = -np.partition(-flat, num_awarded - 1)[num_awarded - 1] # the lowest winning quotient
+    above = np.flatnonzero(flat > threshold)
+    tied = np.flatnonzero(flat == threshold)[:num_awarded - len(above)]
+    winning = np.concatenate((above, tied))
+    return quotients, winning[np.lexsort((winning, -flat[winning]))]
+
+
+def priority_list(scores: np.ndarray,
+                  divisors: np.ndarray,
+                  num_seats: int,
+                  eligible: Union[np.ndarray, None] = None) -> np.ndarray:
+    """ Return the candidate that wins each seat of a divisor method, in the order the seats are awarded.
+
+    Every candidate's score is divided by each divisor, and the num_seats largest quotients win. Only those are
+    sorted, after a partition. Of equal quotients, the candidate added first wins, like handing out the seats one
+    at a time. A divisor of 0 always wins the seat, for candidates with a score.
+
+    Args:
+        scores: Candidate scores.
+        divisors: Divisor table with at least num_seats entries, see DivisorMethod.divisor_table.
+        num_seats: Number of seats to award.
+        eligible: Optional mask of candidates that may win seats.
+
+    Returns:
+        Integer array with a candidate index for each awarded seat. Shorter than num_seats if no candidate is eligible.
+    """
+    divisors = divisors[:num_seats]
+    _, winning = _priority_entries(scores, divisors, eligible, num_seats)
+    return winning//len(divisors)
+
+
+def largest_quotients(quotients: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """ Mark the counts[r] largest quotients in each row r of a (rows x columns x seats) array, ties to the lower column. """
+    flat = quotients.reshape(len(quotients), -1)
+    ordered = -np.sort(-flat, axis=1)
+    threshold = np.take_along_axis(ordered, np.clip(counts - 1, 0, flat.shape[1] - 1)[:, np.newaxis], axis=1)
+    threshold[counts <= 0] = np.inf
+    above = flat > threshold
+    at = flat == threshold
+    room = counts[:, np.newaxis] - above.sum(axis=1, keepdims=True) # how many of the tied quotients are taken
+    return (above | (at & (np.cumsum(at, axis=1) <= room))).reshape(quotients.shape)
+
+
+def apportion_batch(scores: np.ndarray,
+                    num_seats: Union[int, np.ndarray],
+                    divisors: np.ndarray,
+                    seeds: Union[np.ndarray, None] = None,
+                    eligible: Union[np.ndarray, None] = None) -> np.ndarray:
+    """ Apportion each row of scores (rows x candidates) with a divisor method, all rows at once.
+
+    A candidate that already holds seeds[r, c] seats competes for its next seat with score/divisors[seeds + k],
+    so pre-awarded seats (e.g. won in constituencies) are divisor offsets, like continuing a sequential
+    apportionment that started from the seeds. The seats are first estimated with a common divisor per row,
+    counting the divisors below score/divisor with a binary search in the divisor table, and the divisor is
+    rescaled a few times. A row that is then e seats short gets the e largest of the next e quotients of each
+    candidate, and a row with e seats too many loses the e smallest of its last e quotients, so the result is the
+    same as handing out the seats one at a time. Equal quotients go to the candidate with the lower index, and a
+    divisor of 0 always wins for candidates with a score. The quotients are compared as floats, use a Distribution to detect exact ties.
+
+    Args:
+        scores: Candidate scores, one row per scenario (a single row may be 1-D).
+        num_seats: Number of seats to award in each row, on top of the seeds.
+        divisors: Divisor table, see DivisorMethod.divisor_table, with at least max(seeds) + max(num_seats) entries.
+        seeds: Optional seats each candidate holds already (same shape as scores).
+        eligible: Optional mask of candidates that may win seats (same shape as scores).
+
+    Returns:
+        The seats awarded in each row on top of the seeds, with the same shape as scores.
+    """
+    single = np.ndim(scores) == 1
+    scores = np.atleast_2d(np.asarray(scores, dtype=float))
+    num_rows, num_candidates = scores.shape
+    house_sizes = np.broadcast_to(np.asarray(num_seats, dtype=np.int64), (num_rows,))
+    seeds = np.zeros(scores.shape, dtype=np.int64) if seeds is None else np.atleast_2d(np.asarray(seeds, dtype=np.int64))
+    eligible = np.ones(scores.shape, dtype=bool) if eligible is None else np.atleast_2d(np.asarray(eligible, dtype=bool))
+    if len(divisors) < seeds.max(initial=0) + house_sizes.max(initial=0):
+        raise ValueError("The divisor table is too short for the seeds and number of seats.")
+    num_free = int(np.searchsorted(divisors, 0, side="right")) # divisors of 0 are always awarded
+    if num_free:
+        eligible = eligible & ((scores > 0) | (seeds >= num_free)) # but not to candidates without score, see _scored_mask()
+    has_candidates = eligible.any(axis=1)
+    eligible_scores = np.where(eligible, scores, 0)
+    least = np.where(eligible, num_free, 0)
+    most = np.where(eligible, seeds + house_sizes[:, np.newaxis], 0)
+
+    def estimate(divisor: np.ndarray, rows: Union[slice, np.ndarray]) -> np.ndarray:
+        """ The seats each candidate in the rows gets on top of its seeds, with a common divisor for each row. """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            counts = np.searchsorted(divisors, eligible_scores[rows]/divisor[rows, np.newaxis], side="left")
+        return np.maximum(np.clip(counts, least[rows], most[rows]) - seeds[rows], 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        seed_totals = np.where(eligible, seeds, 0).sum(axis=1)
+        target = house_sizes + seed_totals
+        total_score = eligible_scores.sum(axis=1)
+        # a candidate with a share p of the score should get about p*target seats, so start from the divisor of the target
+        divisor = np.where((target > 0) & (total_score > 0), total_score/divisors[np.clip(target, 0, len(divisors) - 1)], np.inf)
+    seats = estimate(divisor, slice(None))
+    low = np.zeros(num_rows) # values of 1/divisor known to give too few seats
+    high = np.full(num_rows, np.inf) # and too many
+    for _ in range(8): # Newton steps on 1/divisor within that bracket, so few seats are left for the exact correction
+        totals = seats.sum(axis=1)
+        off = np.flatnonzero(has_candidates & np.isfinite(divisor) & (np.abs(totals - house_sizes) > 1))
+        if not len(off):
+            break
+        inverse = 1/divisor[off]
+        short = totals[off] < house_sizes[off]
+        low[off] = np.where(short, np.maximum(low[off], inverse), low[off])
+        high[off] = np.where(short, high[off], np.minimum(high[off], inverse))
+        # seats per unit of 1/divisor, if the seats of the candidates above their seeds were proportional
+        slope = np.maximum(np.where(seats[off] > 0, seeds[off] + seats[off], 0).sum(axis=1), 1)/inverse
+        guess = inverse + (house_sizes[off] - totals[off])/slope
+        halfway = np.where(np.isfinite(high[off]), (low[off] + high[off])/2, 2*inverse)
+        divisor[off] = 1/np.where((guess > low[off]) & (guess < high[off]), guess, halfway)
+        seats[off] = estimate(divisor, off)
+
+    missing = np.where(has_candidates, house_sizes - seats.sum(axis=1), 0)
+    add = np.flatnonzero(missing > 0)
+    if len(add):
+        steps = np.arange(missing[add].max())
+        table = divisors[np.minimum((seeds + seats)[add, :, np.newaxis] + steps, len(divisors) - 1)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            quotients = np.where(table == 0, np.inf, scores[add, :, np.newaxis]/table)
+        quotients[~eligible[add, :, np.newaxis] | (steps >= missing[add, np.newaxis, np.newaxis])] = -np.inf # not eligible, or more than the row needs
+        available = np.count_nonzero(quotients > -np.inf, axis=(1, 2))
+        seats[add] += largest_quotients(quotients, np.minimum(missing[add], available)).sum(axis=2)
+    remove = np.flatnonzero(missing < 0)
+    if len(remove):
+        steps = np.arange(-missing[remove].min())
+        held = (seeds + seats)[remove, :, np.newaxis] - 1 - steps # the seat whose quotient is considered
+        table = divisors[np.maximum(held, 0)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            quotients = np.where(table > 0, scores[remove, :, np.newaxis]/table, np.finfo(float).max) # seats with divisor 0 are removed last
+        quotients[steps >= seats[remove, :, np.newaxis]] = np.inf # seeds can't be removed
+        # select the smallest quotients, and of equal quotients the one of the later candidate
+        selected = largest_quotients(-quotients[:, ::-1, :], -missing[remove])[:, ::-1, :]
+        seats[remove] -= selected.sum(axis=2)
+    return seats[0] if single else seats
+
+
+class DivisorMethod(Distribution):
+    _algorithm_version = 2 # near-equal quotients are compared exactly
+
+    def __init__(self, num_seats: int) -> None:
+        """ Base class for divisor (highest averages) methods.
+
+        A candidate with k seats competes for its next seat with score/d(k), where each method gives the divisors
+        d(k) for an array of k in _divisor_rule(). The divisor table is made once per method, parameters and table
+        size, and is shared by all distributions. The seats are then awarded from the priority list of all quotients,
+        see priority_list().
         """
         super().__init__(num_seats)
-        self.initial_divisor = initial_divisor
 
-    def _new_divisor(self, awarded_seats: int) -> int:
-        """ Calculate the divisor for a given number of awarded seats """
-        return awarded_seats*2 + 1
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray, **parameters: Any) -> np.ndarray:
+        """ Return the divisor for the next seat of a candidate holding each number of seats. """
+        raise NotImplementedError("Method must be implemented in a subclass.")
+
+    @classmethod
+    def _squared_divisors(cls, seats: np.ndarray, **parameters: Any) -> list[Union[Fraction, int]]:
+        """ Return the exact squares of the divisors for each number of seats, to compare near-equal quotients.
+        Squares let square root divisors be compared exactly. By default the decimal value of each divisor is used,
+        which is exact for divisors like 1.4.
+        """
+        return [Fraction(repr(divisor))**2 for divisor in cls._divisor_rule(seats, **parameters).tolist()]
+
+    def _divisor_parameters(self) -> dict[str, Any]:
+        """ Return the parameters passed to _divisor_rule(). """
+        return {}
+
+    def _exact_boundary(self, quotients: np.ndarray, winning: np.ndarray) -> np.ndarray:
+        """ Check the quotients close to the lowest winning quotient with exact arithmetic, and apply the
+        tie_break to exact ties. The float order is kept for all other quotients, so this is cheap.
+
+        Returns:
+            The flat indices of the winning quotients, in the order they win.
+        """
+        if len(winning) == 0:
+            return winning
+        flat = quotients.ravel()
+        threshold = flat[winning[-1]]
+        if np.isinf(threshold):
+            near = np.flatnonzero(flat == threshold) # divisors of 0
+        else:
+            near = np.flatnonzero(np.abs(flat - threshold) <= 1e-9*abs(threshold))
+        is_winning = np.zeros(len(flat), dtype=bool)
+        is_winning[winning] = True
+        num_near_winning = int(np.count_nonzero(is_winning[near]))
+        if num_near_winning == len(near):
+            return winning # every quotient close to the boundary wins, so nothing is decided by rounding
+
+        candidates, seats = np.divmod(near, quotients.shape[1])
+        squared_divisors = self._squared_divisors(seats, **self._divisor_parameters())
+        scores = self.score_array
+        exact = [Fraction(scores[candidate].item())**2/divisor if divisor else np.inf
+                 for candidate, divisor in zip(candidates.tolist(), squared_divisors)]
+        order = sorted(range(len(near)), key=lambda position: exact[position], reverse=True) # stable, so ties stay in the order added
+        boundary = exact[order[num_near_winning - 1]]
+        above = [position for position in order if exact[position] > boundary]
+        tied = np.array([position for position in range(len(near)) if exact[position] == boundary])
+        chosen = tied[self._break_tie(candidates[tied], num_near_winning - len(above))]
+
+        is_near = np.zeros(len(flat), dtype=bool)
+        is_near[near] = True
+        winning = np.concatenate((winning[~is_near[winning]], near[above], near[chosen]))
+        return winning[np.lexsort((winning, -flat[winning]))]
+
+    def divisor_table(self, max_seats: int) -> np.ndarray:
+        """ Return the divisors used for each seat, so that the score of a candidate
+        with k seats is divided by divisor_table[k] when competing for its next seat.
+        The returned array is read-only, since it is shared.
+        """
+        max_seats = int(max_seats) # also numpy integers, e.g. seeds.max() + num_seats
+        size = max(64, 1 << max(max_seats - 1, 0).bit_length()) # rounded up, so tables for nearby house sizes are reused
+        return _cached_divisor_table(type(self), tuple(sorted(self._divisor_parameters().items())), size)[:max_seats]
+
+    def _winners(self) -> np.ndarray:
+        """ Return the candidate index of each awarded seat, in the order the seats are awarded. """
+        self._reset_ties()
+        table = self.divisor_table(self.num_seats)
+        quotients, winning = _priority_entries(self.score_array, table, self.eligible_mask(), self.num_seats)
+        return self._exact_boundary(quotients, winning)//max(len(table), 1)
+
+    def _calculate_result(self) -> None:
+        self._set_result(np.bincount(self._winners(), minlength=self.num_candidates))
+        self._is_calculated = True
 
     def calculate(self) -> Union[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame], tuple[None, ...]]:
         """ Calculate the distribution.
-        
+
         Returns:
-            Three dataframes: score matrix, divisor matrix, awarded seats matrix
+            Three dataframes with a row for each awarded seat: score matrix (the quotient of each candidate
+            before the seat was awarded), divisor matrix, awarded seats matrix. Seats with divisor 0 (e.g. the
+            initial seats of HuntingtonHill) are awarded first without comparing quotients, and have no rows.
         """
-        self._result = {}
-        num_candidates = len(self._candidates)
+        self._result = Result((), ())
+        num_candidates = self.num_candidates
 
         if num_candidates == 0:
-            self._result = {}
+            self._result = Result((), ())
             self._is_calculated = True
             return (None, None, None)
 
-        awarded_seats = np.zeros(num_candidates, dtype = int)
-        score_array = np.array(list(self._candidates.values())) # requires Python 3.7+ because the preservation of order in the dictionary is important
-        divisor_array = np.full(num_candidates, self.initial_divisor)
+        winners = self._winners()
+        score_array = self.score_array
+        table = self.divisor_table(self.num_seats)
+        eligible = _scored_mask(score_array, table, self.eligible_mask())
+        awarded = np.zeros((len(winners), num_candidates), dtype=int)
+        awarded[np.arange(len(winners)), winners] = 1
+        awarded_seats_matrix = np.cumsum(awarded, axis=0)
+        divisor_matrix = table[awarded_seats_matrix - awarded] # the divisors before each seat was awarded
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score_matrix = np.where(eligible, score_array/divisor_matrix, -np.inf)
+        awarded_seats = awarded_seats_matrix[-1] if len(winners) else np.zeros(num_candidates, dtype=int)
+        compared = divisor_matrix[np.arange(len(winners)), winners] > 0
+        score_matrix, divisor_matrix, awarded_seats_matrix = score_matrix[compared], divisor_matrix[compared], awarded_seats_matrix[compared]
+
+        self._set_result(awarded_seats)
+
+        score_df = pd.DataFrame(score_matrix, columns=self.name_list)
+        divisor_df = pd.DataFrame(divisor_matrix, columns=self.name_list)
+        awarded_seats_df = pd.DataFrame(awarded_seats_matrix, columns=self.name_list)
 
-        score_matrix = []
-        divisor_matrix = []
-        awarded_seats_matrix = []
+        self._is_calculated = True
+        return score_df, divisor_df, awarded_seats_df
 
-        while np.sum(awarded_seats) < self.num_seats:
-            new_scores = score_array/divisor_array
-            next_seat_index = np.argmax(new_scores) # TODO: handle cases where multiple candidates have the same score
-            divisor_matrix.append(divisor_array.copy())
+    def _parameters(self) -> dict[str, Any]:
+        return self._divisor_parameters()
 
-            awarded_seats[next_seat_index] += 1
-            divisor_array[next_seat_index] = self._new_divisor(awarded_seats[next_seat_index])
 
-            score_matrix.append(new_scores.copy())
-            awarded_seats_matrix.append(awarded_seats.copy())
+class StLague(DivisorMethod):
+    def __init__(self,
+                 num_seats: int,
+                 initial_divisor: Union[float, int] = 1):
+        """ Distribute seats according to the StLague method.
 
-        for candidate_id, seats in zip(self._candidates.keys(), awarded_seats):
-            self._result[candidate_id] = seats
-        
+        Args:
+            initial_divisor: Set the initial divisor for the first seat. A higher value typically favors higher-scoring candidates.
+                Use 1.4 for the modified Sainte-Lague method.
+        """
+        super().__init__(num_seats)
+        self.initial_divisor = initial_divisor
 
-        score_df = pd.DataFrame(score_matrix)
-        divisor_df = pd.DataFrame(divisor_matrix)
-        awarded_seats_df = pd.DataFrame(awarded_seats_matrix)
-        score_df.columns = self.name_list
-        divisor_df.columns = self.name_list
-        awarded_seats_df.columns = self.name_list
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray, initial_divisor: Union[float, int] = 1) -> np.ndarray:
+        return np.where(seats == 0, initial_divisor, seats*2 + 1.0)
 
-        self._is_calculated = True
-        return score_df, divisor_df, awarded_seats_df
+    def _divisor_parameters(self) -> dict[str, Any]:
+        return {"initial_divisor": self.initial_divisor}
 
     @property
     def initial_divisor(self) -> Union[float, int]:
@@ -330,21 +961,70 @@ class StLague(Distribution):
 
 class DHondt(StLague):
     def __init__(self, num_seats: int, initial_divisor: Union[float, int] = 1):
-        """ Distribute seats according to the DHondt method. 
-        
+        """ Distribute seats according to the DHondt method.
+
         Args:
             initial_divisor: Set the initial divisor for the first seat. A higher value typically favors higher-scoring candidates.
         """
         super().__init__(num_seats, initial_divisor)
 
-    def _new_divisor(self, awarded_seats: int) -> int:
-        """ Calculate the divisor for a given number of awarded seats """
-        return awarded_seats + 1
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray, initial_divisor: Union[float, int] = 1) -> np.ndarray:
+        return np.where(seats == 0, initial_divisor, seats + 1.0)
 
     def __repr__(self) -> str:
         return f"<{__name__}.DHondt distribution with {self.num_seats} seats, initial_divisor={self.initial_divisor} at {hex(id(self))}>"
 
 
+class Dean(DivisorMethod):
+    _algorithm_version = 3 # candidates without score get no seat with divisor 0
+
+    def __init__(self, num_seats: int) -> None:
+        """ Distribute seats according to Dean's method, with the harmonic mean of k and k + 1 as divisors.
+        Every eligible candidate with a score gets a first seat.
+        """
+        super().__init__(num_seats)
+
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray) -> np.ndarray:
+        return seats*(seats + 1.0)/(seats + 0.5)
+
+    @classmethod
+    def _squared_divisors(cls, seats: np.ndarray, **parameters: Any) -> list[Union[Fraction, int]]:
+        return [Fraction(2*seat*(seat + 1), 2*seat + 1)**2 for seat in seats.tolist()]
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Dean, num_seats={self.num_seats} at {hex(id(self))}>"
+
+
+class Danish(DivisorMethod):
+    def __init__(self, num_seats: int) -> None:
+        """ Distribute seats according to the Danish method, with the divisors 1, 4, 7, 10, ... """
+        super().__init__(num_seats)
+
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray) -> np.ndarray:
+        return seats*3 + 1.0
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Danish, num_seats={self.num_seats} at {hex(id(self))}>"
+
+
+class Imperiali(DivisorMethod):
+    def __init__(self, num_seats: int) -> None:
+        """ Distribute seats according to the Imperiali method, with the divisors 2, 3, 4, ...
+        It favors higher-scoring candidates more than DHondt.
+        """
+        super().__init__(num_seats)
+
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray) -> np.ndarray:
+        return seats + 2.0
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Imperiali, num_seats={self.num_seats} at {hex(id(self))}>"
+
+
 class FirstPastThePost(Distribution):
     def __init__(self, num_seats: int) -> None:
         """ Distribute seats according to the first past the post method (winner takes all). """
@@ -352,17 +1032,18 @@ class FirstPastThePost(Distribution):
 
     def calculate(self) -> None:
         """ Calculate the distribution. """
-        self._result = {}
-        if len(self._candidates) == 0:
+        self._result = Result((), ())
+        if self.num_candidates == 0:
             return
 
-        # TODO: Handle multiple candidates with max score
-        max_key = max(self._candidates, key=self._candidates.get) # type: ignore
-        for key in self._candidates:
-            if key == max_key:
-                self._result[key] = self.num_seats
-            else:
-                self._result[key] = 0
+        self._reset_ties()
+        eligible = self.eligible_mask()
+        seats = np.zeros(self.num_candidates, dtype=int)
+        if eligible.any():
+            scores = self.score_array
+            tied = np.flatnonzero(eligible & (scores == scores[eligible].max())) # no division, so equal scores are exact ties
+            seats[tied[self._break_tie(tied, 1)[0]]] = self.num_seats
+        self._set_result(seats)
         self._is_calculated = True
     
     def __repr__(self) -> str:
@@ -381,7 +1062,9 @@ class FirstPastThePost(Distribution):
         return obj.result
 
 
-class HuntingtonHill(Distribution):
+class HuntingtonHill(DivisorMethod):
+    _algorithm_version = 3 # candidates without score get no seat with divisor 0
+
     def __init__(self,
                  num_seats: int,
                  initial_seats: int = 1,
@@ -390,61 +1073,22 @@ class HuntingtonHill(Distribution):
         self.initial_seats = initial_seats
         self.threshold = threshold
 
-    def calculate(self) -> Union[tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame], tuple[None, ...]]:
-        """ Calculate the distribution. """
-        self._result = {}
-        
-        # First remove candidates below the threshold
-        sum_scores = sum(self._candidates.values())
-        removed_candidates = {} # keep the candidates and their scores in a dictionary to add them back after the calculation is completed
-        for key, score in self._candidates.items():
-            if score/sum_scores*100 < self.threshold:
-                removed_candidates[key] = score
-        
-        for key in removed_candidates:
-            self.remove_candidate(key)
-
-        num_candidates = len(self._candidates)
-        if num_candidates == 0:
-            return None, None, None
-
-        if num_candidates*self.initial_seats > self.num_seats:
-            raise ValueError("Initial seats times number of candidates cannot be larger than the number of seats available.")
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray, initial_seats: int = 1) -> np.ndarray:
+        """ The first initial_seats seats have divisor 0, since they are always awarded (to candidates with a score). """
+        return np.where(seats < initial_seats, 0, np.sqrt(seats*(seats + 1.0)))
 
-        awarded_seats = np.full(num_candidates, self.initial_seats, dtype = int)
-        score_array = np.array(list(self._candidates.values())) # requires Python 3.7+ because the preservation of order in the dictionary is important
-        divisor_array = np.full(num_candidates, np.sqrt(self.initial_seats*(self.initial_seats + 1)))
-
-        score_matrix = []
-        divisor_matrix = []
-        awarded_seats_matrix = []
-
-        while np.sum(awarded_seats) < self.num_seats:
-            new_scores = score_array/divisor_array
-            next_seat_index = np.argmax(new_scores) # TODO: handle cases where multiple candidates have the same score
-            divisor_matrix.append(divisor_array.copy())
-
-            awarded_seats[next_seat_index] += 1
-            awarded_seats_new = awarded_seats[next_seat_index]
-            divisor_array[next_seat_index] = np.sqrt(awarded_seats_new*(awarded_seats_new + 1))
+    @classmethod
+    def _squared_divisors(cls, seats: np.ndarray, initial_seats: int = 1) -> list[Union[Fraction, int]]:
+        return [0 if seat < initial_seats else seat*(seat + 1) for seat in seats.tolist()]
 
-            score_matrix.append(new_scores.copy())
-            awarded_seats_matrix.append(awarded_seats.copy())
+    def _divisor_parameters(self) -> dict[str, Any]:
+        return {"initial_seats": self.initial_seats}
 
-        for candidate_id, seats in zip(self._candidates.keys(), awarded_seats):
-            self._result[candidate_id] = seats
-        
-        score_df = pd.DataFrame(score_matrix)
-        divisor_df = pd.DataFrame(divisor_matrix)
-        awarded_seats_df = pd.DataFrame(awarded_seats_matrix)
-        if len(score_matrix) > 0:
-            score_df.columns = self.name_list
-            divisor_df.columns = self.name_list
-            awarded_seats_df.columns = self.name_list
-
-        self.add_score(removed_candidates)
-        self._is_calculated = True
-        return score_df, divisor_df, awarded_seats_df
+    def _winners(self) -> np.ndarray:
+        if np.count_nonzero(_scored_mask(self.score_array, self.divisor_table(self.num_seats), self.eligible_mask()))*self.initial_seats > self.num_seats:
+            raise ValueError("Initial seats times number of candidates cannot be larger than the number of seats available.")
+        return super()._winners()
 
     @property
     def initial_seats(self) -> int:
@@ -455,15 +1099,6 @@ class HuntingtonHill(Distribution):
         self._is_calculated = False
         self._initial_seats = value
 
-    @property
-    def threshold(self) -> Union[int, float]:
-        return self._threshold
-
-    @threshold.setter
-    def threshold(self, value: Union[int, float]) -> None:
-        self._is_calculated = False
-        self._threshold = value
-
     def __repr__(self) -> str:
         return f"<{__name__}.HuntingtonHill, num_seats={self.num_seats}, initial_seats={self.initial_seats}, threshold={self.threshold} at {hex(id(self))}>"
 
@@ -482,32 +1117,96 @@ class HuntingtonHill(Distribution):
         return obj.result
 
 
+def hamilton_quotients(scores: np.ndarray,
+                       house_sizes: Union[int, np.ndarray],
+                       quota: str = "hare") -> tuple[np.ndarray, np.ndarray]:
+    """ Return the whole seats and the remainders of each candidate with Hamilton's method, for one or more house sizes.
+
+    Integer scores are divided exactly: the remainders are integers over a common denominator per house size, so
+    equal remainders are exactly equal. Float scores use the fractional part of score/quota.
+
+    Args:
+        scores: Candidate scores (the scores of candidates that may not win seats set to 0).
+        house_sizes: A house size, or an array of them.
+        quota: "hare" or "droop".
+
+    Returns:
+        The whole seats and the remainders, (house sizes x candidates), or 1-D for a single house size.
+    """
+    if quota not in ("hare", "droop"):
+        raise ValueError("Quota must one of: {'hare', 'droop'}")
+    single = np.ndim(house_sizes) == 0
+    house_sizes = np.atleast_1d(np.asarray(house_sizes, dtype=np.int64))
+    scores = np.asarray(scores)
+    if np.issubdtype(scores.dtype, np.integer) and (score_sum := int(scores.sum())) > 0:
+        if int(scores.max(initial=0)) >= 2**62//max(int(house_sizes.max(initial=1)), 1):
+            scores, house_sizes = scores.astype(object), house_sizes.astype(object) # Python integers do not overflow
+        if quota == "hare": # score*h/sum, over the common denominator sum
+            numerators, denominators = scores[np.newaxis, :]*house_sizes[:, np.newaxis], score_sum
+        else:
+            numerators, denominators = scores[np.newaxis, :], (1 + score_sum//(1 + house_sizes))[:, np.newaxis]
+        seats, remainders = (numerators//denominators).astype(np.int64), numerators % denominators
+    else:
+        score_sum = scores.sum()
+        quotas = score_sum/house_sizes if quota == "hare" else np.floor(1 + score_sum/(1 + house_sizes))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            remainders, seats = np.modf(scores[np.newaxis, :]/quotas[:, np.newaxis])
+        seats = np.nan_to_num(seats).astype(np.int64)
+    return (seats[0], remainders[0]) if single else (seats, remainders)
+
+
+def largest_remainders(seats: np.ndarray, remainders: np.ndarray, house_sizes: Union[int, np.ndarray]) -> np.ndarray:
+    """ Give the seats that are left after the whole seats to the largest remainders, for one or more house sizes.
+    Equal remainders go to the candidate added first.
+
+    Args:
+        seats, remainders: From hamilton_quotients().
+        house_sizes: The house size of each row.
+
+    Returns:
+        The seats of each candidate, with the same shape as seats.
+    """
+    single = np.ndim(seats) == 1
+    seats, remainders = np.atleast_2d(seats), np.atleast_2d(remainders)
+    remaining = np.clip(np.atleast_1d(house_sizes) - seats.sum(axis=1), 0, seats.shape[1])
+    order = np.argsort(-remainders, axis=1, kind="stable") # largest remainders first, ties in order of the candidates
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(seats.shape[1])[np.newaxis, :], axis=1)
+    awarded = seats + (ranks < remaining[:, np.newaxis])
+    return awarded[0] if single else awarded
+
+
 class Hamilton(Distribution):
+    _algorithm_version = 3 # equal remainders are ordered by candidate with a stable sort, which changed cached tie results
+
     def __init__(self, num_seats: int, quota: str = "hare") -> None:
         super().__init__(num_seats)
         self.quota = quota        
 
     def calculate(self) -> Union[tuple[Any, Any], tuple[None, None]]:
         """ Calculate the distribution. """
-        self._result = {}
-        num_candidates = len(self._candidates)
+        self._result = Result((), ())
+        num_candidates = self.num_candidates
 
         if num_candidates == 0:
             return None, None
 
+        self._reset_ties()
         quota = self.quota
-        candidate_ids = list(self._candidates.keys())
-        initial_scores = np.array(list(self._candidates.values()))/quota
-        fractions, integer_scores = np.modf(initial_scores)
-        frac_sort = np.argsort(fractions)[::-1]
+        scores = np.where(self.eligible_mask(), self.score_array, 0)
+        fractions, integer_scores = np.modf(scores/quota)
+        seats, remainders = hamilton_quotients(scores, self.num_seats, self._quota_name) # exact for integer scores
 
-        for key, score in zip(candidate_ids, integer_scores):
-            self._result[key] = int(score)
+        remaining = min(max(self.num_seats - int(seats.sum()), 0), num_candidates)
+        if remaining > 0:
+            order = np.argsort(-remainders, kind="stable") # largest remainders first
+            boundary = remainders[order[remaining - 1]]
+            above = order[:remaining][remainders[order[:remaining]] > boundary]
+            tied = np.flatnonzero(remainders == boundary)
+            seats[above] += 1
+            seats[tied[self._break_tie(tied, remaining - len(above))]] += 1
 
-        for index in frac_sort:
-            if sum(self._result.values()) >= self.num_seats:
-                break
-            self._result[candidate_ids[index]] += 1
+        self._set_result(seats)
 
         self._is_calculated = True
 
@@ -516,6 +1215,9 @@ class Hamilton(Distribution):
     def __repr__(self) -> str:
         return f"<{__name__}.Hamilton, num_seats={self.num_seats}, quota=({str(self._quota_name)},{self.quota:.2f}) at {hex(id(self))}>"
 
+    def _parameters(self) -> dict[str, Any]:
+        return {"quota": self._quota_name}
+
     @property
     def quota(self) -> float:
         return self._quota()
@@ -524,12 +1226,17 @@ class Hamilton(Distribution):
     def quota(self, quota: str) -> None:
         self._quota_name = quota
         if quota == "hare":
-            self._quota = lambda: hare(sum(self._candidates.values()), self.num_seats)
+            self._quota = lambda: hare(self._eligible_score_sum(), self.num_seats)
         elif quota == "droop":
-            self._quota = lambda: droop(sum(self._candidates.values()), self.num_seats)
+            self._quota = lambda: droop(self._eligible_score_sum(), self.num_seats)
         else:
             raise ValueError("Quota must one of: {'hare', 'droop'}")
 
+    @property
+    def quota_name(self) -> str:
+        """ The kind of quota, "hare" or "droop". """
+        return self._quota_name
+
     @classmethod
     def get(cls, num_seats: int,
             candidates: Union[str, list[str], tuple[str, ...],
@@ -544,38 +1251,18 @@ class Hamilton(Distribution):
         return obj.result
 
 
-class Adams(Distribution):
+class Adams(DivisorMethod):
+    _algorithm_version = 4 # candidates without score get no seat with divisor 0 again, like the divisor search before the kernel
+
     def __init__(self, num_seats: int) -> None:
+        """ Distribute seats according to Adams' method (rounding up), with the divisors 0, 1, 2, ...
+        Every eligible candidate with a score gets a first seat.
+        """
         super().__init__(num_seats)
 
-    def calculate(self) -> Union[float, None]:
-        """ Calculate the distribution. """
-        self._result = {}
-        num_candidates = len(self._candidates)
-
-        if num_candidates == 0:
-            return
-
-        divisor = sum(self._candidates.values())/self.num_seats # initial divisor
-        step = divisor/100 # how much to step by to begin with
-
-        candidate_ids = list(self._candidates.keys())
-        candidate_scores = np.array(list(self._candidates.values()))
-        awarded_seats = np.ceil(candidate_scores/divisor)
-
-        while np.sum(awarded_seats) > self.num_seats:
-            divisor += step
-            awarded_seats = np.ceil(candidate_scores/divisor)
-            if np.sum(awarded_seats) < self.num_seats: # if we overstepped, step back, recalculate and halve the step
-                divisor -= step
-                awarded_seats = np.ceil(candidate_scores/divisor)
-                step /= 2
-
-        for candidate_id, awards in zip(candidate_ids, awarded_seats):
-            self._result[candidate_id] = int(awards)
-        self._is_calculated = True
-
-        return divisor # return the final divisor
+    @staticmethod
+    def _divisor_rule(seats: np.ndarray) -> np.ndarray:
+        return seats.astype(float)
 
     def __repr__(self) -> str:
-        return f"<{__name__}.Adams, num_seats={self.num_seats} at {hex(id(self))}>"
\ No newline at end of file
+        return f"<{__name__}.Adams, num_seats={self.num_seats} at {hex(id(self))}>"
@@ -0,0 +1,477 @@
+from typing import Any, Iterator, Sequence, Union
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from .ballots import RankedDistribution
+from .result import Result
+from ..party import Party
+from ..quota import droop
+
+
+HOPEFUL, ELECTED, EXCLUDED = 0, 1, 2
+
+
+class STV(RankedDistribution):
+    _max_iterations = 1000 # of the Meek keep values per stage
+
+    def __init__(self, num_seats: int, transfer: str = "gregory", tolerance: float = 1e-9) -> None:
+        """ Distribute seats with the single transferable vote, using the Droop quota.
+
+        Each elected candidate gets one seat. Ballot types are counted as weighted rows, and a transfer
+        moves all ballots of one candidate at once with array operations.
+
+        Args:
+            transfer: How surpluses are transferred.
+                "gregory": weighted inclusive Gregory. All ballots of an elected candidate move on to the next
+                           continuing candidate, with their weight multiplied by surplus/tally.
+                "meek": Meek's method. Every candidate keeps a fraction of each ballot reaching it and passes on
+                        the rest, and the keep values are iterated until all elected candidates have the quota.
+            tolerance: Relative accuracy of the Meek iteration. A RuntimeWarning is given if it is not reached.
+        """
+        super().__init__(num_seats)
+        self.transfer = transfer
+        self.tolerance = tolerance
+
+    @property
+    def transfer(self) -> str:
+        return self._transfer
+
+    @transfer.setter
+    def transfer(self, value: str) -> None:
+        if value not in ("gregory", "meek"):
+            raise ValueError("Transfer must be one of: {'gregory', 'meek'}")
+        self._is_calculated = False
+        self._transfer = value
+
+    @property
+    def tolerance(self) -> float:
+        return self._tolerance
+
+    @tolerance.setter
+    def tolerance(self, value: float) -> None:
+        self._is_calculated = False
+        self._tolerance = value
+
+    def _parameters(self) -> dict[str, Any]:
+        return {"transfer": self.transfer, "tolerance": self.tolerance}
+
+    @staticmethod
+    def _lowest(tally: np.ndarray, hopeful: np.ndarray) -> int:
+        """ The hopeful candidate with the lowest tally. Of tied candidates, the one added last is excluded. """
+        lowest = tally[hopeful].min()
+        return int(np.flatnonzero(hopeful & (tally <= lowest))[-1])
+
+    def _count_gregory(self, rankings: np.ndarray, counts: np.ndarray, status: np.ndarray,
+                       tallies: list, events: list) -> None:
+        num_candidates = len(status)
+        padded = np.pad(rankings, ((0, 0), (0, 1)), constant_values=-1) # a trailing -1, so positions never run past the end
+        position = np.zeros(len(counts), dtype=np.int64)
+        weights = counts.astype(float)
+        rows_all = np.arange(len(counts))
+
+        def advance(rows: np.ndarray) -> None:
+            """ Move the given ballots on to their next hopeful candidate, or to the end if there is none. """
+            is_hopeful = np.append(status == HOPEFUL, False) # index -1 (exhausted) reads the appended False
+            candidates = padded[rows, position[rows]]
+            rows = rows[(candidates >= 0) & ~is_hopeful[candidates]]
+            while rows.size:
+                position[rows] += 1
+                candidates = padded[rows, position[rows]]
+                rows = rows[(candidates >= 0) & ~is_hopeful[candidates]]
+
+        advance(rows_all) # skip withdrawn candidates
+        current = padded[rows_all, position]
+        quota = droop(weights[current >= 0].sum(), self.num_seats)
+        seats_left = self.num_seats
+
+        while seats_left > 0:
+            current = padded[rows_all, position]
+            counted = current >= 0
+            tally = np.bincount(current[counted], weights=weights[counted], minlength=num_candidates)
+            tallies.append(tally)
+            hopeful = status == HOPEFUL
+            if not hopeful.any():
+                break
+
+            reached = hopeful & (tally >= quota)
+            if np.count_nonzero(hopeful) <= seats_left:
+                winners = [index for index in np.argsort(-tally, kind="stable") if hopeful[index]]
+            else:
+                winners = [index for index in np.argsort(-tally, kind="stable") if reached[index]][:seats_left]
+
+            if winners:
+                status[winners] = ELECTED
+                seats_left -= len(winners)
+                events.extend((len(tallies), int(index), "elected") for index in winners)
+                factor = np.zeros(num_candidates)
+                counted_winners = [index for index in winners if tally[index] > 0] # a winner without votes has nothing to transfer
+                factor[counted_winners] = np.maximum(tally[counted_winners] - quota, 0)/tally[counted_winners]
+                moved = np.flatnonzero(np.isin(current, winners))
+            else:
+                loser = self._lowest(tally, hopeful)
+                status[loser] = EXCLUDED
+                events.append((len(tallies), loser, "excluded"))
+                factor = np.ones(num_candidates)
+                moved = np.flatnonzero(current == loser)
+            weights[moved] *= factor[current[moved]]
+            advance(moved)
+
+    def _meek_tally(self, rankings: np.ndarray, counts: np.ndarray, keep: np.ndarray) -> np.ndarray:
+        """ Count the votes each candidate keeps, when every candidate keeps its keep fraction of each ballot reaching it. """
+        tally = np.zeros(len(keep))
+        keep = np.append(keep, 0.0) # index -1 (padding) keeps nothing
+        for start in range(0, len(counts), 65536):
+            chunk = rankings[start:start + 65536]
+            kept = keep[chunk]
+            reaching = np.cumprod(np.hstack((np.ones((len(chunk), 1)), 1 - kept[:, :-1])), axis=1) # share of each ballot that reaches a rank
+            votes = counts[start:start + 65536, np.newaxis]*reaching*kept
+            valid = chunk >= 0
+            tally += np.bincount(chunk[valid], weights=votes[valid], minlength=len(tally))
+        return tally
+
+    def _count_meek(self, rankings: np.ndarray, counts: np.ndarray, status: np.ndarray,
+                    tallies: list, events: list) -> None:
+        counts = counts.astype(float)
+        keep = np.where(status == HOPEFUL, 1.0, 0.0)
+        seats_left = self.num_seats
+
+        while seats_left > 0:
+            for _ in range(self._max_iterations): # iterate the keep values of the elected candidates until they hold the quota
+                tally = self._meek_tally(rankings, counts, keep)
+                quota = droop(tally.sum(), self.num_seats) # exhausted votes are left out of the quota
+                elected = status == ELECTED
+                reached = [index for index in np.argsort(-tally, kind="stable") if status[index] == HOPEFUL and tally[index] >= quota]
+                reached = reached[:seats_left]
+                if reached:
+                    status[reached] = ELECTED
+                    seats_left -= len(reached)
+                    events.extend((len(tallies) + 1, int(index), "elected") for index in reached)
+                    elected = status == ELECTED
+                if seats_left == 0:
+                    break
+                converged = np.abs(tally[elected] - quota) <= self.tolerance*quota
+                if converged.all() and not reached:
+                    break
+                keep[elected] = np.minimum(keep[elected]*quota/np.maximum(tally[elected], np.finfo(float).tiny), 1.0)
+            else:
+                error = np.abs(tally[status == ELECTED] - quota).max()/quota
+                warnings.warn(f"The Meek keep values did not reach the tolerance {self.tolerance} in {self._max_iterations} "
+                              f"iterations, the largest relative error is {error:.3g}", RuntimeWarning, stacklevel=3)
+
+            tallies.append(tally)
+            hopeful = status == HOPEFUL
+            if seats_left == 0 or not hopeful.any():
+                break
+            if np.count_nonzero(hopeful) <= seats_left:
+                winners = [index for index in np.argsort(-tally, kind="stable") if hopeful[index]]
+                status[winners] = ELECTED
+                events.extend((len(tallies), int(index), "elected") for index in winners)
+                break
+            loser = self._lowest(tally, hopeful)
+            status[loser] = EXCLUDED
+            keep[loser] = 0
+            events.append((len(tallies), loser, "excluded"))
+
+    def calculate(self) -> Union[tuple[pd.DataFrame, pd.DataFrame], tuple[None, None]]:
+        """ Count the ballots.
+
+        Returns:
+            Two dataframes: the tally of each candidate in each round (rounds x candidates),
+            and the events (round, candidate, status), where status is "elected" or "excluded".
+        """
+        self._result = Result((), ())
+        num_candidates = self.num_candidates
+        if num_candidates == 0:
+            self._is_calculated = True
+            return None, None
+
+        status = np.where(self.eligible_mask(), HOPEFUL, EXCLUDED) # excluded candidates are withdrawn before the count
+        tallies: list[np.ndarray] = []
+        events: list[tuple[int, int, str]] = []
+        rankings, counts = self._ballots.rankings, self._ballots.counts
+        if self.transfer == "gregory":
+            self._count_gregory(rankings, counts, status, tallies, events)
+        else:
+            self._count_meek(rankings, counts, status, tallies, events)
+
+        self._set_result((status == ELECTED).astype(int))
+        self._is_calculated = True
+
+        names = self.name_list
+        tally_df = pd.DataFrame(tallies, columns=names)
+        event_df = pd.DataFrame([(round_number, names[index], action) for round_number, index, action in events],
+                                columns=["round", "candidate", "status"])
+        return tally_df, event_df
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.STV, num_seats={self.num_seats}, transfer={self.transfer}, ballots={self._ballots.num_ballots} at {hex(id(self))}>"
+
+    @classmethod
+    def get(cls, num_seats: int,
+            ballots: Union[np.ndarray, Sequence[Sequence[Union[str, Party]]]],
+            counts: Union[np.ndarray, Sequence[Union[int, float]], None] = None,
+            transfer: str = "gregory"):
+        """ Count the ballots and return the result. """
+        obj = cls(num_seats, transfer)
+        obj.add_ballots(ballots, counts)
+        return obj.result
+
+
+class _Condorcet(RankedDistribution):
+    """ Base class for single-winner methods based on the pairwise preference matrix.
+    Like FirstPastThePost, the winner is awarded all the seats.
+    """
+    def __init__(self, num_seats: int, chunk_size: int = 65536) -> None:
+        super().__init__(num_seats)
+        self.chunk_size = chunk_size
+
+    def pairwise_matrix(self) -> np.ndarray:
+        """ Return the pairwise preference matrix, where entry [i, j] is the number of ballots ranking i above j. """
+        return self._ballots.pairwise_matrix(self.num_candidates, self.chunk_size)
+
+    def _rank(self, pairwise: np.ndarray) -> tuple[int, np.ndarray]:
+        """ Find the winner among the candidates of a pairwise matrix, and return it with the method details. """
+        raise NotImplementedError("Method must be implemented in a subclass.")
+
+    def calculate(self) -> Union[tuple[pd.DataFrame, pd.DataFrame], tuple[None, None]]:
+        """ Calculate the distribution.
+
+        Returns:
+            Two dataframes: the pairwise preference matrix and the method details (see the subclass),
+            both over the eligible candidates.
+        """
+        self._result = Result((), ())
+        if self.num_candidates == 0:
+            self._is_calculated = True
+            return None, None
+
+        eligible = np.flatnonzero(self.eligible_mask())
+        winner = None
+        pairwise = self.pairwise_matrix()[np.ix_(eligible, eligible)] # candidates that are not eligible are left out
+        details = np.zeros((0, 0))
+        if len(eligible) > 0:
+            winner_position, details = self._rank(pairwise)
+            winner = eligible[winner_position]
+
+        seats = np.zeros(self.num_candidates, dtype=int)
+        if winner is not None:
+            seats[winner] = self.num_seats
+        self._set_result(seats)
+        self._is_calculated = True
+
+        names = [self.name_list[index] for index in eligible]
+        return pd.DataFrame(pairwise, index=names, columns=names), pd.DataFrame(details, index=names, columns=names)
+
+    @classmethod
+    def get(cls, num_seats: int,
+            ballots: Union[np.ndarray, Sequence[Sequence[Union[str, Party]]]],
+            counts: Union[np.ndarray, Sequence[Union[int, float]], None] = None):
+        """ Count the ballots and return the result. """
+        obj = cls(num_seats)
+        obj.add_ballots(ballots, counts)
+        return obj.result
+
+
+class Schulze(_Condorcet):
+    def __init__(self, num_seats: int, chunk_size: int = 65536) -> None:
+        """ Find the winner with the Schulze method, using the strength of the strongest paths between candidates.
+
+        The details returned by calculate() are the strongest path strengths, in winning votes.
+        """
+        super().__init__(num_seats, chunk_size)
+
+    @staticmethod
+    def strongest_paths(pairwise: np.ndarray) -> np.ndarray:
+        """ Return the strength of the strongest path between every pair of candidates.
+
+        This is the Floyd-Warshall algorithm with (max, min) instead of (min, +), where each
+        intermediate candidate updates the whole matrix with one array operation.
+        """
+        strength = np.where(pairwise > pairwise.T, pairwise, 0)
+        np.fill_diagonal(strength, 0)
+        for middle in range(len(strength)):
+            strength = np.maximum(strength, np.minimum(strength[:, middle, np.newaxis], strength[np.newaxis, middle, :]))
+        np.fill_diagonal(strength, 0)
+        return strength
+
+    def _rank(self, pairwise: np.ndarray) -> tuple[int, np.ndarray]:
+        strength = self.strongest_paths(pairwise)
+        unbeaten = ~(strength.T > strength).any(axis=1) # there is always one, ties go to the candidate added first
+        return int(np.argmax(unbeaten)), strength
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Schulze, num_seats={self.num_seats}, ballots={self._ballots.num_ballots} at {hex(id(self))}>"
+
+
+class RankedPairs(_Condorcet):
+    def __init__(self, num_seats: int, chunk_size: int = 65536) -> None:
+        """ Find the winner with ranked pairs (Tideman). Pairwise wins are locked in from the largest margin down,
+        skipping any that would make a cycle. Equal margins are taken in order of the winning candidate, then the losing candidate.
+
+        The details returned by calculate() are the locked pairs, where [i, j] is True if i is locked in over j.
+        """
+        super().__init__(num_seats, chunk_size)
+
+    def _rank(self, pairwise: np.ndarray) -> tuple[int, np.ndarray]:
+        num_candidates = len(pairwise)
+        margins = pairwise - pairwise.T
+        winners, losers = np.nonzero(margins > 0)
+        order = np.argsort(-margins[winners, losers], kind="stable")
+
+        locked = np.zeros((num_candidates, num_candidates), dtype=bool)
+        reaches = np.eye(num_candidates, dtype=bool) # reaches[i, j]: there is a locked path from i to j (or i == j)
+        for pair in order:
+            winner, loser = winners[pair], losers[pair]
+            if reaches[loser, winner]: # would make a cycle
+                continue
+            locked[winner, loser] = True
+            reaches |= reaches[:, winner, np.newaxis] & reaches[np.newaxis, loser, :]
+        sources = ~locked.any(axis=0)
+        return int(np.argmax(sources)), locked
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.RankedPairs, num_seats={self.num_seats}, ballots={self._ballots.num_ballots} at {hex(id(self))}>"
+
+
+class Copeland(_Condorcet):
+    def __init__(self, num_seats: int, tie_score: float = 0.5, chunk_size: int = 65536) -> None:
+        """ Find the winner with Copeland's method, the candidate that wins the most pairwise contests.
+
+        The details returned by calculate() are the pairwise scores: 1 for a win, tie_score for a tie and 0 for a loss.
+        Equal Copeland scores go to the candidate added first.
+
+        Args:
+            tie_score: Score for a tied pairwise contest.
+        """
+        super().__init__(num_seats, chunk_size)
+        self.tie_score = tie_score
+
+    @property
+    def tie_score(self) -> float:
+        return self._tie_score
+
+    @tie_score.setter
+    def tie_score(self, value: float) -> None:
+        self._is_calculated = False
+        self._tie_score = value
+
+    def _parameters(self) -> dict[str, Any]:
+        return {"tie_score": self.tie_score}
+
+    def _rank(self, pairwise: np.ndarray) -> tuple[int, np.ndarray]:
+        scores = np.where(pairwise > pairwise.T, 1.0, np.where(pairwise == pairwise.T, self.tie_score, 0.0))
+        np.fill_diagonal(scores, 0)
+        return int(np.argmax(scores.sum(axis=1))), scores
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Copeland, num_seats={self.num_seats}, tie_score={self.tie_score}, ballots={self._ballots.num_ballots} at {hex(id(self))}>"
+
+
+class InstantRunoff(RankedDistribution):
+    def __init__(self, num_seats: int) -> None:
+        """ Find the winner with instant-runoff voting (the alternative vote). Like FirstPastThePost, the winner is awarded all the seats.
+
+        The candidate with the fewest votes is eliminated each round, until one candidate has a majority of the
+        ballots that are not exhausted. Of tied last candidates, the one added last is eliminated.
+
+        Each ballot type keeps a pointer to its current preference, and the ballot types are kept in buckets by
+        current preference, so an elimination only moves the ballots of the eliminated candidate and updates the
+        tallies with their counts, instead of counting all ballots again.
+        """
+        super().__init__(num_seats)
+        self._winner: Union[int, None] = None # set by rounds() when the count is finished
+
+    def rounds(self) -> Iterator[tuple[np.ndarray, Union[str, Party, None]]]:
+        """ Count the ballots lazily, one round at a time.
+
+        Yields:
+            For each round, the tally of every candidate (in the order they were added) and the candidate eliminated
+            after the round, or None in the last round.
+        """
+        num_candidates = self.num_candidates
+        if num_candidates == 0:
+            return
+        rankings, counts = self._ballots.rankings, self._ballots.counts
+        padded = np.pad(rankings, ((0, 0), (0, 1)), constant_values=-1) # a trailing -1, so positions never run past the end
+        position = np.zeros(len(counts), dtype=np.int64)
+        hopeful = np.append(self.eligible_mask(), False) # index -1 (exhausted) reads the appended False
+
+        def advance(rows: np.ndarray) -> np.ndarray:
+            """ Move the given ballots on to their next hopeful candidate and return it (-1 if exhausted). """
+            candidates = padded[rows, position[rows]]
+            moving = rows[(candidates >= 0) & ~hopeful[candidates]]
+            while moving.size:
+                position[moving] += 1
+                candidates = padded[moving, position[moving]]
+                moving = moving[(candidates >= 0) & ~hopeful[candidates]]
+            return padded[rows, position[rows]]
+
+        def bucket(rows: np.ndarray, candidates: np.ndarray) -> dict[int, np.ndarray]:
+            """ Group ballot rows on their current candidate. """
+            order = np.argsort(candidates, kind="stable")
+            values, starts = np.unique(candidates[order], return_index=True)
+            return {int(value): rows_of for value, rows_of in zip(values, np.split(rows[order], starts[1:])) if value >= 0}
+
+        rows = np.arange(len(counts))
+        current = advance(rows)
+        buckets = bucket(rows, current)
+        counted = current >= 0
+        tally = np.bincount(current[counted], weights=counts[counted], minlength=num_candidates).astype(counts.dtype)
+
+        while True:
+            remaining = np.flatnonzero(hopeful[:-1])
+            if len(remaining) == 0:
+                yield tally.copy(), None
+                return
+            leader = remaining[np.argmax(tally[remaining])]
+            if len(remaining) == 1 or 2*tally[leader] > tally.sum():
+                self._winner = int(leader)
+                yield tally.copy(), None
+                return
+
+            lowest = tally[remaining].min()
+            loser = int(remaining[tally[remaining] <= lowest][-1])
+            yield tally.copy(), self._keys[loser]
+
+            hopeful[loser] = False
+            moved = buckets.pop(loser, rows[:0])
+            tally[loser] = 0
+            new_current = advance(moved)
+            counted = new_current >= 0
+            tally += np.bincount(new_current[counted], weights=counts[moved][counted], minlength=num_candidates).astype(tally.dtype)
+            for candidate, rows_of in bucket(moved, new_current).items():
+                buckets[candidate] = np.concatenate((buckets[candidate], rows_of)) if candidate in buckets else rows_of
+
+    def calculate(self) -> Union[pd.DataFrame, None]:
+        """ Calculate the distribution.
+
+        Returns:
+            A dataframe with the tally of each candidate in each round (rounds x candidates).
+        """
+        self._result = Result((), ())
+        self._winner = None
+        if self.num_candidates == 0:
+            self._is_calculated = True
+            return None
+
+        tallies = [tally for tally, _ in self.rounds()]
+        seats = np.zeros(self.num_candidates, dtype=int)
+        if self._winner is not None:
+            seats[self._winner] = self.num_seats
+        self._set_result(seats)
+        self._is_calculated = True
+        return pd.DataFrame(tallies, columns=self.name_list)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.InstantRunoff, num_seats={self.num_seats}, ballots={self._ballots.num_ballots} at {hex(id(self))}>"
+
+    @classmethod
+    def get(cls, num_seats: int,
+            ballots: Union[np.ndarray, Sequence[Sequence[Union[str, Party]]]],
+            counts: Union[np.ndarray, Sequence[Union[int, float]], None] = None):
+        """ Count the ballots and return the result. """
+        obj = cls(num_seats)
+        obj.add_ballots(ballots, counts)
+        return obj.result
@@ -0,0 +1,70 @@
+from collections.abc import Mapping
+from typing import Iterator, Sequence, Union
+
+import numpy as np
+
+from ..party import Party
+
+
+class Result(Mapping):
+    """ Read-only mapping from each candidate to its number of seats, backed by an integer array.
+
+    It can't be changed after it is made, so distributions return the same object on every access instead of a copy.
+    Lookups use an index built on first use. Use to_numpy() for the seats as an array, or to_dict() for a mutable dict.
+    """
+    __slots__ = ("_keys", "_seats", "_index")
+
+    def __init__(self, keys: Sequence[Union[str, Party]], seats: Union[np.ndarray, Sequence[int]]) -> None:
+        self._keys = tuple(keys)
+        self._seats = np.array(seats, dtype=np.int64).reshape(len(self._keys))
+        self._seats.flags.writeable = False
+        self._index: Union[dict[Union[str, Party], int], None] = None
+
+    def _lookup(self) -> dict[Union[str, Party], int]:
+        if self._index is None:
+            self._index = {key: index for index, key in enumerate(self._keys)}
+        return self._index
+
+    def __getitem__(self, key: Union[str, Party]) -> int:
+        return int(self._seats[self._lookup()[key]])
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._lookup()
+
+    def __iter__(self) -> Iterator[Union[str, Party]]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def values(self) -> list[int]: # type: ignore
+        """ The seats of each candidate, in order. """
+        return self._seats.tolist()
+
+    def items(self) -> list[tuple[Union[str, Party], int]]: # type: ignore
+        """ The (candidate, seats) pairs, in order. """
+        return list(zip(self._keys, self._seats.tolist()))
+
+    def to_numpy(self) -> np.ndarray:
+        """ The seats as a read-only integer array, in the order of the candidates. """
+        return self._seats
+
+    def to_dict(self) -> dict[Union[str, Party], int]:
+        """ Return the result as a new dict, which can be changed. """
+        return dict(zip(self._keys, self._seats.tolist()))
+
+    def copy(self) -> dict[Union[str, Party], int]:
+        """ Same as to_dict(), like dict.copy(). """
+        return self.to_dict()
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Result):
+            return self._keys == other._keys and np.array_equal(self._seats, other._seats)
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None # type: ignore
+
+    def __repr__(self) -> str:
+        return f"Result({self.to_dict()})"
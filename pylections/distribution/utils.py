@@ -7,6 +7,14 @@ class CandidateDoesNotExistError(Exception):
     """
 
 
+class TieError(Exception):
+    """ To be raised if candidates are exactly tied for a seat and the tie_break of the distribution is "raise". """
+    def __init__(self, message: str, candidates: tuple = (), seats: int = 0) -> None:
+        super().__init__(message)
+        self.candidates = candidates
+        self.seats = seats
+
+
 class Utils:
     @staticmethod
     def is_list_or_tuple(item: Any) -> bool:
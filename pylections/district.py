@@ -10,6 +10,8 @@ class NotEnoughLevelingSeatsError(Exception):
 
 class _District:
     """ Base class for other district types """
+    __slots__ = ("_name", "_location", "_eligible_voters", "_area", "_distribution", "_result_details", "__weakref__")
+
     def __init__(self, name: str,
                  eligible_voters: Union[float, int],
                  area: Union[float, int],
@@ -41,14 +43,25 @@ class _District:
 
     @property
     def result(self) -> dict:
+        """ The seats of each candidate. Uses the result of the distribution, which is only calculated (or loaded from
+        its result_cache) when the scores have changed.
+        """
         if self.distribution is None:
             raise ValueError("Can't calculate a result because no distribution was defined for the district")
-        self._result_details = self.distribution.calculate()
         return self.distribution.result
 
     @property
     def result_details(self) -> Any:
-        return self._result_details
+        """ The calculation details of the distribution (what its calculate() returns), or None without a distribution.
+        They are calculated on first access, and kept until the result of the distribution changes.
+        """
+        distribution = self.distribution
+        if distribution is None:
+            return None
+        if self._result_details is None or not distribution.is_calculated or self._result_details[0] is not distribution.result:
+            details = distribution.calculate()
+            self._result_details = (distribution.result, details)
+        return self._result_details[1]
 
     @property
     def distribution(self) -> Union[Distribution, None]:
@@ -84,6 +97,8 @@ class _District:
 
 
 class District(_District):
+    __slots__ = ()
+
     def __init__(self, name: str,
                  eligible_voters: Union[float, int],
                  area: Union[float, int],
@@ -96,6 +111,8 @@ class District(_District):
 
 
 class NorwegianFylke(District):
+    __slots__ = ("_fylkeid", "_available_leveling_seats", "_leveling_seats")
+
     def __init__(self, fylkeid: int,
                  eligible_voters: Union[float, int],
                  area: Union[float, int],
@@ -0,0 +1,213 @@
+import os
+from typing import Any, Iterable, Iterator, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pylections.party import Party
+from .distribution.ballots import RankedDistribution
+from .district import _District
+
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".arrow", ".feather", ".ipc")
+
+
+def _import_pyarrow() -> Any:
+    """ pyarrow is optional, and only needed for Parquet and Arrow files. """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError("Reading Parquet and Arrow files needs pyarrow (pip install pyarrow)") from error
+    return pyarrow
+
+
+def _file_format(path: Union[str, os.PathLike], file_format: Union[str, None]) -> str:
+    if file_format is not None:
+        if file_format not in ("csv", "parquet", "arrow"):
+            raise ValueError(f"File format must be one of {{'csv', 'parquet', 'arrow'}}, but was: {file_format}")
+        return file_format
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        return "parquet"
+    if suffix in ARROW_SUFFIXES:
+        return "arrow"
+    return "csv"
+
+
+def iter_batches(path: Union[str, os.PathLike],
+                 columns: Union[Sequence[str], None] = None,
+                 batch_size: int = 100_000,
+                 delimiter: str = ";",
+                 file_format: Union[str, None] = None,
+                 encoding: str = "utf-8") -> Iterator[pd.DataFrame]:
+    """ Read a CSV, Parquet or Arrow (IPC/Feather) file in batches of rows, so only one batch is in memory at a time.
+
+    Args:
+        path: Path to the file. The format is found from the suffix (.parquet/.pq, .arrow/.feather/.ipc, else CSV).
+        columns: Only read these columns. Parquet files skip the other columns on disk.
+        batch_size: Number of rows in each batch (Arrow files keep the batches they were written with).
+        delimiter: Column delimiter of CSV files, ";" like the Norwegian result files.
+        file_format: "csv", "parquet" or "arrow", to override the suffix.
+        encoding: Text encoding of CSV files.
+
+    Returns:
+        An iterator of dataframes with the selected columns.
+    """
+    file_format = _file_format(path, file_format)
+    columns = None if columns is None else list(columns)
+    if file_format == "csv":
+        with pd.read_csv(path, sep=delimiter, usecols=columns, chunksize=batch_size, encoding=encoding) as reader:
+            for batch in reader:
+                yield batch if columns is None else batch[columns]
+        return
+
+    pyarrow = _import_pyarrow()
+    if file_format == "parquet":
+        for record_batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield record_batch.to_pandas()
+        return
+
+    with pyarrow.memory_map(str(path), "r") as source:
+        try:
+            reader = pyarrow.ipc.open_file(source)
+            record_batches: Iterable[Any] = (reader.get_batch(index) for index in range(reader.num_record_batches))
+        except pyarrow.ArrowInvalid: # not the file format, so the stream format
+            source.seek(0)
+            record_batches = pyarrow.ipc.open_stream(source)
+        for record_batch in record_batches:
+            yield (record_batch if columns is None else record_batch.select(columns)).to_pandas()
+
+
+def _codes(values: np.ndarray, known: dict[Any, int]) -> np.ndarray:
+    """ Return the position of each value in known, and add the values that are not known yet. """
+    for value in pd.unique(values):
+        if value not in known:
+            known[value] = len(known)
+    return pd.Index(list(known)).get_indexer(values)
+
+
+def read_scores(path: Union[str, os.PathLike],
+                district_column: str,
+                party_column: str,
+                votes_column: str,
+                districts: Union[dict[str, _District], None] = None,
+                parties: Union[dict[str, Party], None] = None,
+                party_name_column: Union[str, None] = None,
+                skip_parties: Iterable[str] = (),
+                batch_size: int = 100_000,
+                delimiter: str = ";",
+                file_format: Union[str, None] = None,
+                encoding: str = "utf-8") -> pd.DataFrame:
+    """ Sum the votes of each party in each district from a long results file (one row per district, station or
+    ballot box and party), reading one batch at a time. Only the needed columns are read, and the memory use
+    is one batch plus the district x party matrix.
+
+    As the batches are read, the votes are added to the total_votes of the parties, and to the distributions of
+    the districts (the Party objects are the candidates).
+
+    Args:
+        path: Path to a CSV, Parquet or Arrow file, see iter_batches().
+        district_column: Column with the district name of each row.
+        party_column: Column with the party code of each row.
+        votes_column: Column with the votes of each row.
+        districts: Optional districts by name, whose distributions get the votes. Other districts are only summed.
+        parties: Optional parties by code. Parties missing in it are created and added, so pass an empty dict to get them.
+        party_name_column: Column with the party names, for the parties that are created. The code is used if not given.
+        skip_parties: Party codes to leave out, e.g. blank votes.
+        batch_size, delimiter, file_format, encoding: See iter_batches().
+
+    Returns:
+        A dataframe with the votes of each party code (columns) in each district (rows), in the order first seen.
+    """
+    parties = {} if parties is None else parties
+    skip = set(skip_parties)
+    columns = [district_column, party_column, votes_column] + ([party_name_column] if party_name_column else [])
+    district_codes: dict[Any, int] = {}
+    party_codes: dict[Any, int] = {}
+    scores = np.zeros((0, 0), dtype=np.int64)
+
+    for batch in iter_batches(path, columns, batch_size, delimiter, file_format, encoding):
+        if skip:
+            batch = batch[~batch[party_column].astype(str).isin(skip)]
+        if party_name_column:
+            for code, name in batch.drop_duplicates(party_column)[[party_column, party_name_column]].itertuples(index=False):
+                if str(code) not in parties:
+                    parties[str(code)] = Party(name)
+        district_positions = _codes(batch[district_column].to_numpy(), district_codes)
+        party_positions = _codes(batch[party_column].to_numpy(), party_codes)
+        votes = batch[votes_column].fillna(0).to_numpy()
+        if votes.dtype.kind == "f" and scores.dtype != np.float64:
+            scores = scores.astype(np.float64)
+
+        # one flat bincount for the batch, instead of adding row by row
+        shape = (len(district_codes), len(party_codes))
+        cells = np.bincount(district_positions*shape[1] + party_positions, weights=votes, minlength=shape[0]*shape[1]).reshape(shape)
+        batch_scores = cells if scores.dtype == np.float64 else np.rint(cells).astype(np.int64)
+        grown = np.zeros(shape, dtype=scores.dtype)
+        grown[:scores.shape[0], :scores.shape[1]] = scores
+        scores = grown + batch_scores
+
+        party_list = list(party_codes)
+        for column in np.flatnonzero(batch_scores.any(axis=0)).tolist():
+            code = str(party_list[column])
+            party = parties.get(code)
+            if party is None:
+                party = parties[code] = Party(code)
+            party.total_votes = party.total_votes + batch_scores[:, column].sum().item()
+        if districts:
+            district_list = list(district_codes)
+            for row in np.flatnonzero(batch_scores.any(axis=1)).tolist():
+                district = districts.get(str(district_list[row]))
+                if district is None or district.distribution is None:
+                    continue
+                for column in np.flatnonzero(batch_scores[row]).tolist():
+                    district.distribution.add_score(parties[str(party_list[column])], batch_scores[row, column].item())
+
+    return pd.DataFrame(scores, index=[str(name) for name in district_codes], columns=[str(code) for code in party_codes])
+
+
+def read_ballots(path: Union[str, os.PathLike],
+                 distribution: RankedDistribution,
+                 rank_columns: Sequence[str],
+                 count_column: Union[str, None] = None,
+                 candidates: Union[dict[str, Union[str, Party]], None] = None,
+                 batch_size: int = 100_000,
+                 delimiter: str = ";",
+                 file_format: Union[str, None] = None,
+                 encoding: str = "utf-8") -> Union[int, float]:
+    """ Add the ranked ballots of a file to a distribution, one batch at a time. Identical ballots are merged in the
+    compressed ballot store, so the memory use is one batch plus the distinct ballots.
+
+    Args:
+        path: Path to a CSV, Parquet or Arrow file, see iter_batches().
+        distribution: The ranked distribution (e.g. STV) to add the ballots to.
+        rank_columns: Columns with the first, second, ... preference of each ballot. Empty cells are unranked,
+            and later preferences move up past them.
+        count_column: Optional column with the number of ballots of each row.
+        candidates: Optional candidate (e.g. Party) for each name in the file. The names are used if not given.
+        batch_size, delimiter, file_format, encoding: See iter_batches().
+
+    Returns:
+        The number of ballots read.
+    """
+    columns = list(rank_columns) + ([count_column] if count_column else [])
+    num_ballots: Union[int, float] = 0
+    for batch in iter_batches(path, columns, batch_size, delimiter, file_format, encoding):
+        ranks = batch[list(rank_columns)].to_numpy(dtype=object)
+        ranks[pd.isna(ranks)] = ""
+        names = pd.unique(ranks.ravel())
+        names = names[names != ""]
+        keys = [candidates.get(str(name), str(name)) if candidates else str(name) for name in names.tolist()]
+        for candidate in keys:
+            if candidate not in distribution:
+                distribution.add_score(candidate, 0)
+        indices = np.array([distribution.index_of(candidate) for candidate in keys] + [-1], dtype=np.int32)
+        rankings = indices[pd.Index(names).get_indexer(ranks.ravel())].reshape(ranks.shape) # empty cells map to -1
+        rankings = np.take_along_axis(rankings, np.argsort(rankings < 0, axis=1, kind="stable"), axis=1)
+        counts = batch[count_column].to_numpy() if count_column else None
+        distribution.add_ballots(rankings, counts)
+        num_ballots += counts.sum().item() if counts is not None else len(rankings)
+    return num_ballots
@@ -1,6 +1,10 @@
+from numbers import Integral
 from typing import Union
 
 class Party:
+    # no per-instance __dict__, since simulations can create many parties. Parties are hashed by identity
+    __slots__ = ("_name", "_spectrum_position", "_color", "_total_votes", "_seats_awarded", "__weakref__")
+
     def __init__(self, name: str,
                  spectrum_position: float = 0,
                  color: str = "#888",
@@ -42,7 +46,7 @@ class Party:
     
     @total_votes.setter
     def total_votes(self, value: Union[int, float]) -> None:
-        self._total_votes = float(value)
+        self._total_votes = int(value) if isinstance(value, Integral) else float(value) # integers, also numpy integers, stay exact
 
     @property
     def seats_awarded(self) -> int:
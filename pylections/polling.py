@@ -0,0 +1,270 @@
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from pylections.party import Party
+from .analysis.sensitivity import vote_margins
+from .distribution.distribution import Distribution, DivisorMethod
+from .distribution.result import Result
+
+
+PollShares = Union[Sequence[float], np.ndarray, Mapping[Union[str, Party], float]]
+
+
+def _days(time: Any) -> float:
+    """ Return a poll time as days, from a number of days or anything pandas reads as a timestamp (date, datetime, string). """
+    if isinstance(time, (int, float, np.integer, np.floating)):
+        return float(time)
+    return pd.Timestamp(time).value/86_400e9
+
+
+class _Estimator:
+    """ Base class for vote share estimates that are updated one poll at a time """
+
+    def __init__(self, num_parties: int) -> None:
+        self._estimate = np.full(num_parties, np.nan)
+        self._time: Union[float, None] = None
+
+    def _elapsed(self, time: Any) -> float:
+        """ Return the days since the last poll (0 for the first, or for a poll out of order) and move the clock. """
+        days = _days(time)
+        elapsed = 0.0 if self._time is None else max(days - self._time, 0.0)
+        self._time = days if self._time is None else max(days, self._time)
+        return elapsed
+
+    def update(self, time: Any, shares: np.ndarray, sample_size: Union[int, None] = None) -> np.ndarray:
+        raise NotImplementedError("Method must be implemented in a subclass.")
+
+    @property
+    def estimate(self) -> np.ndarray:
+        """ The current estimated share of each party, NaN for parties not polled yet. """
+        return self._estimate.copy()
+
+    @property
+    def time(self) -> Union[float, None]:
+        """ Time of the latest poll, in days. """
+        return self._time
+
+
+class EWMAEstimator(_Estimator):
+    def __init__(self, num_parties: int, half_life: float = 7, weight_by_sample: bool = False) -> None:
+        """ Exponentially weighted moving average of the polls, where the weight of a poll halves every half_life days.
+
+        The estimate is the weighted sum of the polls over the sum of the weights. Both are decayed and added to
+        with each poll, so an update costs the same however many polls came before.
+
+        Args:
+            num_parties: Number of parties in each poll.
+            half_life: Days for the weight of a poll to halve.
+            weight_by_sample: Weight each poll by its sample size instead of equally.
+        """
+        super().__init__(num_parties)
+        self.half_life = half_life
+        self.weight_by_sample = weight_by_sample
+        self._weighted_sum = np.zeros(num_parties)
+        self._weights = np.zeros(num_parties)
+
+    def update(self, time: Any, shares: np.ndarray, sample_size: Union[int, None] = None) -> np.ndarray:
+        """ Add a poll and return the new estimate.
+
+        Args:
+            time: Time of the poll, days or a date.
+            shares: The share of each party (fractions). NaN for parties that were not polled.
+            sample_size: Number of respondents, used if weight_by_sample is True.
+        """
+        shares = np.asarray(shares, dtype=float)
+        decay = 0.5**(self._elapsed(time)/self.half_life)
+        weight = float(sample_size) if self.weight_by_sample and sample_size else 1.0
+        polled = ~np.isnan(shares)
+        self._weighted_sum *= decay
+        self._weights *= decay
+        self._weighted_sum[polled] += weight*shares[polled]
+        self._weights[polled] += weight
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._estimate = np.where(self._weights > 0, self._weighted_sum/self._weights, np.nan)
+        return self.estimate
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.EWMAEstimator, half_life={self.half_life} at {hex(id(self))}>"
+
+
+class KalmanEstimator(_Estimator):
+    def __init__(self, num_parties: int, volatility: float = 0.002, default_sample_size: int = 1000) -> None:
+        """ Kalman filter of the vote share of each party, as a random walk observed through noisy polls.
+
+        Between polls the variance of the estimate grows by volatility**2 per day. A poll of n respondents measures
+        each share p with sampling variance p(1 - p)/n, and the estimate moves towards it by the Kalman gain, so large
+        polls and uncertain estimates move it more. The parties are filtered independently.
+
+        Args:
+            num_parties: Number of parties in each poll.
+            volatility: Standard deviation of the daily change of a share, e.g. 0.002 for 0.2 percentage points.
+            default_sample_size: Sample size of polls that do not give one.
+        """
+        super().__init__(num_parties)
+        self.volatility = volatility
+        self.default_sample_size = default_sample_size
+        self._variance = np.full(num_parties, np.inf)
+
+    def update(self, time: Any, shares: np.ndarray, sample_size: Union[int, None] = None) -> np.ndarray:
+        """ Add a poll and return the new estimate.
+
+        Args:
+            time: Time of the poll, days or a date.
+            shares: The share of each party (fractions). NaN for parties that were not polled.
+            sample_size: Number of respondents.
+        """
+        shares = np.asarray(shares, dtype=float)
+        self._variance = self._variance + self.volatility**2*self._elapsed(time)
+        polled = ~np.isnan(shares)
+        observed = shares[polled]
+        noise = np.maximum(observed*(1 - observed), 1e-4)/(sample_size or self.default_sample_size)
+        variance = self._variance[polled]
+        with np.errstate(invalid="ignore"):
+            gain = np.where(np.isinf(variance), 1.0, variance/(variance + noise)) # the first poll of a party sets its estimate
+            self._variance[polled] = np.where(np.isinf(variance), noise, (1 - gain)*variance)
+        estimate = np.nan_to_num(self._estimate[polled])
+        self._estimate[polled] = estimate + gain*(observed - estimate)
+        return self.estimate
+
+    @property
+    def standard_error(self) -> np.ndarray:
+        """ Standard error of the estimate of each party, inf for parties not polled yet. """
+        return np.sqrt(self._variance)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.KalmanEstimator, volatility={self.volatility} at {hex(id(self))}>"
+
+
+class PollPipeline:
+    def __init__(self,
+                 distribution: Distribution,
+                 estimator: _Estimator,
+                 total_votes: Union[int, float],
+                 candidates: Union[Sequence[Union[str, Party]], None] = None) -> None:
+        """ Continuous seat projection from a stream of polls.
+
+        Each poll updates the estimator, and the estimate (scaled to total_votes) becomes the scores of the
+        distribution. The seats are only calculated again when the new scores could change them. For divisor methods
+        this uses the quotients of the last projection: the seats stay the same as long as the lowest winning quotient
+        (score/divisor of the last seat of each candidate) is above the highest losing quotient (score/divisor of the
+        next seat), which is an O(candidates) check. Other methods are calculated again whenever the estimate moves.
+
+        Use run() as a generator over an iterable of polls, or run_async() over an async iterable, e.g. a feed.
+        A poll is (time, shares) or (time, shares, sample_size), where the shares are fractions in the order of
+        candidates, or a dict by candidate or candidate name. Missing or NaN shares leave the party's estimate as it is.
+
+        Args:
+            distribution: The distribution to project, e.g. DHondt(169) with the parties added.
+            estimator: An EWMAEstimator or KalmanEstimator, for the same number of candidates.
+            total_votes: Number of votes the shares are scaled to.
+            candidates: The candidates of the shares, by default all the candidates of the distribution.
+        """
+        self.distribution = distribution
+        self.estimator = estimator
+        self.total_votes = total_votes
+        self._candidates = list(distribution.candidates) if candidates is None else list(candidates)
+        missing = [candidate for candidate in self._candidates if candidate not in distribution]
+        if missing:
+            raise ValueError(f"The candidates {missing} are not in the distribution")
+        self._columns = np.array([distribution.index_of(candidate) for candidate in self._candidates], dtype=np.int64)
+        self._lookup = {**{str(candidate): index for index, candidate in enumerate(self._candidates)},
+                        **{candidate: index for index, candidate in enumerate(self._candidates)}}
+        self._bounds: Union[tuple[np.ndarray, np.ndarray, np.ndarray], None] = None # divisors of the last and next seats, eligible mask
+        self._scores: Union[np.ndarray, None] = None
+        self.num_polls = 0
+        self.num_projections = 0
+
+    def _shares(self, shares: PollShares) -> np.ndarray:
+        if isinstance(shares, Mapping):
+            values = np.full(len(self._candidates), np.nan)
+            for candidate, share in shares.items():
+                values[self._lookup[candidate]] = share
+            return values
+        values = np.asarray(shares, dtype=float)
+        if values.shape != (len(self._candidates),):
+            raise ValueError(f"Expected {len(self._candidates)} shares, got an array of shape {values.shape}")
+        return values
+
+    def can_change(self, scores: np.ndarray) -> bool:
+        """ Return False if the seats are certainly the same for new scores (in the order of the distribution) as in
+        the last projection, from the quotients of the last seat and the next seat of each candidate.
+        """
+        if self._scores is not None and np.array_equal(scores, self._scores):
+            return False
+        if self._bounds is None:
+            return True
+        last_divisors, next_divisors, eligible = self._bounds
+        if not np.array_equal(self.distribution.eligible_mask(scores), eligible):
+            return True
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lowest_winning = np.where(np.isnan(last_divisors), np.inf, scores/last_divisors).min(initial=np.inf)
+            highest_losing = np.where(eligible, scores/next_divisors, -np.inf).max(initial=-np.inf)
+        return not lowest_winning > highest_losing # a tie could go either way
+
+    def _project(self, scores: np.ndarray) -> Result:
+        self.distribution.set_score_array(scores)
+        result = self.distribution.result
+        self.num_projections += 1
+        self._scores = scores
+        self._bounds = None
+        if isinstance(self.distribution, DivisorMethod):
+            seats = result.to_numpy()
+            divisors = self.distribution.divisor_table(int(seats.max(initial=0)) + 1)
+            eligible = self.distribution.eligible_mask(scores)
+            # candidates without seats have no last seat to lose, which is marked with NaN
+            last_divisors = np.where((seats > 0) & eligible, divisors[np.maximum(seats - 1, 0)], np.nan)
+            self._bounds = (last_divisors, divisors[seats], eligible)
+        return result
+
+    def process(self, time: Any, shares: PollShares, sample_size: Union[int, None] = None) -> Union[Result, None]:
+        """ Add one poll. Returns the new projection if the seats were calculated again, else None. """
+        self.num_polls += 1
+        estimate = self.estimator.update(time, self._shares(shares), sample_size)
+        if np.isnan(estimate).all():
+            return None
+        estimate = np.nan_to_num(estimate)
+        scores = np.array(self.distribution.score_array, dtype=float)
+        scores[self._columns] = estimate/estimate.sum()*self.total_votes
+        if not self.can_change(scores):
+            # same seats, so the distribution gets the new scores and keeps its result without calculating
+            self.distribution._set_scores_keeping_result(scores)
+            self._scores = scores
+            return None
+        return self._project(scores)
+
+    def _poll(self, poll: Sequence) -> Union[Result, None]:
+        return self.process(*poll)
+
+    def run(self, polls: Iterable[Sequence]) -> Iterator[tuple[Any, Result]]:
+        """ Process the polls one by one, and yield (time, projection) whenever the seats were calculated again.
+        Works with an unbounded iterable, as each poll is handled when it arrives.
+        """
+        for poll in polls:
+            result = self._poll(poll)
+            if result is not None:
+                yield poll[0], result
+
+    async def run_async(self, polls: AsyncIterable[Sequence]) -> AsyncIterator[tuple[Any, Result]]:
+        """ Like run(), over an async iterable of polls, e.g. a poll feed. """
+        async for poll in polls:
+            result = self._poll(poll)
+            if result is not None:
+                yield poll[0], result
+
+    @property
+    def result(self) -> Result:
+        """ The latest projection. """
+        return self.distribution.result
+
+    def margins(self) -> pd.DataFrame:
+        """ The vote margins of the latest projection, see vote_margins(). """
+        return vote_margins(self.distribution)
+
+    @property
+    def candidates(self) -> list[Union[str, Party]]:
+        return list(self._candidates)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.PollPipeline, polls={self.num_polls}, projections={self.num_projections}, estimator={self.estimator} at {hex(id(self))}>"
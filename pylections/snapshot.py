@@ -0,0 +1,322 @@
+import json
+import os
+import struct
+from typing import Any, Iterable, Union
+
+import numpy as np
+
+from pylections.party import Party
+from .distribution.ballots import RankedDistribution
+from .distribution.distribution import Distribution
+from .distribution.result import Result
+from .district import District, NorwegianFylke, _District
+
+
+MAGIC = b"PYLSNAPS"
+FORMAT_VERSION = 2
+_HEADER = struct.Struct("<8sI4xQ") # magic, format version, length of the metadata
+_ALIGNMENT = 64 # arrays start on 64 byte boundaries, so the views of the memory map are aligned
+
+
+def _distribution_classes() -> dict[str, type]:
+    """ Return the distribution classes by qualified name, including subclasses defined outside pylections. """
+    classes: dict[str, type] = {}
+    pending = [Distribution]
+    while pending:
+        cls = pending.pop()
+        classes.setdefault(cls.__qualname__, cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+def _padding(size: int) -> int:
+    return -size % _ALIGNMENT
+
+
+def save_snapshot(path: Union[str, os.PathLike],
+                  districts: Union[Iterable[_District], dict[str, _District]],
+                  parties: Iterable[Party] = (),
+                  metadata: Union[dict[str, Any], None] = None) -> None:
+    """ Save an election to a compact binary snapshot, which Snapshot opens memory-mapped.
+
+    The parties, the districts (eligible_voters, area, location, Norwegian fylke ID and leveling seats),
+    the distribution of each district (method, parameters, thresholds, candidates and scores), the calculated
+    results and the leveling seat winners are stored. Each field is one contiguous array across all parties or
+    districts, e.g. the candidates of all districts are one array with an offset for each district. Integer and
+    float scores are two arrays, so each district keeps the dtype of its scores.
+
+    The file is written to a temporary name and then renamed, so processes that have the old snapshot open keep
+    reading it unchanged.
+
+    Args:
+        path: Path of the snapshot file.
+        districts: The districts, or a dict of them.
+        parties: The parties. Parties that are only candidates in the districts are added after these.
+        metadata: Optional JSON-serializable information to store with the snapshot, e.g. the election year.
+    """
+    if isinstance(districts, dict):
+        districts = districts.values()
+    districts = list(districts)
+    party_list = list(dict.fromkeys(parties))
+    party_index = {party: index for index, party in enumerate(party_list)}
+    strings: dict[str, int] = {}
+
+    def reference(candidate: Union[str, Party]) -> int:
+        """ A party is its index in the party table, and a candidate ID is -1 - its index in the string table. """
+        if isinstance(candidate, Party):
+            if candidate not in party_index:
+                party_index[candidate] = len(party_list)
+                party_list.append(candidate)
+            return party_index[candidate]
+        return -1 - strings.setdefault(str(candidate), len(strings))
+
+    district_info: list[dict[str, Any]] = []
+    candidates: list[int] = []
+    scores: dict[bool, list[np.ndarray]] = {False: [], True: []} # by float_scores
+    score_starts = np.zeros(len(districts), dtype=np.int64)
+    results: list[np.ndarray] = []
+    leveling: list[int] = []
+    candidate_offsets = [0]
+    leveling_offsets = [0]
+    num_seats = np.full(len(districts), -1, dtype=np.int64)
+    for row, district in enumerate(districts):
+        info: dict[str, Any] = {"name": district.name,
+                                "type": "NorwegianFylke" if isinstance(district, NorwegianFylke) else "District"}
+        distribution = district.distribution
+        if distribution is not None:
+            if isinstance(distribution, RankedDistribution):
+                raise ValueError(f"The ranked ballots of district {district.name} can't be stored in a snapshot")
+            num_seats[row] = distribution.num_seats
+            info.update({"method": type(distribution).__qualname__,
+                         "parameters": distribution._parameters(),
+                         "threshold": distribution.threshold,
+                         "absolute_threshold": distribution.absolute_threshold,
+                         "excluded": [reference(candidate) for candidate in distribution.excluded],
+                         "tie_break": distribution.tie_break,
+                         "seed": distribution.seed,
+                         "float_scores": distribution.score_array.dtype.kind == "f",
+                         "calculated": distribution.is_calculated})
+            keys = distribution.candidates
+            candidates.extend(reference(candidate) for candidate in keys)
+            block = scores[info["float_scores"]]
+            score_starts[row] = sum(len(score) for score in block)
+            block.append(distribution.score_array)
+            if distribution.is_calculated:
+                result = distribution.result # already calculated, so not calculated again
+                results.append(np.array([result.get(key, -1) for key in keys], dtype=np.int64))
+            else:
+                results.append(np.full(len(keys), -1, dtype=np.int64))
+        candidate_offsets.append(len(candidates))
+        if isinstance(district, NorwegianFylke):
+            leveling.extend(reference(candidate) for candidate in district.leveling_seats)
+        leveling_offsets.append(len(leveling))
+        district_info.append(info)
+
+    fylker = [isinstance(district, NorwegianFylke) for district in districts]
+    party_votes = [party.total_votes for party in party_list]
+    arrays = {
+        "party_spectrum_position": np.array([party.spectrum_position for party in party_list], dtype=np.float64),
+        "party_total_votes": np.array(party_votes, dtype=np.float64 if any(isinstance(votes, float) for votes in party_votes) else np.int64),
+        "party_seats_awarded": np.array([party.seats_awarded for party in party_list], dtype=np.int64),
+        "district_eligible_voters": np.array([district.eligible_voters for district in districts], dtype=np.float64),
+        "district_area": np.array([district.area for district in districts], dtype=np.float64),
+        "district_location": np.array([tuple(district.location) for district in districts], dtype=np.float64).reshape(len(districts), 2),
+        "district_fylkeid": np.array([district.fylkeid if fylke else -1 for district, fylke in zip(districts, fylker)], dtype=np.int64), # type: ignore
+        "district_available_leveling_seats": np.array([district.available_leveling_seats if fylke else 0 # type: ignore
+                                                       for district, fylke in zip(districts, fylker)], dtype=np.int64),
+        "district_num_seats": num_seats,
+        "candidate_offsets": np.array(candidate_offsets, dtype=np.int64),
+        "candidates": np.array(candidates, dtype=np.int64),
+        "integer_scores": np.concatenate(scores[False] + [np.zeros(0, dtype=np.int64)]).astype(np.int64),
+        "float_scores": np.concatenate(scores[True] + [np.zeros(0)]).astype(np.float64),
+        "score_starts": score_starts,
+        "results": np.concatenate(results) if results else np.zeros(0, dtype=np.int64),
+        "leveling_offsets": np.array(leveling_offsets, dtype=np.int64),
+        "leveling": np.array(leveling, dtype=np.int64),
+    }
+
+    # the array offsets are relative to the end of the metadata, so the metadata does not depend on its own length
+    directory: dict[str, dict[str, Any]] = {}
+    position = 0
+    for name, array in arrays.items():
+        array = arrays[name] = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        directory[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+        position += array.nbytes + _padding(array.nbytes)
+    header = json.dumps({"parties": {"names": [party.name for party in party_list], "colors": [party.color for party in party_list]},
+                         "strings": list(strings),
+                         "districts": district_info,
+                         "arrays": directory,
+                         "metadata": metadata or {}}).encode()
+    header += b" "*_padding(_HEADER.size + len(header))
+
+    path = os.fspath(path)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as outfile:
+        outfile.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(header)))
+        outfile.write(header)
+        for array in arrays.values():
+            outfile.write(array.tobytes())
+            outfile.write(b"\0"*_padding(array.nbytes))
+    os.replace(temp_path, path)
+
+
+class Snapshot:
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        """ A saved election, opened memory-mapped from a file written by save_snapshot().
+
+        Opening only reads the header. The arrays (e.g. scores, district_area) are read-only views of the file,
+        read from disk as they are used, and shared through the page cache by all processes that open the snapshot.
+        The Party, district and Distribution objects are built on first use: parties builds all the parties, while
+        district() builds only one district and its distribution.
+
+        A rebuilt distribution shares the score array with the file and copies it only before its scores are first
+        changed, like a fork. If a result was stored, it is the result of the distribution without calculating again.
+
+        A Snapshot is pickled as its path, so it can be passed to worker processes cheaply.
+
+        Args:
+            path: Path to the snapshot file.
+        """
+        self.path = os.fspath(path)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode="r")
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{self.path} is not an election snapshot")
+        magic, version, header_size = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not an election snapshot of format version {FORMAT_VERSION}")
+        self._header = json.loads(bytes(self._map[_HEADER.size:_HEADER.size + header_size]))
+        self._data_start = _HEADER.size + header_size
+        self._arrays: dict[str, np.ndarray] = {}
+        self._district_index = {info["name"]: row for row, info in enumerate(self._header["districts"])}
+        self._parties: Union[list[Party], None] = None
+        self._districts: dict[int, _District] = {}
+
+    def __reduce__(self) -> tuple[type, tuple[str]]:
+        return (Snapshot, (self.path,))
+
+    def array(self, name: str) -> np.ndarray:
+        """ Return a stored array as a read-only view of the file, e.g. "scores" or "district_location". """
+        if name not in self._arrays:
+            entry = self._header["arrays"][name]
+            dtype = np.dtype(entry["dtype"])
+            start = self._data_start + entry["offset"]
+            count = int(np.prod(entry["shape"], dtype=np.int64))
+            self._arrays[name] = self._map[start:start + count*dtype.itemsize].view(np.ndarray).view(dtype).reshape(entry["shape"])
+        return self._arrays[name]
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        """ The metadata passed to save_snapshot(). """
+        return self._header["metadata"]
+
+    @property
+    def party_names(self) -> list[str]:
+        return list(self._header["parties"]["names"])
+
+    @property
+    def district_names(self) -> list[str]:
+        return [info["name"] for info in self._header["districts"]]
+
+    @property
+    def parties(self) -> list[Party]:
+        """ The parties, built on first use. The same objects are the candidates of the rebuilt distributions. """
+        if self._parties is None:
+            names, colors = self._header["parties"]["names"], self._header["parties"]["colors"]
+            positions = self.array("party_spectrum_position").tolist()
+            votes = self.array("party_total_votes").tolist()
+            seats = self.array("party_seats_awarded").tolist()
+            self._parties = [Party(*fields) for fields in zip(names, positions, colors, votes, seats)]
+        return self._parties
+
+    def _candidate(self, reference: int) -> Union[str, Party]:
+        return self.parties[reference] if reference >= 0 else self._header["strings"][-1 - reference]
+
+    def _row(self, district: Union[str, int]) -> int:
+        if isinstance(district, str):
+            if district not in self._district_index:
+                raise KeyError(f"There is no district named {district} in the snapshot")
+            return self._district_index[district]
+        return int(district)
+
+    def _slice(self, district: Union[str, int]) -> slice:
+        offsets = self.array("candidate_offsets")
+        row = self._row(district)
+        return slice(int(offsets[row]), int(offsets[row + 1]))
+
+    def scores(self, district: Union[str, int]) -> np.ndarray:
+        """ Read-only scores of a district, by name or row, in the order of its candidates. They are int64 or float64,
+        like the scores of the saved distribution.
+        """
+        row = self._row(district)
+        info = self._header["districts"][row]
+        if "method" not in info:
+            return self.array("integer_scores")[:0]
+        candidates = self._slice(row)
+        start = int(self.array("score_starts")[row])
+        return self.array("float_scores" if info["float_scores"] else "integer_scores")[start:start + candidates.stop - candidates.start]
+
+    def results(self, district: Union[str, int]) -> Union[np.ndarray, None]:
+        """ Read-only stored seats of a district, by name or row, or None if no result was stored. """
+        if not self._header["districts"][self._row(district)].get("calculated"):
+            return None
+        return self.array("results")[self._slice(district)]
+
+    def candidates(self, district: Union[str, int]) -> list[Union[str, Party]]:
+        """ The candidates of a district, in the order of its scores. """
+        return [self._candidate(reference) for reference in self.array("candidates")[self._slice(district)].tolist()]
+
+    def district(self, district: Union[str, int]) -> _District:
+        """ Return a district, by name or row, with its distribution. It is built on first use. """
+        row = self._row(district)
+        if row not in self._districts:
+            self._districts[row] = self._build_district(row)
+        return self._districts[row]
+
+    @property
+    def districts(self) -> dict[str, _District]:
+        """ All the districts by name, built on first use. """
+        return {info["name"]: self.district(row) for row, info in enumerate(self._header["districts"])}
+
+    def _build_district(self, row: int) -> _District:
+        info = self._header["districts"][row]
+        eligible_voters = self.array("district_eligible_voters")[row].item()
+        area = self.array("district_area")[row].item()
+        location = tuple(self.array("district_location")[row].tolist())
+        distribution = self._build_distribution(row) if "method" in info else None
+        if info["type"] != "NorwegianFylke":
+            return District(info["name"], eligible_voters, area, location, distribution) # type: ignore
+        fylke = NorwegianFylke(self.array("district_fylkeid")[row].item(), eligible_voters, area, location, distribution, info["name"]) # type: ignore
+        fylke.available_leveling_seats = self.array("district_available_leveling_seats")[row].item()
+        offsets = self.array("leveling_offsets")
+        for reference in self.array("leveling")[offsets[row]:offsets[row + 1]].tolist():
+            fylke.add_leveling_seat_winner(self._candidate(reference))
+        return fylke
+
+    def _build_distribution(self, row: int) -> Distribution:
+        info = self._header["districts"][row]
+        classes = _distribution_classes()
+        if info["method"] not in classes:
+            raise ValueError(f"Unknown distribution method {info['method']}, import the module that defines it first")
+        distribution = classes[info["method"]](self.array("district_num_seats")[row].item(), **info["parameters"])
+        distribution.threshold = info["threshold"]
+        distribution.absolute_threshold = info["absolute_threshold"]
+        distribution.excluded = [self._candidate(reference) for reference in info["excluded"]]
+        distribution.tie_break = info["tie_break"]
+        distribution.seed = info["seed"]
+
+        keys = self.candidates(row)
+        scores = self.scores(row)
+        seats = self.results(row)
+        result = None
+        if seats is not None:
+            has_result = seats >= 0
+            result = Result([key for key, stored in zip(keys, has_result.tolist()) if stored], seats[has_result])
+        distribution._set_arrays(keys, scores, result) # the scores stay a read-only view of the file until changed
+        return distribution
+
+    @property
+    def num_districts(self) -> int:
+        return len(self._header["districts"])
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.Snapshot '{self.path}', parties={len(self._header['parties']['names'])}, districts={self.num_districts} at {hex(id(self))}>"
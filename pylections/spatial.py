@@ -0,0 +1,170 @@
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+from pylections.party import Party
+from .district import _District
+
+
+class DistrictIndex:
+    def __init__(self,
+                 districts: Union[Iterable[_District], dict[str, _District]],
+                 cell_size: Union[float, None] = None) -> None:
+        """ Spatial index over the locations of districts, for nearest district lookups, box and radius queries
+        and totals of the votes and seats in a region.
+
+        The locations are one (districts x 2) array, bucketed in a regular grid and sorted by grid row, then column.
+        The districts in the cells of one grid row of a box are then one contiguous slice, so a query looks at a
+        slice per grid row and checks the exact bounds of those districts only, instead of scanning all districts.
+
+        The coordinates are used as they are (planar), so with (latitude, longitude) locations the radius is in degrees.
+        The index is not updated when a location changes, see rebuild().
+
+        Args:
+            districts: The districts, or a dict of them.
+            cell_size: Side length of the grid cells. By default there is about one district per cell.
+        """
+        if isinstance(districts, dict):
+            districts = districts.values()
+        self._districts = list(districts)
+        self._cell_size_setting = cell_size
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """ Index the current locations of the districts again. """
+        num_districts = len(self._districts)
+        coordinates = np.array([tuple(district.location) for district in self._districts], dtype=np.float64).reshape(num_districts, 2)
+        self._origin = coordinates.min(axis=0) if num_districts else np.zeros(2)
+        extent = coordinates.max(axis=0) - self._origin if num_districts else np.zeros(2)
+        cell_size = self._cell_size_setting
+        if cell_size is None:
+            cell_size = extent.max()/max(np.ceil(np.sqrt(num_districts)), 1) # about one district per cell
+        if not cell_size > 0:
+            cell_size = 1.0 # all the districts in the same place
+        self._cell_size = float(cell_size)
+
+        cells = np.floor((coordinates - self._origin)/self._cell_size).astype(np.int64)
+        self._shape = cells.max(axis=0) + 1 if num_districts else np.ones(2, dtype=np.int64) # columns (x), rows (y)
+        cell_ids = cells[:, 1]*self._shape[0] + cells[:, 0]
+        self._order = np.argsort(cell_ids, kind="stable")
+        self._sorted_coordinates = coordinates[self._order]
+        self._cell_offsets = np.searchsorted(cell_ids[self._order], np.arange(self._shape[0]*self._shape[1] + 1))
+        self._coordinates = coordinates
+        self._coordinates.flags.writeable = False
+
+    def _cells(self, point: np.ndarray) -> np.ndarray:
+        """ Return the (column, row) of the grid cell of a point, clipped to the grid. """
+        return np.clip(np.floor((point - self._origin)/self._cell_size).astype(np.int64), 0, self._shape - 1)
+
+    def _cell_range(self, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """ Return the sorted positions of the districts in the cells from low to high (column, row), inclusive. """
+        rows = np.arange(low[1], high[1] + 1)
+        starts = self._cell_offsets[rows*self._shape[0] + low[0]]
+        lengths = self._cell_offsets[rows*self._shape[0] + high[0] + 1] - starts
+        # one contiguous slice per grid row, concatenated without a Python loop
+        ends = np.cumsum(lengths)
+        return np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + lengths, lengths)
+
+    def _box_positions(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        if not self._districts or min_x > max_x or min_y > max_y:
+            return np.zeros(0, dtype=np.int64)
+        low, high = np.array([min_x, min_y]), np.array([max_x, max_y])
+        if (high < self._origin).any() or (low > self._origin + self._cell_size*self._shape).any():
+            return np.zeros(0, dtype=np.int64)
+        positions = self._cell_range(self._cells(low), self._cells(high))
+        coordinates = self._sorted_coordinates[positions]
+        inside = ((coordinates >= low) & (coordinates <= high)).all(axis=1)
+        return positions[inside]
+
+    def box_indices(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """ Return the indices (in the order the districts were given) of the districts inside a box, bounds included, in ascending order. """
+        return np.sort(self._order[self._box_positions(min_x, min_y, max_x, max_y)])
+
+    def radius_indices(self, x: float, y: float, radius: float) -> np.ndarray:
+        """ Return the indices of the districts within a distance of a point, bounds included, the closest first. """
+        positions = self._box_positions(x - radius, y - radius, x + radius, y + radius)
+        distances = np.hypot(*(self._sorted_coordinates[positions] - (x, y)).T)
+        indices = self._order[positions[distances <= radius]]
+        return indices[np.lexsort((indices, distances[distances <= radius]))]
+
+    def nearest_indices(self, x: float, y: float, k: int = 1) -> np.ndarray:
+        """ Return the indices of the k districts closest to a point, the closest first. Equal distances are in index order. """
+        k = min(k, len(self._districts))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        point = np.array([x, y], dtype=np.float64)
+        cell = self._cells(point)
+        ring = 0
+        while True: # grow a square of cells around the point until it holds k districts
+            positions = self._cell_range(np.maximum(cell - ring, 0), np.minimum(cell + ring, self._shape - 1))
+            if len(positions) >= k:
+                break
+            ring += 1
+        # the k-th distance in the square bounds the answer, but closer districts can be in cells outside it
+        distances = np.hypot(*(self._sorted_coordinates[positions] - point).T)
+        radius = np.partition(distances, k - 1)[k - 1]
+        return self.radius_indices(x, y, radius)[:k]
+
+    def in_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> list[_District]:
+        """ The districts inside a box, e.g. a map viewport, see box_indices(). """
+        return self.select(self.box_indices(min_x, min_y, max_x, max_y))
+
+    def in_radius(self, x: float, y: float, radius: float) -> list[_District]:
+        """ The districts within a distance of a point, the closest first. """
+        return self.select(self.radius_indices(x, y, radius))
+
+    def nearest(self, x: float, y: float, k: int = 1) -> list[_District]:
+        """ The k districts closest to a point, the closest first. """
+        return self.select(self.nearest_indices(x, y, k))
+
+    def select(self, indices: Union[np.ndarray, Sequence[int]]) -> list[_District]:
+        """ Return the districts at some indices. """
+        return [self._districts[index] for index in np.asarray(indices, dtype=np.int64).tolist()]
+
+    def total(self, values: Union[np.ndarray, Sequence], indices: Union[np.ndarray, Sequence[int]]) -> np.ndarray:
+        """ Sum the rows of an array with one row per district (in the order the districts were given) over some districts.
+
+        Args:
+            values: One value, or a row of values, per district, e.g. a (districts x parties) vote table.
+            indices: The districts to sum, e.g. from box_indices().
+        """
+        return np.asarray(values)[np.asarray(indices, dtype=np.int64)].sum(axis=0)
+
+    def votes(self, indices: Union[np.ndarray, Sequence[int]]) -> dict[Union[str, Party], Union[int, float]]:
+        """ Sum the scores of each candidate over the distributions of some districts. Districts without a distribution are skipped. """
+        totals: dict[Union[str, Party], Union[int, float]] = {}
+        for district in self.select(indices):
+            if district.distribution is None:
+                continue
+            for candidate, score in zip(district.distribution.candidates, district.distribution.score_array.tolist()):
+                totals[candidate] = totals.get(candidate, 0) + score
+        return totals
+
+    def seats(self, indices: Union[np.ndarray, Sequence[int]]) -> dict[Union[str, Party], int]:
+        """ Sum the seats of each candidate over the results of some districts, calculating them if needed. """
+        totals: dict[Union[str, Party], int] = {}
+        for district in self.select(indices):
+            if district.distribution is None:
+                continue
+            for candidate, seats in district.distribution.result.items():
+                totals[candidate] = totals.get(candidate, 0) + seats
+        return totals
+
+    @property
+    def districts(self) -> list[_District]:
+        return list(self._districts)
+
+    @property
+    def coordinates(self) -> np.ndarray:
+        """ Read-only (districts x 2) locations, in the order the districts were given. """
+        return self._coordinates
+
+    @property
+    def cell_size(self) -> float:
+        return self._cell_size
+
+    def __len__(self) -> int:
+        return len(self._districts)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.DistrictIndex, districts={len(self._districts)}, grid={tuple(self._shape.tolist())}, cell_size={self._cell_size:.4g} at {hex(id(self))}>"
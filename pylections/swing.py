@@ -0,0 +1,245 @@
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+from pylections.party import Party
+from .compensation import leveling_seats
+from .distribution.distribution import Distribution, DivisorMethod, StLague, apportion_batch, eligibility_mask
+from .district import _District
+
+
+SWING_MODELS = ("uniform", "proportional", "logit")
+
+
+def apply_swing(baseline: np.ndarray,
+                national_shares: np.ndarray,
+                model: str = "uniform") -> np.ndarray:
+    """ Apply the national change in vote shares from the baseline to new national shares (e.g. polls) to every district,
+    for many scenarios at once.
+
+    With s the share of a party in a district, b its national baseline share and n its new national share:
+
+    - "uniform": s + (n - b), the same change in percentage points everywhere (negative shares become 0).
+    - "proportional": s*n/b, the same relative change everywhere.
+    - "logit": the same change in log-odds everywhere, logit(s) + logit(n) - logit(b), which keeps shares between 0 and 1
+      and moves parties less where they are very strong or very weak.
+
+    The shares of each district are then scaled to sum to 1 again, and multiplied by the votes cast in the district.
+    A party with no baseline votes in a district (e.g. not standing there) keeps 0 votes there.
+
+    Args:
+        baseline: Baseline votes, (districts x parties).
+        national_shares: New national shares, (parties) or (scenarios x parties). Each row is scaled to sum to 1, so
+            percentages work as well.
+        model: "uniform", "proportional" or "logit".
+
+    Returns:
+        The votes of each party in each district, (scenarios x districts x parties), or (districts x parties) for a
+        single row of national shares.
+    """
+    if model not in SWING_MODELS:
+        raise ValueError(f"The swing model must be one of {SWING_MODELS}, but was: {model}")
+    single = np.ndim(national_shares) == 1
+    baseline = np.asarray(baseline, dtype=float)
+    targets = np.atleast_2d(np.asarray(national_shares, dtype=float))
+    if targets.shape[1] != baseline.shape[1]:
+        raise ValueError(f"Expected national shares for {baseline.shape[1]} parties, got {targets.shape[1]}")
+    targets = targets/targets.sum(axis=1, keepdims=True)
+    cast = baseline.sum(axis=1, keepdims=True)
+    standing = baseline > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(cast > 0, baseline/cast, 0)
+        base = baseline.sum(axis=0)/baseline.sum()
+        if model == "uniform":
+            swung = np.maximum(shares + (targets - base)[:, np.newaxis, :], 0)
+        elif model == "proportional":
+            swung = shares*np.where(base > 0, targets/base, 0)[:, np.newaxis, :]
+        else:
+            change = np.log(targets) - np.log1p(-targets) - (np.log(base) - np.log1p(-base))
+            odds = shares/(1 - shares)*np.exp(change)[:, np.newaxis, :]
+            swung = np.where(np.isinf(odds), 1, odds/(1 + odds)) # a share of 1 stays 1
+        swung = np.where(standing & np.isfinite(swung), swung, 0)
+        total = swung.sum(axis=2, keepdims=True)
+        votes = np.where(total > 0, swung/total, 0)*cast
+
+    return votes[0] if single else votes
+
+
+class SwingModel:
+    def __init__(self,
+                 districts: Union[Iterable[_District], dict[str, _District]],
+                 parties: Sequence[Union[str, Party]] = (),
+                 model: str = "uniform") -> None:
+        """ Seat projections from national vote shares, by swinging the baseline votes of every district.
+
+        The baseline is a (districts x parties) matrix, read once from the scores of the district distributions.
+        A set of national shares (one row per scenario, e.g. poll averages or simulation draws) is swung onto it as
+        one (scenarios x districts x parties) array, see apply_swing(). The seats of every district in every scenario
+        are then apportioned at once, one batch per divisor method, with apportion_batch(). The national leveling
+        seats follow from leveling_seats() on the summed votes and district seats.
+
+        Districts with other methods (e.g. Hamilton) are calculated with a fork of their distribution per scenario,
+        which is much slower.
+
+        Args:
+            districts: The districts, or a dict of them. Each must have a distribution with the baseline scores.
+            parties: The parties (or candidate IDs) first in the columns. Other candidates of the districts follow
+                in the order they are found.
+            model: The swing model, "uniform", "proportional" or "logit".
+        """
+        if isinstance(districts, dict):
+            districts = districts.values()
+        self._districts = list(districts)
+        self.model = model
+        columns = {candidate: index for index, candidate in enumerate(dict.fromkeys(parties))}
+        for district in self._districts:
+            if district.distribution is None:
+                raise ValueError(f"District {district.name} has no distribution")
+            for candidate in district.distribution.candidates:
+                columns.setdefault(candidate, len(columns))
+        self._candidates = list(columns)
+
+        # the column of each candidate of each district, and the baseline matrix
+        self._positions = [np.array([columns[candidate] for candidate in district.distribution.candidates], dtype=np.int64) # type: ignore
+                           for district in self._districts]
+        for positions in self._positions:
+            positions.flags.writeable = False
+        self._baseline = np.zeros((len(self._districts), len(self._candidates)))
+        self._standing = np.zeros(self._baseline.shape, dtype=bool)
+        self._excluded = np.zeros(self._baseline.shape, dtype=bool)
+        for row, (district, positions) in enumerate(zip(self._districts, self._positions)):
+            distribution = district.distribution
+            self._baseline[row, positions] = distribution.score_array # type: ignore
+            self._standing[row, positions] = True
+            self._excluded[row, [columns[candidate] for candidate in distribution.excluded if candidate in columns]] = True # type: ignore
+        self._baseline.flags.writeable = False
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @model.setter
+    def model(self, value: str) -> None:
+        if value not in SWING_MODELS:
+            raise ValueError(f"The swing model must be one of {SWING_MODELS}, but was: {value}")
+        self._model = value
+
+    @property
+    def candidates(self) -> list[Union[str, Party]]:
+        """ The parties or candidate IDs of the columns. """
+        return list(self._candidates)
+
+    @property
+    def districts(self) -> list[_District]:
+        return list(self._districts)
+
+    def positions(self, district: int) -> np.ndarray:
+        """ Read-only columns of the candidates of a district (by row), in the order of its distribution. """
+        return self._positions[district]
+
+    @property
+    def baseline(self) -> np.ndarray:
+        """ Read-only baseline votes, (districts x candidates). """
+        return self._baseline
+
+    @property
+    def baseline_shares(self) -> np.ndarray:
+        """ National baseline share of each candidate. """
+        return self._baseline.sum(axis=0)/self._baseline.sum()
+
+    def votes(self, national_shares: np.ndarray) -> np.ndarray:
+        """ Return the swung votes, (scenarios x districts x candidates), see apply_swing(). """
+        return apply_swing(self._baseline, np.atleast_2d(national_shares), self._model)
+
+    def district_seats(self, votes: np.ndarray) -> np.ndarray:
+        """ Apportion the seats of every district in every scenario.
+
+        The thresholds and excluded candidates of each district distribution apply. Quotients are compared as floats,
+        and equal quotients go to the candidate in the earlier column.
+
+        Args:
+            votes: Votes, (scenarios x districts x candidates), e.g. from votes().
+
+        Returns:
+            The seats of each candidate in each district, (scenarios x districts x candidates).
+        """
+        votes = np.asarray(votes, dtype=float)
+        num_scenarios = len(votes)
+        seats = np.zeros(votes.shape, dtype=np.int64)
+        groups: dict[tuple, list[int]] = {}
+        for row, district in enumerate(self._districts):
+            distribution = district.distribution
+            if isinstance(distribution, DivisorMethod):
+                key = (type(distribution), tuple(sorted(distribution._divisor_parameters().items())))
+                groups.setdefault(key, []).append(row)
+            else:
+                seats[:, row] = self._fork_seats(row, votes[:, row])
+
+        for rows in groups.values():
+            distributions: list[Distribution] = [self._districts[row].distribution for row in rows] # type: ignore
+            num_seats = np.array([distribution.num_seats for distribution in distributions], dtype=np.int64)
+            thresholds = np.array([distribution.threshold for distribution in distributions], dtype=float)[:, np.newaxis]
+            absolute = np.array([distribution.absolute_threshold for distribution in distributions], dtype=float)[:, np.newaxis]
+            scores = votes[:, rows]
+            eligible = self._standing[rows] & eligibility_mask(scores, thresholds, absolute, self._excluded[rows])
+            divisors = distributions[0].divisor_table(int(num_seats.max(initial=0))) # type: ignore
+            flat = (num_scenarios*len(rows), len(self._candidates))
+            awarded = apportion_batch(scores.reshape(flat), np.tile(num_seats, num_scenarios), divisors, eligible=eligible.reshape(flat))
+            seats[:, rows] = awarded.reshape(scores.shape)
+        return seats
+
+    def _fork_seats(self, row: int, votes: np.ndarray) -> np.ndarray:
+        """ Calculate the seats of one district in each scenario with a fork of its distribution. """
+        distribution = self._districts[row].distribution.fork() # type: ignore
+        positions = self._positions[row]
+        seats = np.zeros(votes.shape, dtype=np.int64)
+        integer_scores = distribution.score_array.dtype.kind != "f"
+        candidates = distribution.candidates
+        for scenario, scores in enumerate(votes[:, positions]):
+            distribution.set_score_array(np.rint(scores).astype(np.int64) if integer_scores else scores)
+            result = distribution.result
+            seats[scenario, positions] = [result.get(candidate, 0) for candidate in candidates]
+        return seats
+
+    def leveling(self,
+                 votes: np.ndarray,
+                 district_seats: np.ndarray,
+                 total_seats: Union[int, np.ndarray],
+                 method: Union[DivisorMethod, type] = StLague,
+                 threshold: Union[float, int] = 0,
+                 seat_exemption: Union[int, None] = None,
+                 overhang: str = "exclude") -> np.ndarray:
+        """ Return the national leveling seats of each candidate in each scenario, (scenarios x candidates),
+        from the summed votes and district seats, see leveling_seats().
+        """
+        return leveling_seats(np.asarray(votes).sum(axis=1), np.asarray(district_seats).sum(axis=1), total_seats,
+                              method, threshold, seat_exemption, overhang)
+
+    def project(self,
+                national_shares: np.ndarray,
+                total_seats: Union[int, np.ndarray, None] = None,
+                method: Union[DivisorMethod, type] = StLague,
+                threshold: Union[float, int] = 0,
+                seat_exemption: Union[int, None] = None,
+                overhang: str = "exclude") -> tuple[np.ndarray, Union[np.ndarray, None]]:
+        """ Project the seats for some national shares.
+
+        Args:
+            national_shares: New national shares, (candidates) or (scenarios x candidates), in the order of candidates.
+            total_seats: Size of the house including leveling seats, or None for no leveling seats.
+            method, threshold, seat_exemption, overhang: The national leveling rules, see leveling_seats().
+                Norway uses StLague(0, initial_divisor=1.4), a threshold of 4 and 169 total seats.
+
+        Returns:
+            The district seats (scenarios x districts x candidates), and the leveling seats (scenarios x candidates)
+            or None.
+        """
+        votes = self.votes(national_shares)
+        seats = self.district_seats(votes)
+        if total_seats is None:
+            return seats, None
+        return seats, self.leveling(votes, seats, total_seats, method, threshold, seat_exemption, overhang)
+
+    def __repr__(self) -> str:
+        return f"<{__name__}.SwingModel, model={self.model}, districts={len(self._districts)}, candidates={len(self._candidates)} at {hex(id(self))}>"
@@ -0,0 +1,63 @@
+from pylections.aggregation import VoteHierarchy
+from pylections.distribution.distribution import StLague
+from pylections.district import District
+import numpy as np
+import pytest
+
+
+""" Test the polling station hierarchy and its incremental totals """
+
+
+def test_totals_follow_station_updates() -> None:
+    """ Test that the incremental totals match summing the station counts again, after many updates. """
+    rng = np.random.default_rng(2)
+    stations = [(f"s{index}", f"m{index % 7}", f"d{index % 7 % 3}") for index in range(40)]
+    hierarchy = VoteHierarchy(["A", "B", "C"], stations)
+    assert hierarchy.municipality_names == ["m0", "m3", "m6", "m1", "m4", "m2", "m5"] # sorted by district
+    for _ in range(200):
+        chosen = rng.choice(40, size=rng.integers(1, 5), replace=False)
+        names = [f"s{index}" for index in chosen]
+        if rng.random() < 0.5:
+            hierarchy.set_votes(names, rng.integers(0, 500, size=(len(names), 3)))
+        else:
+            hierarchy.add_votes(names, rng.integers(0, 50, size=(len(names), 3)))
+
+    station_votes = {name: hierarchy.station_votes(name) for name in hierarchy.station_names}
+    for municipality in hierarchy.municipality_names:
+        expected = sum(station_votes[name] for name, municipality_name, _ in stations if municipality_name == municipality)
+        assert hierarchy.municipality_votes(municipality).tolist() == expected.tolist()
+    for district in hierarchy.district_names:
+        expected = sum(station_votes[name] for name, _, district_name in stations if district_name == district)
+        assert hierarchy.district_votes(district).tolist() == expected.tolist()
+    totals = hierarchy.district_array.copy()
+    hierarchy.resum()
+    assert hierarchy.district_array.tolist() == totals.tolist()
+
+    with pytest.raises(ValueError):
+        hierarchy.set_votes(["s1", "s1"], np.zeros((2, 3), dtype=int))
+    with pytest.raises(ValueError):
+        hierarchy.station_array[0, 0] = 1
+    with pytest.raises(ValueError):
+        VoteHierarchy(["A"], [("s0", "m0", "d0"), ("s1", "m0", "d1")])
+
+
+def test_bound_district_distribution() -> None:
+    """ Test that bound districts get the district totals as scores, also when the distribution has other candidates first. """
+    hierarchy = VoteHierarchy(["A", "B"], [("s0", "m0", "north"), ("s1", "m1", "north"), ("s2", "m2", "south")])
+    distribution = StLague(4)
+    distribution.add_score({"C": 10, "B": 0})
+    north = District("north", 1000, 10, distribution=distribution)
+    hierarchy.bind(north)
+    assert distribution.name_list == ["C", "B", "A"]
+
+    hierarchy.set_votes("s0", [300, 100])
+    hierarchy.add_votes("s1", [0, 150])
+    hierarchy.set_votes("s2", [1000, 1000]) # another district, so the scores don't change
+    assert distribution.score_array.tolist() == [10, 250, 300]
+    assert north.result == StLague.get(4, {"C": 10, "B": 250, "A": 300})
+
+    hierarchy.add_votes("s1", [0.5, 0]) # float counts upcast the totals
+    assert distribution.score_array.tolist() == [10, 250, 300.5]
+    hierarchy.unbind(north)
+    hierarchy.set_votes("s0", [0, 0])
+    assert distribution.score_array.tolist() == [10, 250, 300.5]
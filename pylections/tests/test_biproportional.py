@@ -0,0 +1,53 @@
+from pylections.biproportional import Biproportional, BiproportionalConvergenceError, biproportional_apportionment, _apportion_rows
+from pylections.distribution.distribution import StLague
+from pylections.district import District
+from pylections.party import Party
+import numpy as np
+import pytest
+
+
+""" Test biproportional apportionment """
+
+
+def check_apportionment(votes: np.ndarray, row_seats, column_seats, seats: np.ndarray, row_divisors: np.ndarray, column_divisors: np.ndarray) -> None:
+    """ Check the seat totals and that the seats are the rounded votes over the divisors. """
+    assert (seats.sum(axis=-1) == row_seats).all()
+    assert (seats.sum(axis=-2) == column_seats).all()
+    quotients = votes/(row_divisors[..., np.newaxis]*column_divisors[..., np.newaxis, :])
+    assert (np.abs(quotients - seats) <= 0.5 + 1e-9).all()
+
+
+def test_biproportional_districts() -> None:
+    """ Test that the district and party totals are both met, unlike with Sainte-Lague in each district. """
+    parties = [Party("A", total_votes=9000), Party("B", total_votes=6000), Party("C", total_votes=3000)]
+    votes = {"North": [5000, 1000, 2000], "South": [4000, 5000, 1000]}
+    districts = []
+    for name, district_votes in votes.items():
+        district = District(name, 0, 0, distribution=StLague(5))
+        for party, party_votes in zip(parties, district_votes):
+            district.distribution.add_score(party, party_votes) # type: ignore
+        districts.append(district)
+
+    biproportional = Biproportional(districts, parties)
+    assert biproportional.upper_apportionment().tolist() == [5, 3, 2]
+    seat_df, district_divisors, party_divisors = biproportional.calculate()
+    assert seat_df.sum(axis=1).tolist() == [5, 5]
+    assert seat_df.sum(axis=0).tolist() == [5, 3, 2]
+    check_apportionment(biproportional.vote_matrix(), [5, 5], [5, 3, 2], seat_df.to_numpy(), district_divisors, party_divisors)
+    assert biproportional.result["North"][parties[0]] == 3
+
+
+def test_batched_scenarios() -> None:
+    """ Test random scenarios passed at once, and an apportionment that does not exist. """
+    rng = np.random.default_rng(3)
+    votes = np.floor(rng.gamma(2, size=(50, 8, 6))*rng.gamma(1, size=(50, 1, 6))*1000) + 1
+    row_seats = rng.integers(1, 10, size=(50, 8))
+    column_seats = np.stack([_apportion_rows(scenario.sum(axis=0)[np.newaxis], np.array([total]))[0][0]
+                             for scenario, total in zip(votes, row_seats.sum(axis=1))])
+    seats, row_divisors, column_divisors = biproportional_apportionment(votes, row_seats, column_seats)
+    check_apportionment(votes, row_seats, column_seats, seats, row_divisors, column_divisors)
+
+    with pytest.raises(ValueError):
+        biproportional_apportionment(np.array([[10, 0], [0, 10]]), [1, 1], [2, 0])
+    with pytest.raises(BiproportionalConvergenceError):
+        biproportional_apportionment(np.array([[10, 0, 0], [10, 0, 0], [0, 5, 5]]), [1, 1, 1], [1, 1, 1])
@@ -0,0 +1,45 @@
+from pylections.analysis.coalitions import minimal_winning_masks, minimal_connected_coalitions, coalition_frequencies, winning_frequency
+from pylections.party import Party
+from itertools import combinations
+import numpy as np
+
+
+""" Test coalition enumeration """
+
+
+def brute_force_minimal(weights: list[int], quota: int) -> set[int]:
+    found = set()
+    for size in range(1, len(weights) + 1):
+        for members in combinations(range(len(weights)), size):
+            total = sum(weights[i] for i in members)
+            if total >= quota and all(total - weights[i] < quota for i in members) and all(weights[i] > 0 for i in members):
+                found.add(sum(1 << i for i in members))
+    return found
+
+
+def test_minimal_winning_matches_brute_force() -> None:
+    """ Test that the pruned search finds exactly the minimal winning coalitions. """
+    rng = np.random.default_rng(3)
+    for _ in range(30):
+        weights = rng.integers(0, 40, size=9)
+        quota = int(weights.sum())//2 + 1
+        masks = minimal_winning_masks(weights, quota)
+        assert len(masks) == len(set(masks))
+        assert set(masks) == brute_force_minimal(weights.tolist(), quota)
+
+
+def test_connected_coalitions_and_frequencies() -> None:
+    """ Test connected coalitions on the spectrum and frequencies over a batch. """
+    left, centre, right, far_right = Party("L", -2), Party("C", 0), Party("R", 1), Party("FR", 3)
+    seats = {right: 30, left: 40, far_right: 10, centre: 21}
+    connected = minimal_connected_coalitions(seats)
+    assert connected == [[left, centre], [centre, right]]
+
+    batch = np.array([[40, 21, 30, 10], [40, 21, 30, 10], [60, 21, 10, 10]])
+    frequencies = coalition_frequencies(batch, ["L", "C", "R", "FR"])
+    by_members = {tuple(members): frequency for members, frequency in zip(frequencies["members"], frequencies["frequency"])}
+    assert by_members[("L", "C")] == 2/3 # not minimal when L has a majority alone
+    assert by_members[("L",)] == 1/3
+    assert frequencies["frequency"].is_monotonic_decreasing
+    viable = winning_frequency(batch, ["L", "C", "R", "FR"], [["C", "R", "FR"], ["L"]])
+    assert np.allclose(viable, [2/3, 1/3])
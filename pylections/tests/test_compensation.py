@@ -0,0 +1,114 @@
+from pylections.compensation import Compensation, additional_member_seats, enlarged_house_seats, leveling_seats, minimal_house_size, threshold_mask
+from pylections.distribution.distribution import StLague
+from pylections.party import Party
+import numpy as np
+
+
+""" Test the compensation seats of mixed electoral systems """
+
+
+def reference_leveling(votes: np.ndarray, won: np.ndarray, total_seats: int, threshold: float) -> list[int]:
+    """ Leave out parties with more won seats than their share and apportion again, one party list at a time. """
+    names = [str(index) for index in range(len(votes))]
+    share = 100*votes/votes.sum()
+    active = [name for name, party_share in zip(names, share) if party_share >= threshold and votes[int(name)] > 0]
+    house = total_seats - int(sum(won[index] for index, name in enumerate(names) if name not in active))
+    while True:
+        result = StLague.get(house, active, [int(votes[int(name)]) for name in active], initial_divisor=1.4) if active else {}
+        over = [name for name in active if won[int(name)] > result[name]]
+        if not over:
+            break
+        for name in over:
+            active.remove(name)
+            house -= int(won[int(name)])
+    return [result[name] - won[index] if name in active else 0 for index, name in enumerate(names)]
+
+
+def test_leveling_seats_exclude_overrepresented_parties() -> None:
+    """ Test the Nordic rule against the remove-and-rerun loop, for many draws at once. """
+    rng = np.random.default_rng(3)
+    votes = rng.dirichlet(np.full(8, 0.6), size=200)*100000
+    won = votes/votes.sum(axis=1, keepdims=True)*150*rng.uniform(0.6, 1.6, size=(200, 8))
+    won = np.floor(won*np.minimum(150/won.sum(axis=1, keepdims=True), 1)).astype(int) # at most 150 district seats
+    votes = np.round(votes)
+    seats = leveling_seats(votes, won, 169, StLague(0, initial_divisor=1.4), threshold=4)
+    for draw in range(200):
+        assert seats[draw].tolist() == reference_leveling(votes[draw], won[draw], 169, 4)
+    assert (seats >= 0).all()
+
+
+def test_additional_member_and_overhang() -> None:
+    """ Test the additional member system and the New Zealand overhang rule. """
+    assert additional_member_seats([100, 80, 30], [6, 1, 0], 7).tolist() == [1, 4, 2]
+
+    votes, won = np.array([50, 45, 5]), np.array([20, 10, 4])
+    proportional = np.array(list(StLague.get(60, list("ABC"), votes.tolist()).values()))
+    seats = leveling_seats(votes, won, 60, overhang="keep")
+    assert seats.tolist() == np.maximum(proportional - won, 0).tolist()
+    assert (seats + won).sum() == 60 + (won - proportional)[2] # the house grows by the overhang
+    assert (won + leveling_seats(votes, won, 60)).sum() == 60
+
+    assert threshold_mask([50, 47, 3], [20, 0, 1], threshold=5).tolist() == [True, True, False]
+    assert threshold_mask([50, 47, 3], [20, 0, 1], threshold=5, seat_exemption=1).tolist() == [True, True, True]
+
+
+def test_compensation_with_parties() -> None:
+    """ Test the Compensation class with won seats from Party.seats_awarded. """
+    parties = [Party("A", total_votes=100, seats_awarded=6), Party("B", total_votes=80, seats_awarded=1), Party("C", total_votes=30)]
+    ams = Compensation(parties, 7, additional=True)
+    assert list(ams.result.values()) == [1, 4, 2]
+    assert list(ams.total_result.values()) == [7, 5, 2]
+    assert ams.calculate().loc["B"].tolist() == [1, 4, 5]
+
+    leveling = Compensation(parties, 14)
+    assert sum(leveling.total_result.values()) == 14
+
+
+def test_minimal_house_size() -> None:
+    """ Test the direct house size search against trying one house size after the other. """
+    rng = np.random.default_rng(8)
+    for trial in range(40):
+        votes = rng.integers(1, 1000, size=5)*(1 if trial % 2 else 1000)
+        minimum = rng.integers(0, 12, size=5)
+        house = minimal_house_size(votes, minimum)
+        expected = 0
+        while (np.array(list(StLague.get(expected, list("ABCDE"), votes.tolist()).values())) < minimum).any():
+            expected += 1
+        assert house == expected
+
+    votes, won = np.array([40, 35, 20, 5]), np.array([30, 5, 0, 2])
+    seats = leveling_seats(votes, won, 60, overhang="balance")
+    assert seats[0] == 0 and (seats >= 0).all()
+    house = int((seats + won).sum())
+    assert house == minimal_house_size(votes, won) and house > 60
+    assert (seats + won).tolist() == list(StLague.get(house, list("ABCD"), votes.tolist()).values())
+
+
+def test_enlarged_house_seats() -> None:
+    """ Test the enlarged house with state lists, against a naive search over house sizes. """
+    rng = np.random.default_rng(4)
+    state_seats = np.array([20, 12, 8])
+    state_votes = rng.integers(1000, 50000, size=(30, 5, 3))
+    state_votes[:, 4] //= 20 # a party below the threshold
+    direct = np.zeros((30, 5, 3), dtype=int)
+    direct[:, 0] = state_seats//2 # the largest party wins all the constituencies
+    seats = enlarged_house_seats(state_votes, direct, state_seats)
+    assert (seats >= direct).all()
+    for draw in range(30):
+        votes, won = state_votes[draw], direct[draw]
+        parties = list("ABCDE")
+        eligible = threshold_mask(votes.sum(axis=1), won.sum(axis=1), 5, 3)
+        names = [party for party, passes in zip(parties, eligible) if passes]
+        minimum = np.zeros(5, dtype=int)
+        for state in range(3):
+            contingent = StLague.get(int(state_seats[state]), names, votes[eligible, state].tolist())
+            minimum[eligible] += np.maximum(won[eligible, state], list(contingent.values()))
+        house = int(minimum.sum())
+        while True:
+            national = np.zeros(5, dtype=int)
+            national[eligible] = list(StLague.get(house, names, votes[eligible].sum(axis=1).tolist()).values())
+            if (national >= minimum).all():
+                break
+            house += 1
+        assert seats[draw].sum(axis=1).tolist() == national.tolist()
+    assert seats[0].tolist() == enlarged_house_seats(state_votes[0], direct[0], state_seats).tolist()
@@ -0,0 +1,38 @@
+from pylections.distribution.ballots import pairwise_matrix
+from pylections.distribution.ranked import Schulze, RankedPairs, Copeland
+import numpy as np
+
+
+""" Test the Condorcet methods """
+SCHULZE_EXAMPLE = {"ACBED": 5, "ADECB": 5, "BEDAC": 8, "CABED": 3, "CAEBD": 7, "CBADE": 2, "DCEBA": 7, "EBADC": 8}
+
+
+def test_pairwise_matrix_from_chunks() -> None:
+    """ Test that the pairwise matrix is the same when streamed in chunks, and treats unranked candidates as last. """
+    rankings = np.array([[0, 1, -1], [2, -1, -1], [1, 0, 2]])
+    counts = np.array([3, 2, 1])
+    expected = np.array([[0, 3, 4], [1, 0, 4], [2, 2, 0]])
+    assert np.array_equal(pairwise_matrix([(rankings, counts)], 3), expected)
+    chunks = [(rankings[i:i + 1], counts[i:i + 1]) for i in range(3)]
+    assert np.array_equal(pairwise_matrix(chunks, 3), expected)
+
+
+def test_condorcet_methods() -> None:
+    """ Test the winners of Schulze, ranked pairs and Copeland. """
+    ballots = [list(ranking) for ranking in SCHULZE_EXAMPLE]
+    counts = list(SCHULZE_EXAMPLE.values())
+    schulze = Schulze(1)
+    schulze.add_ballots(ballots, counts)
+    pairwise, strength = schulze.calculate()
+    assert schulze.result["E"] == 1
+    assert pairwise.loc["A", "B"] == 20 and strength.loc["E", "D"] == 31
+    assert RankedPairs.get(1, ballots, counts)["A"] == 1
+
+    tennessee = [["M", "N", "C", "K"]]*42 + [["N", "C", "K", "M"]]*26 + [["C", "K", "N", "M"]]*15 + [["K", "C", "N", "M"]]*17
+    for method in (Schulze, RankedPairs, Copeland):
+        assert method.get(3, tennessee) == {"M": 0, "N": 3, "C": 0, "K": 0}
+
+    schulze = Schulze(1)
+    schulze.add_ballots(tennessee)
+    schulze.excluded = ["N"]
+    assert schulze.result["C"] == 1
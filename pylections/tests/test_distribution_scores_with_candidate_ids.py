@@ -448,3 +448,34 @@ def test_remove_candidate() -> None:
     score, awarded_seats = d["cand3"]
     assert score == 11
     assert awarded_seats == -1
+
+
+def test_score_sum_and_shares_follow_updates() -> None:
+    """ Test that the score sum, score shares and true distribution are updated when scores change or candidates are removed. """
+    d = Distribution(10)
+    d.add_score(["cand1", "cand2", "cand3"], [50, 30, 20])
+
+    assert d.score_sum == 100
+    assert d.score_share["cand1"] == 50
+    assert d.true_distribution["cand2"] == 3
+
+    d.add_score("cand1", 100)
+    assert d.score_sum == 200
+    assert d.score_share["cand1"] == 75
+    assert d.true_distribution["cand2"] == 1.5
+
+    d.set_score("cand2", 0)
+    d.remove_candidate("cand1")
+    assert d.score_sum == 20
+    assert d.score_share == {"cand2": 0, "cand3": 100}
+    assert d.name_list == ["cand2", "cand3"]
+
+
+def test_shares_without_scores() -> None:
+    """ Test that the score shares and true distribution are empty without candidates, and zero without any score. """
+    d = Distribution(5)
+    assert d.score_share == {}
+    assert d.true_distribution == {}
+    d.add_score(["a", "b"], [0, 0])
+    assert d.score_share == {"a": 0, "b": 0}
+    assert d.true_distribution_array.tolist() == [0, 0]
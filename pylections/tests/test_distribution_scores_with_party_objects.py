@@ -1,4 +1,5 @@
 from pylections.distribution.distribution import Distribution, CandidateDoesNotExistError, Party
+import numpy as np
 import pytest
 
 
@@ -452,3 +453,17 @@ def test_remove_candidate() -> None:
     score, awarded_seats = d[dogs]
     assert score == 11
     assert awarded_seats == -1
+
+
+def test_party_is_slotted() -> None:
+    """ Test that Party objects have no instance dictionary and keep integer votes as integers. """
+    party = Party("Owls", total_votes=12)
+    assert not hasattr(party, "__dict__")
+    assert party.total_votes == 12 and isinstance(party.total_votes, int)
+    party.total_votes = np.int64(2**53 + 1)
+    assert party.total_votes == 2**53 + 1 and type(party.total_votes) is int
+    party.total_votes = np.float32(0.5)
+    assert type(party.total_votes) is float
+    with pytest.raises(AttributeError):
+        party.unknown_attribute = 1 # type: ignore
+    assert {party: 1}[party] == 1
@@ -0,0 +1,104 @@
+from pylections.distribution.distribution import StLague, DHondt, HuntingtonHill, Adams, Dean, Danish, Imperiali, apportion_batch
+import numpy as np
+import pytest
+
+
+""" Test the divisor method kernel and the divisor methods built on it """
+
+
+def reference_seats(scores: np.ndarray, divisors: np.ndarray, num_seats: int) -> list[int]:
+    """ Hand out the seats one at a time, ties to the candidate added first. """
+    seats = np.zeros(len(scores), dtype=int)
+    for _ in range(num_seats):
+        with np.errstate(divide="ignore"):
+            quotients = np.where(divisors[seats] == 0, np.inf, scores/divisors[seats])
+        seats[np.argmax(quotients)] += 1
+    return seats.tolist()
+
+
+def test_known_results() -> None:
+    """ Test some textbook results. """
+    votes = {"A": 100000, "B": 80000, "C": 30000, "D": 20000}
+    assert list(DHondt.get(8, votes).values()) == [4, 3, 1, 0]
+    assert list(StLague.get(8, votes).values()) == [3, 3, 1, 1]
+    assert list(Imperiali.get(8, votes).values()) == [5, 3, 0, 0]
+    assert list(Adams.get(8, votes).values()) == [3, 3, 1, 1]
+    assert list(Danish.get(8, votes).values()) == [3, 3, 1, 1]
+
+
+def test_methods_match_sequential_allocation() -> None:
+    """ Test that the priority list gives the same seats as handing them out one at a time, also with tied scores. """
+    rng = np.random.default_rng(5)
+    for trial in range(30):
+        scores = rng.integers(1, 50, size=rng.integers(2, 9))*100
+        num_seats = int(rng.integers(len(scores), 40))
+        for method in [StLague(num_seats), StLague(num_seats, initial_divisor=1.4), DHondt(num_seats), HuntingtonHill(num_seats),
+                       Adams(num_seats), Dean(num_seats), Danish(num_seats), Imperiali(num_seats)]:
+            method.add_scores_list([str(index) for index in range(len(scores))], scores.tolist())
+            expected = reference_seats(scores, method.divisor_table(num_seats), num_seats)
+            assert list(method.result.values()) == expected
+
+            scores_df, divisors_df, awarded_df = method.calculate()
+            table = method.divisor_table(num_seats)
+            initial_seats = sum(np.count_nonzero(table[:seats] == 0) for seats in expected) # no rows for seats with divisor 0
+            assert len(awarded_df) == num_seats - initial_seats
+            assert awarded_df.iloc[-1].tolist() == expected
+            assert np.isfinite(scores_df.to_numpy()).all()
+
+
+def test_divisor_tables_are_shared() -> None:
+    """ Test that the divisor table is made once per method and parameters, and can't be changed. """
+    table = StLague(10).divisor_table(10)
+    assert table.tolist() == [1, 3, 5, 7, 9, 11, 13, 15, 17, 19]
+    assert np.shares_memory(table, StLague(20).divisor_table(20))
+    assert not np.shares_memory(table, StLague(10, initial_divisor=1.4).divisor_table(10))
+    assert HuntingtonHill(5, initial_seats=2).divisor_table(3)[:2].tolist() == [0, 0]
+    assert StLague(10).divisor_table(np.int64(4)).tolist() == [1, 3, 5, 7]
+    with pytest.raises(ValueError):
+        table[0] = 2
+
+
+def test_batched_apportionment_with_seeds() -> None:
+    """ Test that apportion_batch continues the sequential allocation from the seeds, for many rows at once. """
+    rng = np.random.default_rng(11)
+    for method in [StLague(0, initial_divisor=1.4), DHondt(0), HuntingtonHill(0), Adams(0)]:
+        scores = rng.integers(0, 40, size=(50, 6))*100
+        seeds = rng.integers(0, 4, size=(50, 6))
+        eligible = rng.random((50, 6)) > 0.2
+        num_seats = rng.integers(0, 30, size=50)
+        table = method.divisor_table(int(seeds.max() + num_seats.max()))
+        seats = apportion_batch(scores, num_seats, table, seeds=seeds, eligible=eligible)
+        for row in range(50):
+            expected = np.zeros(6, dtype=int)
+            for _ in range(num_seats[row]):
+                divisors = table[seeds[row] + expected]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    quotients = np.where(divisors == 0, np.inf, scores[row]/divisors)
+                quotients[~eligible[row]] = -np.inf
+                expected[np.argmax(quotients)] += 1
+            assert seats[row].tolist() == expected.tolist()
+
+    scores = rng.integers(1, 1000, size=(20, 5))
+    seats = apportion_batch(scores, 40, StLague(0).divisor_table(40))
+    assert seats.tolist() == [list(StLague.get(40, list("ABCDE"), row.tolist()).values()) for row in scores]
+
+
+def test_huntington_hill_frames_start_after_initial_seats() -> None:
+    """ Test that the initial seats of HuntingtonHill have no rows in the calculation frames, like before the kernel. """
+    hh = HuntingtonHill(7, initial_seats=1)
+    hh.add_score({"A": 500, "B": 300, "C": 100})
+    scores_df, divisors_df, awarded_df = hh.calculate()
+    assert len(scores_df) == len(divisors_df) == len(awarded_df) == 4
+    assert divisors_df.iloc[0].tolist() == [np.sqrt(2)]*3
+    assert scores_df.iloc[0].tolist() == (np.array([500, 300, 100])/np.sqrt(2)).tolist()
+    assert awarded_df.iloc[0].tolist() == [2, 1, 1]
+
+
+def test_candidates_without_score_get_no_free_seats() -> None:
+    """ Test that seats with divisor 0 only go to candidates with a score, like rounding up 0 votes with Adams. """
+    votes = {"a": 10, "b": 0, "c": 5}
+    for method in [Adams(3), Dean(3), HuntingtonHill(3)]:
+        method.add_score(votes)
+        assert method.result == {"a": 2, "b": 0, "c": 1}
+        table = method.divisor_table(8)
+        assert apportion_batch(np.array([[10, 0, 5], [0, 0, 7]]), 3, table).tolist() == [[2, 0, 1], [0, 0, 3]]
@@ -0,0 +1,40 @@
+from pylections.distribution.distribution import StLague
+from pylections.distribution.ranked import InstantRunoff
+from pylections.party import Party
+import numpy as np
+
+
+""" Test copy-on-write forks of distributions """
+
+
+def test_fork_copies_on_write() -> None:
+    """ Test that a fork shares the scores and result until one side changes them. """
+    bears, foxes = Party("Bears"), Party("Foxes")
+    base = StLague(10)
+    base.add_score({bears: 600, foxes: 400})
+    result = base.result
+
+    fork = base.fork()
+    assert fork.result is result # no recalculation
+    assert np.shares_memory(fork.score_array, base.score_array)
+
+    fork.add_score(bears, -100)
+    fork.add_score("Cats", 100)
+    assert not np.shares_memory(fork.score_array, base.score_array)
+    assert fork.result == {bears: 5, foxes: 4, "Cats": 1}
+    assert base.result is result and base.num_candidates == 2
+    assert base[bears][0] == 600
+
+    base.set_score(foxes, 500) # changing the parent does not change the fork either
+    assert fork[foxes][0] == 400
+
+
+def test_fork_ranked_ballots() -> None:
+    """ Test that forks of ranked distributions get their own ballots. """
+    base = InstantRunoff(1)
+    base.add_ballots([["A", "B"]]*4 + [["B"]]*3 + [["C", "B"]]*2)
+    fork = base.fork()
+    fork.add_ballots([["C"]]*3)
+    assert base.ballots.num_ballots == 9 and fork.ballots.num_ballots == 12
+    assert base.result == {"A": 0, "B": 1, "C": 0}
+    assert fork.result == {"A": 0, "B": 0, "C": 1}
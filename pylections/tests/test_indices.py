@@ -0,0 +1,32 @@
+from pylections.analysis import indices
+import numpy as np
+import pytest
+
+
+""" Test the disproportionality indices on single results and batches """
+
+
+def test_indices_single_result() -> None:
+    """ Test the indices against values calculated by hand. """
+    votes = [50, 30, 20]
+    seats = [6, 3, 1]
+
+    assert indices.loosemore_hanby(votes, seats) == pytest.approx(10)
+    assert indices.gallagher(votes, seats) == pytest.approx(np.sqrt(0.5*(100 + 0 + 100)))
+    assert indices.sainte_lague_index(votes, seats) == pytest.approx(100/50 + 100/20)
+    assert indices.max_advantage_ratio(votes, seats) == pytest.approx(1.2)
+    assert indices.effective_number_of_parties(votes) == pytest.approx(1/(0.25 + 0.09 + 0.04))
+
+
+def test_indices_batch_matches_single() -> None:
+    """ Test that a 2-D batch gives the same values as calculating each row separately. """
+    rng = np.random.default_rng(0)
+    votes = rng.integers(1, 1000, (20, 6))
+    seats = rng.integers(0, 10, (20, 6))
+    seats[:, 0] += 1
+
+    batch = indices.all_indices(votes, seats)
+    for row in range(20):
+        assert batch["gallagher"][row] == pytest.approx(indices.gallagher(votes[row], seats[row]))
+        assert batch["sainte_lague"][row] == pytest.approx(indices.sainte_lague_index(votes[row], seats[row]))
+        assert batch["effective_parties_seats"][row] == pytest.approx(indices.effective_number_of_parties(seats[row]))
@@ -0,0 +1,74 @@
+from pylections.distribution.distribution import StLague
+from pylections.distribution.ranked import InstantRunoff
+from pylections.district import District
+from pylections.ingest import iter_batches, read_ballots, read_scores
+import numpy as np
+import pandas as pd
+import pytest
+
+
+""" Test reading result and ballot files in batches """
+
+
+def results_frame() -> pd.DataFrame:
+    rng = np.random.default_rng(6)
+    rows = [(district, f"station{station}", party, f"Party {party}", int(rng.integers(0, 300)))
+            for district in ["Oslo", "Akershus", "Troms"] for station in range(40) for party in ["A", "H", "SV", "BLANKE"]]
+    return pd.DataFrame(rows, columns=["Fylkenavn", "Krets", "Partikode", "Partinavn", "Antall stemmer totalt"])
+
+
+def test_read_scores_from_csv(tmp_path) -> None:
+    """ Test that the batched sums, party totals and district distributions match summing the whole file. """
+    frame = results_frame()
+    path = tmp_path / "results.csv"
+    frame.to_csv(path, sep=";", index=False)
+    assert [len(batch) for batch in iter_batches(path, ["Krets"], batch_size=100)][:2] == [100, 100]
+
+    districts = {name: District(name, 1000, 10, distribution=StLague(5)) for name in ["Oslo", "Troms"]}
+    parties = {}
+    scores = read_scores(path, "Fylkenavn", "Partikode", "Antall stemmer totalt", districts, parties,
+                         party_name_column="Partinavn", skip_parties=["BLANKE"], batch_size=37)
+
+    expected = frame[frame.Partikode != "BLANKE"].pivot_table(index="Fylkenavn", columns="Partikode",
+                                                              values="Antall stemmer totalt", aggfunc="sum")
+    assert scores.loc[expected.index, expected.columns].to_numpy().tolist() == expected.to_numpy().tolist()
+    assert sorted(parties) == ["A", "H", "SV"] and parties["SV"].name == "Party SV"
+    assert parties["H"].total_votes == expected["H"].sum()
+    assert districts["Oslo"].distribution.score_array.tolist() == scores.loc["Oslo"].tolist()
+    assert list(districts["Troms"].distribution.result) == [parties["A"], parties["H"], parties["SV"]]
+
+
+def test_read_ballots_from_csv(tmp_path) -> None:
+    """ Test that ballots with empty ranks and counts are read in batches into the ballot store. """
+    frame = pd.DataFrame({"first": ["A", "B", "C", "A", "B"] * 20, "second": ["B", None, "B", None, "A"] * 20,
+                          "third": ["C", None, None, "C", None] * 20, "count": [3, 2, 4, 1, 2] * 20})
+    frame.loc[3, "second"], frame.loc[3, "third"] = None, "C" # an empty rank before a ranked candidate
+    path = tmp_path / "ballots.csv"
+    frame.to_csv(path, sep=";", index=False)
+
+    streamed = InstantRunoff(1)
+    assert read_ballots(path, streamed, ["first", "second", "third"], "count", batch_size=7) == frame["count"].sum()
+    direct = InstantRunoff(1)
+    for row in frame.itertuples(index=False):
+        direct.add_ballots([[name for name in (row.first, row.second, row.third) if isinstance(name, str)]], [row.count])
+    assert streamed.name_list == direct.name_list
+    assert streamed.score_array.tolist() == direct.score_array.tolist()
+    assert streamed.result == direct.result
+
+
+def test_parquet_and_arrow(tmp_path) -> None:
+    """ Test that Parquet and Arrow files give the same sums as CSV, with only the needed columns read. """
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.feather
+    import pyarrow.parquet
+    frame = results_frame()
+    table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+    pyarrow.parquet.write_table(table, tmp_path / "results.parquet", row_group_size=50)
+    pyarrow.feather.write_feather(table, tmp_path / "results.arrow", chunksize=50)
+    frame.to_csv(tmp_path / "results.csv", sep=";", index=False)
+
+    expected = read_scores(tmp_path / "results.csv", "Fylkenavn", "Partikode", "Antall stemmer totalt")
+    for name in ["results.parquet", "results.arrow"]:
+        assert list(next(iter_batches(tmp_path / name, ["Krets", "Partikode"], batch_size=30)).columns) == ["Krets", "Partikode"]
+        scores = read_scores(tmp_path / name, "Fylkenavn", "Partikode", "Antall stemmer totalt", batch_size=30)
+        assert scores.equals(expected)
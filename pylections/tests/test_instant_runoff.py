@@ -0,0 +1,30 @@
+from pylections.distribution.ranked import InstantRunoff
+import numpy as np
+
+
+""" Test instant-runoff voting """
+TENNESSEE = [["M", "N", "C", "K"]]*42 + [["N", "C", "K", "M"]]*26 + [["C", "K", "N", "M"]]*15 + [["K", "C", "N", "M"]]*17
+
+
+def test_instant_runoff_rounds() -> None:
+    """ Test the rounds and the winner of a small election. """
+    irv = InstantRunoff(1)
+    irv.add_ballots(TENNESSEE)
+    rounds = irv.rounds()
+    tally, eliminated = next(rounds)
+    assert tally.tolist() == [42, 26, 15, 17] and eliminated == "C"
+    assert [eliminated for _, eliminated in rounds] == ["N", None]
+
+    tallies = irv.calculate()
+    assert tallies.iloc[-1].tolist() == [42, 0, 0, 58]
+    assert irv.result == {"M": 0, "N": 0, "C": 0, "K": 1}
+
+
+def test_instant_runoff_with_ballot_counts() -> None:
+    """ Test pre-aggregated ballot types, a majority in the first round and exhausted ballots. """
+    irv = InstantRunoff(2)
+    irv.add_score(["A", "B", "C"], [0, 0, 0])
+    irv.add_ballots(np.array([[0, -1], [1, 2], [2, -1]]), counts=[40, 35, 25])
+    assert irv.result == {"A": 2, "B": 0, "C": 0} # C's ballots exhaust, then A has a majority of the rest
+    irv.add_ballots([["A"]], counts=[21])
+    assert len(irv.calculate()) == 1
@@ -0,0 +1,75 @@
+from pylections.distribution.distribution import StLague, HuntingtonHill, Hamilton
+from pylections.analysis.paradox import house_size_sweep, alabama_paradox, population_paradox
+
+
+""" Test the vectorized house size sweeps and paradox detection """
+states = {
+    "New Triangle": 21878,
+    "Circula": 9713,
+    "Squaryland": 4167,
+    "Octiana": 3252,
+    "Rhombus Island": 1065
+}
+
+
+def test_sweep_matches_calculation() -> None:
+    """ Test that every row of the sweep matches the result of calculating that house size directly. """
+    for cls in [StLague, HuntingtonHill, Hamilton]:
+        d = cls(10)
+        d.add_score(states)
+        sweep = house_size_sweep(d, 60)
+
+        for house_size in range(5, 61):
+            expected = cls.get(house_size, states)
+            assert list(sweep[house_size - 1]) == list(expected.values())
+
+
+def test_alabama_paradox_hamilton() -> None:
+    """ Test that the Alabama paradox from 43 to 44 seats is found for Hamilton, and never for a divisor method. """
+    ham = Hamilton(43)
+    ham.add_score(states)
+    assert (44, "Octiana") in alabama_paradox(ham, 50)
+
+    st = StLague(43)
+    st.add_score(states)
+    assert alabama_paradox(st, 200) == []
+
+
+def test_population_paradox() -> None:
+    """ Test that the population paradox is reported when the faster growing candidate loses a seat to a slower growing one. """
+    old_scores = {"A": 843, "B": 347, "C": 209}
+    new_scores = {"A": 885, "B": 379, "C": 229} # C grows by 9.6%, B by 9.2%
+
+    ham = Hamilton(10)
+    ham.add_score(old_scores)
+    assert population_paradox(ham, new_scores, 12) == [(10, "C", "B")]
+
+    old = Hamilton.get(10, old_scores)
+    new = Hamilton.get(10, new_scores)
+    assert new["C"] < old["C"]
+    assert new["B"] > old["B"]
+
+    tied = Hamilton(6) # at 6 seats, A and B have the same new remainder 18/42, which is only equal with exact division
+    tied.add_score({"A": 8, "B": 24, "C": 56})
+    assert population_paradox(tied, {"A": 3, "B": 10, "C": 29}, 6) == [(6, "B", "A")]
+    assert Hamilton.get(6, {"A": 3, "B": 10, "C": 29}) == {"A": 1, "B": 1, "C": 4}
+
+
+def test_sweep_ties_match_calculation() -> None:
+    """ Test that exactly tied remainders are compared exactly and broken like Hamilton.calculate, and that other tie breaks are used. """
+    scores = {"A": 10**16 + 1, "B": 3*(10**16 + 1), "C": 5*(10**16 + 1), "D": 7}
+    for quota in ["hare", "droop"]:
+        d = Hamilton(1, quota=quota)
+        d.add_score(scores)
+        sweep = house_size_sweep(d, 40)
+        for house_size in range(1, 41):
+            assert list(sweep[house_size - 1]) == list(Hamilton.get(house_size, scores, quota=quota).values())
+
+    d = Hamilton(1)
+    d.add_score({"A": 1, "B": 1, "C": 1})
+    assert house_size_sweep(d, 2)[1].tolist() == [1, 1, 0]
+    d.tie_break, d.seed = "random", 2
+    expected = Hamilton(2)
+    expected.tie_break, expected.seed = "random", 2
+    expected.add_score({"A": 1, "B": 1, "C": 1})
+    assert house_size_sweep(d, 2)[1].tolist() == list(expected.result.values())
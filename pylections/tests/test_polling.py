@@ -0,0 +1,110 @@
+from pylections.distribution.distribution import DHondt, StLague, Hamilton
+from pylections.party import Party
+from pylections.polling import EWMAEstimator, KalmanEstimator, PollPipeline
+import asyncio
+import numpy as np
+import pytest
+
+
+""" Test the poll estimators and the incremental seat projections """
+
+
+def test_ewma_estimator() -> None:
+    """ Test that polls on the same day are averaged, that old polls lose half their weight per half life,
+    and that parties missing in a poll keep their estimate.
+    """
+    estimator = EWMAEstimator(3, half_life=10)
+    estimator.update(0, [0.5, 0.3, 0.2])
+    assert np.allclose(estimator.update(0, [0.3, 0.5, 0.2]), [0.4, 0.4, 0.2])
+    # the two old polls weigh 2*0.5 after one half life, the same as the new poll
+    assert np.allclose(estimator.update(10, [0.6, 0.2, np.nan]), [0.5, 0.3, 0.2])
+    assert estimator.time == 10
+
+
+def test_kalman_estimator() -> None:
+    """ Test that the first poll sets the estimate, larger polls move it more, and the uncertainty grows between polls. """
+    small, large = KalmanEstimator(2), KalmanEstimator(2)
+    for estimator, size in ((small, 500), (large, 5000)):
+        assert np.allclose(estimator.update("2025-01-01", [0.4, 0.6], 1000), [0.4, 0.6])
+        estimator.update("2025-01-08", [0.5, 0.5], size)
+    assert 0.4 < small.estimate[0] < large.estimate[0] < 0.5
+    error = large.standard_error[0]
+    large.update("2025-03-01", [np.nan, 0.5])
+    assert large.standard_error[0] > error
+    assert not np.isnan(large.estimate).any()
+
+
+def make_polls(num_polls: int, seed: int = 0) -> list[tuple[float, np.ndarray, int]]:
+    rng = np.random.default_rng(seed)
+    trend = np.array([0.3, 0.25, 0.2, 0.15, 0.1])
+    polls = []
+    for day in range(num_polls):
+        trend = trend*np.exp(rng.normal(0, 0.01, len(trend)))
+        polls.append((float(day), rng.dirichlet(trend/trend.sum()*2000), int(rng.integers(500, 2000))))
+    return polls
+
+
+@pytest.mark.parametrize("method", [lambda: DHondt(50), lambda: StLague(169, initial_divisor=1.4), lambda: Hamilton(30)])
+def test_pipeline_matches_full_projection(method) -> None:
+    """ Test that the seats after every poll are the seats of a full calculation, while most polls are skipped. """
+    parties = [Party(name) for name in "ABCDE"]
+    distribution = method()
+    distribution.add_score(parties, [0]*len(parties))
+    distribution.threshold = 4
+    pipeline = PollPipeline(distribution, KalmanEstimator(len(parties)), 2_500_000)
+
+    projections = []
+    for time, shares, size in make_polls(200):
+        projection = pipeline.process(time, dict(zip([party.name for party in parties], shares)), size)
+        if projection is not None:
+            projections.append(projection)
+        check = method()
+        check.add_score(parties, [0]*len(parties))
+        check.threshold = 4
+        check.set_score_array(distribution.score_array)
+        assert pipeline.result == check.result
+    assert pipeline.num_polls == 200 and pipeline.num_projections == len(projections)
+    if not isinstance(distribution, Hamilton):
+        assert pipeline.num_projections < 150
+    assert list(pipeline.margins().index) == list("ABCDE")
+
+
+def test_pipeline_generators() -> None:
+    """ Test that run() and run_async() yield the same projections as processing the polls one by one. """
+    parties = [Party(name) for name in "ABCDE"]
+    polls = make_polls(60, seed=1)
+
+    def pipeline() -> PollPipeline:
+        distribution = DHondt(20)
+        distribution.add_score(parties, [0]*len(parties))
+        return PollPipeline(distribution, EWMAEstimator(len(parties), half_life=5), 1_000_000)
+
+    expected = [(time, result.values()) for time, result in pipeline().run(polls)]
+    assert expected and expected[0][0] == 0.0
+
+    async def feed():
+        for poll in polls:
+            await asyncio.sleep(0)
+            yield poll
+
+    async def collect() -> list:
+        return [(time, result.values()) async for time, result in pipeline().run_async(feed())]
+
+    assert asyncio.run(collect()) == expected
+
+
+def test_unchanged_seats_keep_the_result() -> None:
+    """ Test that a poll that can't change the seats gives the distribution the new scores and keeps its result. """
+    dh = DHondt(10)
+    dh.add_score({"A": 0, "B": 0, "C": 0})
+    dh.threshold = 4
+    pipeline = PollPipeline(dh, EWMAEstimator(3, half_life=1), 100_000)
+    first = pipeline.process(0, [0.5, 0.3, 0.2])
+    assert pipeline.process(0, [0.5001, 0.2999, 0.2]) is None
+    assert dh.is_calculated and dh.result is first
+    assert dh.score_array.tolist() != [50_000, 30_000, 20_000] # the scores follow the estimate
+
+    uncalculated = DHondt(2)
+    uncalculated.add_score({"A": 1})
+    with pytest.raises(ValueError):
+        uncalculated._set_scores_keeping_result(np.array([2]))
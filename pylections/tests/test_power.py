@@ -0,0 +1,59 @@
+from itertools import combinations
+from math import comb, factorial
+
+from pylections.analysis.power import power_indices
+import numpy as np
+import pytest
+
+
+""" Test the power indices against enumerating every coalition """
+
+
+def enumerate_power(seats: list[int], quota: int) -> tuple[np.ndarray, np.ndarray]:
+    num_parties = len(seats)
+    swings = np.zeros(num_parties)
+    shapley_shubik = np.zeros(num_parties)
+    for party in range(num_parties):
+        others = [other for other in range(num_parties) if other != party]
+        for size in range(num_parties):
+            for coalition in combinations(others, size):
+                coalition_seats = sum(seats[other] for other in coalition)
+                if coalition_seats < quota <= coalition_seats + seats[party]:
+                    swings[party] += 1
+                    shapley_shubik[party] += factorial(size)*factorial(num_parties - size - 1)/factorial(num_parties)
+    return swings/swings.sum(), shapley_shubik
+
+
+def test_power_indices_match_enumeration() -> None:
+    """ Test a batch of random results, with the default majority quota and a fixed quota. """
+    rng = np.random.default_rng(0)
+    seats = rng.integers(0, 30, (20, 7))
+    seats[:, 0] += 1
+
+    for quota in [None, 60]:
+        power = power_indices(seats, quota)
+        for draw in range(20):
+            draw_quota = seats[draw].sum()//2 + 1 if quota is None else quota
+            banzhaf, shapley_shubik = enumerate_power(seats[draw].tolist(), draw_quota)
+            assert power["banzhaf"][draw] == pytest.approx(banzhaf)
+            assert power["shapley_shubik"][draw] == pytest.approx(shapley_shubik)
+
+
+def test_power_indices_of_result() -> None:
+    """ Test that a result dictionary gives dictionaries keyed on the candidates. """
+    power = power_indices({"cand1": 50, "cand2": 49, "cand3": 1})
+    assert power["banzhaf"] == pytest.approx({"cand1": 0.6, "cand2": 0.2, "cand3": 0.2})
+    assert power["shapley_shubik"] == pytest.approx({"cand1": 2/3, "cand2": 1/6, "cand3": 1/6})
+
+
+def test_power_indices_of_many_parties() -> None:
+    """ Test one large party and 69 parties with one seat, where there are too many coalitions to count with int64. """
+    seats = [10] + [1]*69
+    quota = 40
+    result = power_indices(np.array(seats), quota)
+    # the large party swings the coalitions of 30 to 39 small parties, and a small party those where it makes 40 seats
+    large = sum(comb(69, size) for size in range(30, 40))
+    small = comb(68, 39) + comb(68, 29)
+    assert np.allclose(result["banzhaf"], np.array([large] + [small]*69, dtype=float)/(large + 69*small))
+    assert np.isclose(result["shapley_shubik"][0], 10/70)
+    assert np.isclose(result["shapley_shubik"].sum(), 1)
@@ -0,0 +1,33 @@
+from pylections.distribution.distribution import StLague
+from pylections.distribution.result import Result
+import numpy as np
+import pytest
+
+
+""" Test the read-only result object """
+
+
+def test_result_is_shared_and_read_only() -> None:
+    """ Test that the result is one shared read-only mapping, replaced when the distribution is calculated again. """
+    st = StLague(7)
+    st.add_score({"A": 500, "B": 300, "C": 200})
+    result = st.result
+    assert isinstance(result, Result)
+    assert st.result is result
+    assert result == {"A": 4, "B": 2, "C": 1}
+    assert result["B"] == 2 and "D" not in result
+    assert list(result) == ["A", "B", "C"]
+    assert result.to_numpy().tolist() == [4, 2, 1]
+    with pytest.raises(TypeError):
+        result["A"] = 3 # type: ignore
+    with pytest.raises(ValueError):
+        result.to_numpy()[0] = 3
+
+    changed = result.to_dict()
+    changed["A"] = 0
+    assert result["A"] == 4
+
+    st.add_score("D", 1000)
+    assert st.result is not result
+    assert result == {"A": 4, "B": 2, "C": 1} # the old result does not change
+    assert np.array_equal(st.result.to_numpy(), [2, 1, 1, 3])
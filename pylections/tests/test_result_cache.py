@@ -0,0 +1,161 @@
+from pylections.distribution.distribution import StLague, DHondt, Hamilton
+from pylections.distribution.cache import ResultCache
+from pylections.distribution.utils import TieError
+from pylections.district import District
+import numpy as np
+import pytest
+
+
+""" Test the persistent result cache """
+populations = {
+    "New Triangle": 21878,
+    "Circula": 9713,
+    "Squaryland": 4167,
+    "Octiana": 3252,
+    "Rhombus Island": 1065
+}
+
+
+def test_cached_result_matches_calculation(tmp_path) -> None:
+    """ Test that a result stored in the cache is found by a new distribution and matches the calculated result. """
+    cache = ResultCache(tmp_path / "results.bin")
+
+    st = StLague(43)
+    st.result_cache = cache
+    st.add_score(populations)
+    expected = st.result
+    assert len(cache) == 1
+
+    st_cached = StLague(43)
+    st_cached.result_cache = cache
+    st_cached.add_score(populations)
+    assert st_cached._load_cached_result()
+    assert st_cached.result == expected
+
+
+def test_cache_key_depends_on_method_and_parameters(tmp_path) -> None:
+    """ Test that different methods, parameters and seat numbers do not share cache entries. """
+    cache = ResultCache(tmp_path / "results.bin")
+
+    for distribution in [StLague(43), StLague(44), StLague(43, initial_divisor=1.4), DHondt(43), Hamilton(43, quota="droop")]:
+        distribution.result_cache = cache
+        distribution.add_score(populations)
+        distribution.result
+
+    assert len(cache) == 5
+
+
+def test_cache_is_shared_between_instances(tmp_path) -> None:
+    """ Test that a second cache object on the same file sees entries added through the first. """
+    path = tmp_path / "results.bin"
+    writer = ResultCache(path)
+    reader = ResultCache(path)
+
+    key = ResultCache.make_key(StLague, 3, {}, ["a", "b"], np.array([10, 20]))
+    writer.store(key, StLague, np.array([1, 2]))
+
+    assert key in reader
+    assert list(reader.lookup(key)) == [1, 2] # type: ignore
+
+
+def test_invalidate_method(tmp_path) -> None:
+    """ Test that invalidating a method only removes entries calculated with that method. """
+    cache = ResultCache(tmp_path / "results.bin")
+
+    for distribution in [StLague(43), DHondt(43)]:
+        distribution.result_cache = cache
+        distribution.add_score(populations)
+        distribution.result
+
+    cache.invalidate(StLague)
+    assert len(cache) == 1
+
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_file_without_header_is_not_ready(tmp_path) -> None:
+    """ Test that a cache file that is still shorter than its header is read as empty instead of failing. """
+    path = tmp_path / "results.bin"
+    path.write_bytes(b"")
+    cache = ResultCache(path)
+    key = ResultCache.make_key(StLague, 3, {}, ["a", "b"], np.array([10, 20]))
+    assert len(cache) == 0 and cache.lookup(key) is None
+
+    path.write_bytes(ResultCache._HEADER.pack(ResultCache.MAGIC, ResultCache.FORMAT_VERSION, 0))
+    cache.store(key, StLague, np.array([1, 2]))
+    assert list(cache.lookup(key)) == [1, 2] # type: ignore
+
+
+def test_store_follows_replaced_file(tmp_path, monkeypatch) -> None:
+    """ Test that a record is appended to the new file if the file is replaced while store() waits for the lock. """
+    path = tmp_path / "results.bin"
+    cache = ResultCache(path)
+    other = ResultCache(path)
+    key = ResultCache.make_key(StLague, 3, {}, ["a", "b"], np.array([10, 20]))
+
+    replaced = []
+    original_lock = ResultCache._lock
+    def lock_after_replace(fileobj) -> None:
+        if not replaced: # another process clears the cache just before the lock is taken
+            replaced.append(True)
+            other.invalidate()
+        original_lock(fileobj)
+    monkeypatch.setattr(ResultCache, "_lock", staticmethod(lock_after_replace))
+
+    cache.store(key, StLague, np.array([1, 2]))
+    assert list(ResultCache(path).lookup(key)) == [1, 2] # type: ignore
+    assert cache._generation == 0
+    assert key in cache # the new generation is seen and indexed again
+    assert cache._generation == 1
+
+
+def test_ties_and_unseeded_random_results_are_not_cached(tmp_path) -> None:
+    """ Test that results with exact ties, and unseeded random tie breaks, are calculated every time instead of cached. """
+    cache = ResultCache(tmp_path / "results.bin")
+    for tie_break in ("first", "random", "raise"):
+        tied = DHondt(1)
+        tied.result_cache = cache
+        tied.add_score({"a": 10, "b": 10})
+        tied.tie_break = tie_break
+        tied.seed = 1
+        if tie_break == "raise":
+            with pytest.raises(TieError):
+                tied.result
+        else:
+            tied.result
+            assert tied.ties
+    assert len(cache) == 0
+
+    random = StLague(43)
+    random.result_cache = cache
+    random.add_score(populations)
+    random.tie_break = "random"
+    random.result
+    assert len(cache) == 0
+    random.seed = 1
+    random.result
+    assert len(cache) == 1
+
+
+def test_district_result_uses_the_cache(tmp_path, monkeypatch) -> None:
+    """ Test that a district result is looked up in the cache, and that its details are only calculated on demand. """
+    cache = ResultCache(tmp_path / "results.bin")
+    districts = []
+    for _ in range(2):
+        district = District("Geometry", 40_000, 1, distribution=Hamilton(43))
+        district.distribution.result_cache = cache
+        district.distribution.add_score(populations)
+        districts.append(district)
+    expected = districts[0].result
+    with monkeypatch.context() as patch:
+        patch.setattr(Hamilton, "calculate", lambda self: pytest.fail("calculated instead of using the cache"))
+        assert districts[1].result == expected
+    assert len(cache) == 1
+
+    district = districts[1]
+    details = district.result_details
+    assert details is district.result_details
+    assert details[0].tolist() == [23, 10, 4, 3, 1] # whole seats of the Hare quota
+    district.distribution.add_score("Octiana", 1000)
+    assert district.result_details is not details
@@ -0,0 +1,104 @@
+from pylections.distribution.distribution import StLague, DHondt, Hamilton
+from pylections.analysis.sensitivity import vote_margins, seat_margins, leveling_effects
+from pylections.compensation import leveling_seats
+from pylections.district import District
+import numpy as np
+
+
+""" Test the vote margins against adding and removing votes one at a time """
+scores = {
+    "cand1": 270,
+    "cand2": 150,
+    "cand3": 392,
+    "cand4": 68,
+    "cand5": 147
+}
+
+
+def brute_force_margins(cls, num_seats: int, candidate: str) -> tuple[float, float]:
+    seats = cls.get(num_seats, scores)[candidate]
+    gain = lose = float("inf")
+    for change in range(1, 2000):
+        changed = dict(scores)
+        changed[candidate] += change
+        if cls.get(num_seats, changed)[candidate] > seats:
+            gain = change
+            break
+    for change in range(1, scores[candidate] + 1):
+        changed = dict(scores)
+        changed[candidate] -= change
+        if cls.get(num_seats, changed)[candidate] < seats:
+            lose = change
+            break
+    return gain, lose
+
+
+def test_vote_margins_match_brute_force() -> None:
+    """ Test that the margins are the smallest number of votes that change the number of seats. """
+    for cls in [StLague, DHondt, Hamilton]:
+        d = cls(7)
+        d.add_score(scores)
+        margins = vote_margins(d)
+
+        for candidate in scores:
+            gain, lose = brute_force_margins(cls, 7, candidate)
+            assert margins.loc[candidate, "votes_to_gain"] == gain
+            assert margins.loc[candidate, "votes_to_lose"] == lose
+
+
+def test_hamilton_margins_past_float_precision() -> None:
+    """ Test that Hamilton margins of more votes than floats count exactly are found, and scale with the scores. """
+    scale = 10**15 + 1
+    small = Hamilton(7)
+    small.add_score(scores)
+    large = Hamilton(7)
+    large.add_score({candidate: score*scale for candidate, score in scores.items()})
+    small_margins, large_margins = vote_margins(small), vote_margins(large)
+
+    for column in ["votes_to_gain", "votes_to_lose"]:
+        finite = np.isfinite(small_margins[column].to_numpy())
+        assert (np.isfinite(large_margins[column].to_numpy()) == finite).all()
+        margins, expected = large_margins[column].to_numpy()[finite], small_margins[column].to_numpy()[finite]
+        assert ((margins >= (expected - 1)*scale*(1 - 1e-12)) & (margins <= expected*scale*(1 + 1e-12))).all()
+
+
+def test_seat_margins_sorted() -> None:
+    """ Test that every seat is listed once, with the closest seat first. """
+    st = StLague(7)
+    st.add_score(scores)
+    seats = seat_margins(st)
+
+    assert len(seats) == 7
+    assert seats.votes_to_lose.is_monotonic_increasing
+    assert seats.votes_to_lose.iloc[0] == vote_margins(st).votes_to_lose.min()
+
+
+def test_leveling_effects_match_recalculation() -> None:
+    """ Test that the national seats after each vote margin match recalculating the district and the leveling seats. """
+    district_scores = [scores, {"cand1": 90, "cand2": 300, "cand3": 120, "cand4": 200}, {"cand2": 50, "cand3": 410, "cand5": 180}]
+    districts = []
+    for name, district_score in zip("XYZ", district_scores):
+        d = DHondt(4)
+        d.add_score(district_score)
+        districts.append(District(name, 1000, 1, distribution=d))
+    candidates = list(scores)
+
+    def national_seats(changed: dict) -> np.ndarray:
+        votes = np.array([[district_score.get(c, 0) for c in candidates] for district_score in [changed] + district_scores[1:]]).sum(axis=0)
+        won = np.array([[DHondt.get(4, district_score).get(c, 0) for c in candidates] for district_score in [changed] + district_scores[1:]]).sum(axis=0)
+        return won + leveling_seats(votes, won, 20, StLague, threshold=10)
+
+    effects = leveling_effects(districts, "X", 20, StLague, threshold=10, parties=candidates)
+    before = national_seats(scores)
+    for candidate in candidates:
+        for column, sign in [("gain", 1), ("lose", -1)]:
+            margin = effects.loc[candidate, f"votes_to_{column}"]
+            if not np.isfinite(margin):
+                assert np.isnan(effects.loc[candidate, f"total_change_on_{column}"])
+                continue
+            changed = dict(scores)
+            changed[candidate] += sign*int(margin)
+            difference = national_seats(changed) - before
+            assert effects.loc[candidate, f"total_change_on_{column}"] == difference[candidates.index(candidate)]
+            assert effects.loc[candidate, f"changes_on_{column}"] == {c: change for c, change in zip(candidates, difference.tolist()) if change}
+    assert (effects.total_change_on_gain < 1).any() # some district seats are taken back from the leveling seats
@@ -0,0 +1,137 @@
+from pylections.distribution.distribution import StLague, DHondt, Hamilton, FirstPastThePost
+from pylections.distribution.ranked import STV
+from pylections.district import District, NorwegianFylke
+from pylections.party import Party
+from pylections.snapshot import Snapshot, save_snapshot
+import numpy as np
+import pickle
+import pytest
+
+
+""" Test saving elections to snapshots and opening them memory-mapped """
+
+
+def make_election() -> tuple[list[Party], list[District]]:
+    ap = Party("Arbeiderpartiet", -0.3, "#e4202c", 783394)
+    h = Party("Hoyre", 0.5, "#0065f1", 759_757, seats_awarded=36)
+    sp = Party("Senterpartiet", 0.1, "#008542", 402961.5)
+    parties = [ap, h, sp]
+
+    oslo = NorwegianFylke(3, 540_000, 454, (59.9, 10.7), StLague(20, initial_divisor=1.4), name="Oslo")
+    oslo.distribution.add_score([ap, h, sp], [120_000, 140_000, 8_000])
+    oslo.distribution.threshold = 4
+    oslo.distribution.calculate()
+    oslo.available_leveling_seats = 2
+    oslo.add_leveling_seat_winner(sp)
+
+    innlandet = NorwegianFylke(34, 290_000, 52_072, (61.1, 10.4), Hamilton(7, quota="droop"), name="Innlandet")
+    innlandet.distribution.add_score([ap, h, sp, "Independent"], [70_000.5, 30_000, 50_000, 1_000])
+    innlandet.distribution.excluded = ["Independent"]
+
+    town = District("Town", 1200, 3.5, (1, 2), FirstPastThePost(1))
+    town.distribution.add_score({"Smith": 400, "Jones": 350})
+    town.distribution.calculate()
+    empty = District("Empty", 0, 1)
+    return parties, [oslo, innlandet, town, empty]
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    """ Test that the parties, districts, distributions and leveling seat winners are rebuilt as they were saved. """
+    parties, districts = make_election()
+    save_snapshot(tmp_path / "election.snap", districts, parties, metadata={"year": 2021})
+    snapshot = Snapshot(tmp_path / "election.snap")
+
+    assert snapshot.metadata == {"year": 2021}
+    assert snapshot.district_names == ["Oslo", "Innlandet", "Town", "Empty"]
+    assert [(party.name, party.spectrum_position, party.color, party.total_votes, party.seats_awarded) for party in snapshot.parties] == \
+        [(party.name, party.spectrum_position, party.color, party.total_votes, party.seats_awarded) for party in parties]
+    ap, h, sp = snapshot.parties
+
+    oslo = snapshot.district("Oslo")
+    assert isinstance(oslo, NorwegianFylke)
+    assert (oslo.fylkeid, oslo.eligible_voters, oslo.area, oslo.location) == (3, 540_000, 454, (59.9, 10.7))
+    assert oslo.available_leveling_seats == 2 and oslo.leveling_seats == [sp]
+    assert oslo.distribution.initial_divisor == 1.4 and oslo.distribution.threshold == 4
+    assert oslo.distribution.is_calculated # the stored result is used without calculating
+    assert oslo.distribution.result == dict(zip([ap, h, sp], districts[0].distribution.result.values()))
+    assert snapshot.district(0) is oslo
+
+    innlandet = snapshot.district("Innlandet")
+    assert innlandet.distribution.quota == districts[1].distribution.quota
+    assert innlandet.distribution.excluded == frozenset(["Independent"])
+    assert not innlandet.distribution.is_calculated
+    assert innlandet.distribution.result.values() == districts[1].distribution.result.values()
+
+    town = snapshot.district("Town")
+    assert type(town) is District and town.distribution.score_array.dtype == np.int64
+    assert town.result == {"Smith": 1, "Jones": 0}
+    assert snapshot.district("Empty").distribution is None
+    with pytest.raises(KeyError):
+        snapshot.district("Nowhere")
+
+
+def test_snapshot_arrays_are_views(tmp_path) -> None:
+    """ Test that the arrays are read-only views of the file, and that rebuilt distributions copy them before changes. """
+    parties, districts = make_election()
+    save_snapshot(tmp_path / "election.snap", districts, parties)
+    snapshot = Snapshot(tmp_path / "election.snap")
+
+    scores = snapshot.scores("Town")
+    assert not scores.flags.writeable
+    assert scores.tolist() == [400, 350]
+    assert snapshot.array("district_location").shape == (4, 2)
+    assert snapshot.results("Innlandet") is None
+
+    town = snapshot.district("Town").distribution
+    town.add_score("Jones", 100)
+    assert town.result == {"Smith": 0, "Jones": 1}
+    assert snapshot.scores("Town").tolist() == [400, 350]
+
+
+def test_snapshot_pickles_as_path(tmp_path) -> None:
+    """ Test that a pickled snapshot opens the same file, without the built objects. """
+    parties, districts = make_election()
+    save_snapshot(tmp_path / "election.snap", districts, parties)
+    snapshot = Snapshot(tmp_path / "election.snap")
+    snapshot.parties
+
+    data = pickle.dumps(snapshot)
+    assert len(data) < 200
+    copy = pickle.loads(data)
+    assert copy.district("Oslo").distribution.result.values() == snapshot.district("Oslo").distribution.result.values()
+
+
+def test_snapshot_rejects_other_files(tmp_path) -> None:
+    """ Test that files that are not snapshots, and ranked ballots, are refused. """
+    (tmp_path / "other.bin").write_bytes(b"x"*64)
+    with pytest.raises(ValueError):
+        Snapshot(tmp_path / "other.bin")
+    with pytest.raises(ValueError):
+        save_snapshot(tmp_path / "ranked.snap", [District("Ranked", 100, 1, distribution=STV(2))])
+
+
+def test_snapshot_keeps_score_dtypes(tmp_path) -> None:
+    """ Test that integer scores stay exact int64 views of the file when another district has float scores. """
+    parties, districts = make_election()
+    big = District("Big", 1, 1, distribution=FirstPastThePost(1))
+    big.distribution.add_score({"X": 2**53 + 1, "Y": 2**53})
+    save_snapshot(tmp_path / "election.snap", districts + [big], parties)
+    snapshot = Snapshot(tmp_path / "election.snap")
+
+    assert snapshot.scores("Big").tolist() == [2**53 + 1, 2**53]
+    assert snapshot.scores("Innlandet").dtype == np.float64 and snapshot.scores("Innlandet")[0] == 70_000.5
+    assert snapshot.scores("Empty").tolist() == []
+    town = snapshot.district("Town").distribution
+    assert town.score_array.dtype == np.int64
+    assert np.shares_memory(town.score_array, snapshot.array("integer_scores")) # not copied until changed
+    assert snapshot.district("Big").distribution.result == {"X": 1, "Y": 0}
+
+
+def test_snapshot_distribution_without_candidates(tmp_path) -> None:
+    """ Test that candidates can be added to a loaded distribution that had none. """
+    save_snapshot(tmp_path / "election.snap", [District("x", 10, 1, distribution=DHondt(3))])
+    distribution = Snapshot(tmp_path / "election.snap").district("x").distribution
+    distribution.add_score("a", 5)
+    distribution.add_score("b", 2)
+    assert distribution.result == {"a": 2, "b": 1}
+    assert distribution.candidates == ("a", "b") and distribution.index_of("b") == 1 and "c" not in distribution
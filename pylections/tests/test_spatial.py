@@ -0,0 +1,65 @@
+from pylections.distribution.distribution import DHondt
+from pylections.district import District
+from pylections.spatial import DistrictIndex
+import numpy as np
+
+
+""" Test the spatial index over district locations """
+
+
+def make_districts(num_districts: int, seed: int = 0) -> list[District]:
+    rng = np.random.default_rng(seed)
+    locations = np.concatenate((rng.normal(0, 1, (num_districts//2, 2)), rng.uniform(-10, 10, (num_districts - num_districts//2, 2))))
+    return [District(f"D{index}", 1000, 1, tuple(location)) for index, location in enumerate(locations.tolist())]
+
+
+def test_queries_match_linear_scan() -> None:
+    """ Test box, radius and nearest queries against a scan of all the districts, for clustered and spread locations. """
+    districts = make_districts(500)
+    index = DistrictIndex(districts)
+    coordinates = np.array([district.location for district in districts])
+    rng = np.random.default_rng(1)
+    for x, y in rng.uniform(-12, 12, (50, 2)).tolist():
+        width, height, radius = rng.uniform(0, 5, 3).tolist()
+        inside = ((coordinates >= (x, y)) & (coordinates <= (x + width, y + height))).all(axis=1)
+        assert index.box_indices(x, y, x + width, y + height).tolist() == np.flatnonzero(inside).tolist()
+
+        distances = np.hypot(*(coordinates - (x, y)).T)
+        expected = np.lexsort((np.arange(len(districts)), distances))
+        assert index.radius_indices(x, y, radius).tolist() == [i for i in expected.tolist() if distances[i] <= radius]
+        assert index.nearest_indices(x, y, 5).tolist() == expected[:5].tolist()
+        assert index.nearest(x, y)[0] is districts[expected[0]]
+
+
+def test_edge_cases() -> None:
+    """ Test an empty index, districts in one place, boxes outside the grid and k larger than the number of districts. """
+    assert DistrictIndex([]).box_indices(-1, -1, 1, 1).tolist() == []
+    assert DistrictIndex([]).nearest(0, 0) == []
+
+    same = [District(name, 1, 1, (3, 4)) for name in "abc"]
+    index = DistrictIndex(same)
+    assert index.box_indices(3, 4, 3, 4).tolist() == [0, 1, 2]
+    assert index.nearest_indices(100, 100, 10).tolist() == [0, 1, 2]
+    assert index.in_box(10, 10, 20, 20) == []
+    assert index.in_radius(3, 4.5, 0.4) == []
+
+
+def test_regional_totals() -> None:
+    """ Test that the votes and seats of the districts in a region are summed by candidate. """
+    districts = []
+    for name, location, scores in [("North", (0, 10), {"A": 100, "B": 50}), ("Middle", (0, 5), {"A": 10, "C": 90}), ("South", (0, 0), {"B": 70})]:
+        distribution = DHondt(3)
+        distribution.add_score(scores)
+        districts.append(District(name, 1000, 1, location, distribution))
+    districts.append(District("Unassigned", 1000, 1, (0, 6)))
+    index = DistrictIndex(districts)
+
+    region = index.box_indices(-1, 4, 1, 11)
+    assert region.tolist() == [0, 1, 3]
+    assert index.votes(region) == {"A": 110, "B": 50, "C": 90}
+    assert index.seats(region) == {"A": 2, "B": 1, "C": 3}
+    assert index.total([d.eligible_voters for d in districts], region) == 3000
+
+    districts[2].location = (0, 8)
+    index.rebuild()
+    assert index.box_indices(-1, 7, 1, 9).tolist() == [2]
@@ -0,0 +1,78 @@
+from pylections.distribution.ranked import STV
+from pylections.district import District
+import numpy as np
+import pytest
+import warnings
+
+
+""" Test ranked ballots and STV """
+FOOD_BALLOTS = [["Orange"]]*4 + [["Pear", "Orange"]]*2 + [["Chocolate", "Strawberry"]]*8 + \
+               [["Chocolate", "Bonbon"]]*4 + [["Strawberry"]] + [["Bonbon"]]
+
+
+def test_ballots_are_compressed() -> None:
+    """ Test that identical ballots are merged and first preferences are the scores. """
+    stv = STV(3)
+    stv.add_ballots(FOOD_BALLOTS)
+    assert len(stv.ballots) == 6
+    assert stv.ballots.num_ballots == 20
+    assert stv["Chocolate"][0] == 12
+
+    stv.add_ballots(np.array([[3, 4, -1]]), counts=[5]) # Strawberry, Bonbon as candidate indices
+    assert len(stv.ballots) == 7
+    assert stv.score_sum == 25
+
+    stv.remove_candidate("Pear") # Pear's ballots move on to Orange
+    assert stv["Orange"][0] == 6
+    assert len(stv.ballots) == 6
+
+
+def test_stv_gregory_and_meek() -> None:
+    """ Test both transfer methods on a small election, also through a district. """
+    for transfer in ("gregory", "meek"):
+        result = STV.get(3, FOOD_BALLOTS, transfer=transfer)
+        assert [name for name, seats in result.items() if seats] == ["Orange", "Chocolate", "Strawberry"]
+
+    district = District("Food", 20, 1, distribution=STV(3))
+    district.distribution.add_ballots(FOOD_BALLOTS) # type: ignore
+    assert sum(district.result.values()) == 3
+    tallies, events = district.result_details
+    assert tallies.iloc[0]["Chocolate"] == 12
+    assert events.iloc[0]["status"] == "elected"
+
+
+def test_winners_without_votes_and_meek_convergence() -> None:
+    """ Test that hopefuls elected without votes transfer nothing, and that a Meek count that doesn't converge warns. """
+    stv = STV(3)
+    stv.add_score(["A", "B", "C"], [0, 0, 0])
+    stv.add_ballots([["A"]]*5 + [["B"]]*3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert stv.result == {"A": 1, "B": 1, "C": 1}
+
+    meek = STV(3, transfer="meek")
+    meek.add_ballots([["A", "B", "C"]]*40 + [["B", "A", "C"]]*35 + [["C", "D"]]*10 + [["D", "C"]]*14 + [["E"]])
+    meek._max_iterations = 2
+    with pytest.warns(RuntimeWarning, match="tolerance"):
+        meek.calculate()
+    meek._max_iterations = 1000
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        meek.calculate()
+
+
+def test_scores_follow_the_ballots() -> None:
+    """ Test that scores can't be changed apart from the ballots, and that the tolerance is part of the cache key. """
+    stv = STV(2)
+    stv.add_score("A", 0) # adds the candidate
+    stv.add_ballots([["B", "A"]]*3 + [["A"]])
+    for change in [lambda: stv.add_score("A", 5), lambda: stv.set_score("B", 0), lambda: stv.set_score_array([1, 2])]:
+        with pytest.raises(ValueError):
+            change()
+    assert stv.score_array.tolist() == [1, 3]
+
+    meek = STV(2, transfer="meek")
+    meek.add_ballots(FOOD_BALLOTS)
+    key = meek._cache_key()
+    meek.tolerance = 1e-3
+    assert meek._cache_key() != key
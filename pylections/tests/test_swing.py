@@ -0,0 +1,72 @@
+from pylections.distribution.distribution import StLague, DHondt, Hamilton
+from pylections.district import NorwegianFylke
+from pylections.party import Party
+from pylections.compensation import leveling_seats
+from pylections.swing import SwingModel, apply_swing
+import numpy as np
+import pytest
+
+
+""" Test the swing models and the batched seat projections """
+parties = [Party(name) for name in ("A", "B", "C", "D")]
+
+
+def make_districts() -> list[NorwegianFylke]:
+    rng = np.random.default_rng(3)
+    districts = []
+    for fylkeid in range(12):
+        distribution = StLague(int(rng.integers(3, 20)), initial_divisor=1.4) if fylkeid % 3 else DHondt(int(rng.integers(3, 20)))
+        distribution.add_score(parties, rng.integers(1000, 50_000, len(parties)).tolist())
+        if fylkeid == 5:
+            distribution.threshold = 10
+        districts.append(NorwegianFylke(fylkeid, 1, 1, distribution=distribution))
+    hamilton = Hamilton(6)
+    hamilton.add_score(parties[:3], [30_000, 20_000, 5_000]) # D does not stand here
+    districts.append(NorwegianFylke(99, 1, 1, distribution=hamilton))
+    return districts
+
+
+def test_swing_models() -> None:
+    """ Test that no change keeps the baseline, and that the swings move shares as described. """
+    baseline = np.array([[60.0, 40.0, 0.0], [20.0, 70.0, 10.0]])
+    base = baseline.sum(axis=0)/baseline.sum()
+    for model in ("uniform", "proportional", "logit"):
+        assert np.allclose(apply_swing(baseline, base, model), baseline)
+        votes = apply_swing(baseline, [[0.5, 0.45, 0.05], [0.3, 0.3, 0.4]], model)
+        assert votes.shape == (2, 2, 3)
+        assert np.allclose(votes.sum(axis=2), baseline.sum(axis=1))
+        assert (votes[:, 0, 2] == 0).all() # C does not stand in the first district
+        assert votes[1, 1, 2] > votes[0, 1, 2] # C gains where it stands
+
+    # uniform: +10 points for A, -10 for B in the first district, before the rows are scaled back to 1
+    uniform = apply_swing(baseline, [base[0] + 0.1, base[1] - 0.1, base[2]], "uniform")
+    assert np.allclose(uniform[0], [70, 30, 0])
+    proportional = apply_swing(baseline, [base[0]*1.5, base[1], base[2]], "proportional")
+    assert np.allclose(proportional[1]/proportional[1].sum(), np.array([30, 70, 10])/110)
+    with pytest.raises(ValueError):
+        apply_swing(baseline, base, "cube")
+
+
+def test_projection_matches_distributions() -> None:
+    """ Test that the batched district seats and leveling seats match calculating each scenario with the distributions. """
+    districts = make_districts()
+    model = SwingModel(districts, parties, model="logit")
+    assert model.candidates == parties
+    rng = np.random.default_rng(4)
+    shares = rng.dirichlet([30, 25, 15, 10], 20)
+    total_seats = sum(district.distribution.num_seats for district in districts) + 19
+    seats, leveling = model.project(shares, total_seats=total_seats, method=StLague(0, initial_divisor=1.4), threshold=4)
+    votes = model.votes(shares)
+
+    for scenario in range(len(shares)):
+        for row, district in enumerate(districts):
+            distribution = district.distribution.fork()
+            columns = [parties.index(candidate) for candidate in distribution.candidates]
+            assert model.positions(row).tolist() == columns
+            distribution.set_score_array(votes[scenario, row, columns])
+            expected = np.zeros(len(parties), dtype=np.int64)
+            expected[columns] = distribution.result.to_numpy()
+            assert seats[scenario, row].tolist() == expected.tolist()
+    assert (seats[:, 12, 3] == 0).all()
+    assert np.array_equal(leveling, leveling_seats(votes.sum(axis=1), seats.sum(axis=1), total_seats, StLague(0, initial_divisor=1.4), 4))
+    assert model.project(shares[0])[0].shape == (1, len(districts), len(parties))
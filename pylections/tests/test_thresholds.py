@@ -0,0 +1,69 @@
+from pylections.distribution.distribution import StLague, HuntingtonHill, Hamilton, FirstPastThePost, eligibility_mask
+import numpy as np
+
+
+""" Test thresholds and excluded candidates """
+scores = {
+    "cand1": 5000,
+    "cand2": 3000,
+    "cand3": 1700,
+    "cand4": 300
+}
+
+
+def test_percent_threshold_masks_candidates() -> None:
+    """ Test that candidates below the threshold get no seats, and that the candidate storage is left untouched. """
+    st = StLague(10)
+    st.add_score(scores)
+    st.threshold = 4
+
+    result = st.result
+    assert result["cand4"] == 0
+    assert sum(result.values()) == 10
+    assert st.name_list == ["cand1", "cand2", "cand3", "cand4"]
+    assert st["cand4"] == (300, 0)
+
+
+def test_huntington_hill_threshold_keeps_candidate_order() -> None:
+    """ Test that the HuntingtonHill threshold does not reorder or remove candidates. """
+    hh = HuntingtonHill(10, threshold=10)
+    hh.add_score(scores)
+
+    result = hh.result
+    assert list(result.keys()) == ["cand1", "cand2", "cand3", "cand4"]
+    assert result["cand4"] == 0
+    assert sum(result.values()) == 10
+
+
+def test_absolute_threshold_and_excluded() -> None:
+    """ Test the absolute threshold and explicitly excluded candidates. """
+    ham = Hamilton(10)
+    ham.add_score(scores)
+    ham.absolute_threshold = 2000
+    ham.excluded = ["cand1"]
+
+    result = ham.result
+    assert result == {"cand1": 0, "cand2": 10, "cand3": 0, "cand4": 0}
+
+    fptp = FirstPastThePost(1)
+    fptp.add_score(scores)
+    fptp.excluded = ["cand1"]
+    assert fptp.result["cand2"] == 1
+
+
+def test_eligibility_mask_of_many_rows() -> None:
+    """ Test that the eligibility mask of a batch of scores matches eligible_mask() of a distribution per row. """
+    rng = np.random.default_rng(4)
+    batch = rng.integers(0, 1000, size=(20, 3, 4)) # scenarios x distributions x candidates
+    thresholds = np.array([[0], [10], [25]])
+    absolute = np.array([[0], [200], [0]])
+    excluded = np.array([[False, False, False, False], [False, True, False, False], [False, False, False, True]])
+    mask = eligibility_mask(batch, thresholds, absolute, excluded)
+    for row in range(3):
+        st = StLague(5)
+        st.add_score(dict(zip(scores, batch[0, row].tolist())))
+        st.threshold, st.absolute_threshold = int(thresholds[row, 0]), int(absolute[row, 0])
+        st.excluded = [candidate for candidate, out in zip(scores, excluded[row]) if out]
+        for scenario in range(20):
+            assert st.eligible_mask(batch[scenario, row]).tolist() == mask[scenario, row].tolist()
+    assert mask.any() and not mask.all()
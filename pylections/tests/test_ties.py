@@ -0,0 +1,52 @@
+from pylections.distribution.distribution import StLague, HuntingtonHill, Hamilton, FirstPastThePost
+from pylections.distribution.utils import TieError
+import pytest
+
+
+""" Test exact tie detection and tie breaking """
+
+
+def test_divisor_method_ties() -> None:
+    """ Test that exact ties are found, also when the float quotients differ, and broken with each tie_break. """
+    st = StLague(3)
+    st.add_score({"A": 300, "B": 60, "C": 10}) # A's third quotient 300/5 ties B's first quotient 60/1
+    assert st.result == {"A": 3, "B": 0, "C": 0}
+    assert st.ties == [(("A", "B"), 1)]
+
+    hh = HuntingtonHill(10)
+    hh.add_score({"A": 7, "B": 42}) # 7/sqrt(2) and 42/sqrt(72) are equal, but not as floats
+    hh.tie_break = "raise"
+    with pytest.raises(TieError) as error:
+        hh.calculate()
+    assert error.value.candidates == ("A", "B")
+
+    results = set()
+    for seed in range(10):
+        st = StLague(3)
+        st.add_score({"A": 300, "B": 60, "C": 10})
+        st.tie_break = "random"
+        st.seed = seed
+        result = st.result
+        st.calculate()
+        assert st.result == result # the same seed gives the same result
+        results.add(tuple(result.values()))
+    assert results == {(3, 0, 0), (2, 1, 0)}
+
+
+def test_first_past_the_post_and_hamilton_ties() -> None:
+    """ Test ties for the only seat and for the largest remainders. """
+    fptp = FirstPastThePost(1)
+    fptp.add_score({"A": 5, "B": 5, "C": 4})
+    assert fptp.result == {"A": 1, "B": 0, "C": 0}
+    assert fptp.ties == [(("A", "B"), 1)]
+
+    hamilton = Hamilton(3)
+    hamilton.add_score({"A": 1, "B": 1, "C": 1, "D": 1})
+    hamilton.tie_break = "raise"
+    with pytest.raises(TieError):
+        hamilton.calculate()
+
+    hamilton = Hamilton(10)
+    hamilton.add_score({"A": 10**18, "B": 3*10**17, "C": 7}) # too large for exact float remainders
+    assert hamilton.result == {"A": 8, "B": 2, "C": 0}
+    assert hamilton.ties == []